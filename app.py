@@ -1,10 +1,19 @@
-from flask import Flask
+from flask import Flask, before_render_template, g, has_app_context, has_request_context, request, template_rendered, url_for
 import os
+import time
+from sqlalchemy import event
+import metrics
 from models import db
 from validators import alert_category
+from images import thumbnail_filename
 
 app = Flask(__name__)
 
+# Spawned simulation workers (simulation.py) re-run the main script as __mp_main__ before
+# they unpickle their task. Under `python app.py` that copy must not create tables, import
+# the routes (which import this module again as `app`) or run migrations.
+SPAWNED_WORKER = __name__ == '__mp_main__'
+
 # Allow config via environment variables for production/Docker
 db_uri = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///instance/mariokart_tournament.db')
 
@@ -18,8 +27,44 @@ if db_uri.startswith('sqlite:///') and not db_uri.startswith('sqlite:////'):
 
 app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', os.path.join('static', 'uploads'))
+# Absolute so saving (relative to the working directory) and serving agree
+app.config['UPLOAD_FOLDER'] = os.path.abspath(os.getenv('UPLOAD_FOLDER', os.path.join('static', 'uploads')))
 app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(4 * 1024 * 1024)))  # 4MB default
+# Tournament imports (POST /import) stream from disk, so they get their own, larger limit
+app.config['IMPORT_MAX_BYTES'] = int(os.getenv('IMPORT_MAX_BYTES', str(512 * 1024 * 1024)))
+# Max SQL statements per request; 0 disables. Tests set this to fail pages that regress into N+1 loads.
+app.config['QUERY_BUDGET'] = int(os.getenv('QUERY_BUDGET', '0'))
+# Apply pending schema migrations (migrations.py) at startup; 0 leaves them to `flask migrate`
+app.config['AUTO_MIGRATE'] = os.getenv('AUTO_MIGRATE', '1') != '0'
+
+# Opt-in slow-request log: requests slower than this (ms, 0 disables) are logged with their
+# slowest SQL statements and service spans
+app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', '0'))
+app.config['SLOW_REQUEST_TOP_SQL'] = int(os.getenv('SLOW_REQUEST_TOP_SQL', '5'))
+
+# Finals odds simulation (simulation.py): worker processes, used once iterations x unplayed
+# matches reaches SIMULATION_POOL_MIN_WORK; smaller runs stay in the request's process
+app.config['SIMULATION_WORKERS'] = int(os.getenv('SIMULATION_WORKERS', str(min(4, os.cpu_count() or 1))))
+app.config['SIMULATION_POOL_MIN_WORK'] = int(os.getenv('SIMULATION_POOL_MIN_WORK', '5000000'))
+
+# Live updates over SSE (live.py)
+app.config['LIVE_POLL_SECONDS'] = float(os.getenv('LIVE_POLL_SECONDS', '0.5'))
+app.config['LIVE_HEARTBEAT_SECONDS'] = float(os.getenv('LIVE_HEARTBEAT_SECONDS', '15'))
+app.config['LIVE_STREAM_SECONDS'] = float(os.getenv('LIVE_STREAM_SECONDS', '300'))
+app.config['LIVE_EVENT_RETENTION_SECONDS'] = int(os.getenv('LIVE_EVENT_RETENTION_SECONDS', '3600'))
+app.config['LIVE_MAX_PUSHED_MATCHES'] = int(os.getenv('LIVE_MAX_PUSHED_MATCHES', '50'))
+
+# SQLite tuning, applied to every pooled connection (see configure_sqlite below)
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '15000'))
+app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # safe with WAL
+app.config['SQLITE_CACHE_KB'] = int(os.getenv('SQLITE_CACHE_KB', str(20 * 1024)))
+if db_uri.startswith('sqlite:///'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        # One connection per thread; the pool keeps them open so pragmas are paid once
+        'pool_size': int(os.getenv('SQLITE_POOL_SIZE', '8')),
+        'max_overflow': int(os.getenv('SQLITE_POOL_OVERFLOW', '8')),
+        'connect_args': {'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000},
+    }
 
 # Ensure folders exist (uploads and SQLite directory if used)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -33,15 +78,143 @@ if db_uri.startswith('sqlite:///'):
 # Jinja helpers
 @app.context_processor
 def inject_helpers():
-    return dict(alert_cat=lambda v: alert_category(v))
+    return dict(alert_cat=lambda v: alert_category(v), avatar_url=avatar_url)
+
+
+def avatar_url(image_filename, size):
+    """URL of a player photo's square thumbnail (see images.THUMBNAIL_SIZES)."""
+    return url_for('uploaded_file', filename=thumbnail_filename(image_filename, size))
 
 db.init_app(app)
 
+# GET endpoints that write (older links kept as GET); their transactions start like a POST's
+WRITE_ENDPOINTS = set()
+
+
+def writes_database(view):
+    """Mark a GET view that writes, so its transaction takes the write lock up front
+    (see configure_sqlite). Apply below @app.route; the endpoint is the function name."""
+    WRITE_ENDPOINTS.add(view.__name__)
+    return view
+
+
+def configure_sqlite(engine):
+    """WAL journal plus explicit transaction control so several workers can write safely.
+
+    pysqlite's implicit transactions start as readers and fail with "database is locked" when they
+    later need to write while another process holds the lock; busy_timeout cannot help there. We
+    take over BEGIN instead: requests that may write (anything but GET/HEAD, plus GET views
+    marked with writes_database) start with BEGIN IMMEDIATE, which queues on busy_timeout, while
+    reads stay deferred and never block.
+    """
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None  # we emit BEGIN ourselves
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f"PRAGMA synchronous={app.config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+        cursor.execute(f"PRAGMA cache_size=-{app.config['SQLITE_CACHE_KB']}")
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin_sqlite_transaction(conn):
+        if has_request_context():
+            writes = request.method not in ('GET', 'HEAD') or request.endpoint in WRITE_ENDPOINTS
+        else:
+            # Background work (e.g. the live event poller) can opt out of taking the write lock
+            writes = not (has_app_context() and g.get('sqlite_read_only'))
+        # Straight to the driver so BEGIN is not counted against the request's query budget
+        conn.connection.driver_connection.execute('BEGIN IMMEDIATE' if writes else 'BEGIN')
+
+
 with app.app_context():
-    db.create_all()
+    if db.engine.dialect.name == 'sqlite':
+        configure_sqlite(db.engine)
+    if not SPAWNED_WORKER:
+        db.create_all()
+
+    # Count and time SQL statements issued while handling each request
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def count_request_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(db.engine, 'after_cursor_execute')
+    def time_request_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and conn.info.get('query_start'):
+            elapsed = time.perf_counter() - conn.info['query_start'].pop()
+            g.db_time = g.get('db_time', 0.0) + elapsed
+            if app.config['SLOW_REQUEST_MS']:
+                g.setdefault('sql_timings', []).append((elapsed, statement))
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+
+@template_rendered.connect_via(app)
+def record_render_span(sender, template, context, **extra):
+    if 'render_start' in g:
+        metrics.record_span(f"render:{template.name}", time.perf_counter() - g.pop('render_start'))
+
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    endpoint = request.endpoint or 'unmatched'
+    queries = g.get('query_count', 0)
+    db_time = g.get('db_time', 0.0)
+    metrics.observe(metrics.REQUEST_SECONDS, (endpoint, request.method), elapsed)
+    metrics.inc(metrics.REQUESTS, (endpoint, request.method, response.status_code))
+    metrics.observe(metrics.REQUEST_SQL, (endpoint,), queries)
+    metrics.observe(metrics.REQUEST_DB_SECONDS, (endpoint,), db_time)
+
+    slow_ms = app.config['SLOW_REQUEST_MS']
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        top = sorted(g.get('sql_timings', []), key=lambda t: t[0], reverse=True)
+        lines = [f"{ms * 1000:8.1f} ms  {' '.join(sql.split())[:200]}"
+                 for ms, sql in top[:app.config['SLOW_REQUEST_TOP_SQL']]]
+        spans = ', '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in g.get('spans', []))
+        app.logger.warning("Slow request %s %s: %.1f ms, %d SQL statements (%.1f ms)%s\n%s",
+                           request.method, request.full_path.rstrip('?'), elapsed * 1000, queries,
+                           db_time * 1000, f"; spans: {spans}" if spans else '', '\n'.join(lines))
+    return response
+
+
+@app.after_request
+def enforce_query_budget(response):
+    budget = app.config['QUERY_BUDGET']
+    count = g.get('query_count', 0)
+    if budget and count > budget:
+        raise QueryBudgetExceeded(f"{count} SQL statements issued, budget is {budget}")
+    return response
+
+if not SPAWNED_WORKER:
+    # Import routes after app is created to avoid circular imports
+    from routes import *
+    from migrations import run_migrations
 
-# Import routes after app is created to avoid circular imports
-from routes import *
+    # Bring databases created by older versions up to date; with AUTO_MIGRATE=0 run `flask migrate` instead
+    with app.app_context():
+        if app.config['AUTO_MIGRATE']:
+            run_migrations()
+        # With gunicorn --preload this module runs once in the master; drop its connections so
+        # each forked worker opens its own instead of sharing SQLite handles across processes.
+        db.engine.dispose()
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,318 @@
+"""Benchmarks for the tournament services and routes on synthetic data.
+
+Usage:
+    python benchmarks.py [stats] [planner] [swiss] [services] [routes] [--max-players N] [--json results.json]
+
+`services` and `routes` seed synthetic tournaments (8 to 10,000 players, up to 100,000 matches)
+into a temporary SQLite database and report wall time, SQL statement count and peak Python
+memory per operation. --json writes every result row for comparing runs.
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+# Keep benchmark runs away from the real instance database
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('UPLOAD_FOLDER', os.path.join(tempfile.mkdtemp(), 'uploads'))
+
+import numpy as np
+from sqlalchemy import event, insert, select, update
+
+from app import app, db  # services expects the app module to be initialised first
+from caching import render_cache
+from constants import POSITION_POINTS
+import random
+from collections import Counter
+
+from models import Match, MatchParticipant, Player, Tournament
+import simulation
+import transfer
+from services import (
+    appearance_counts, bulk_create_matches, existing_pair_counts, head_to_head, load_score_columns, load_snapshot,
+    load_standings, plan_groups, player_match_history, player_statistics_arrays, rebuild_ratings, rebuild_standings,
+    score_columns_from_rows, statistics_from_columns, statistics_from_standings, swiss_pairings,
+)
+
+# (players, matches) per synthetic tournament
+TOURNAMENT_SIZES = ((8, 20), (100, 500), (1_000, 10_000), (10_000, 100_000))
+
+
+def synthetic_score_rows(n_matches: int, n_players: int, seed: int = 0):
+    """Random 4-player matches with roughly 80% of results recorded."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n_matches):
+        pids = [int(x) for x in rng.choice(n_players, 4, replace=False) + 1]
+        if rng.random() < 0.8:
+            positions = rng.permutation(4) + 1
+            scores = [POSITION_POINTS[int(p)] for p in positions]
+            winner = pids[int(np.argmin(positions))]
+        else:
+            scores = [None] * 4
+            winner = None
+        rows.append(tuple(pids) + tuple(scores) + (winner,))
+    return rows
+
+
+def _best_of(fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_stats(sizes=(100, 1_000, 10_000, 100_000), **_):
+    results = []
+    print(f"{'matches':>8} {'players':>8} {'columns ms':>11} {'stats ms':>9} {'us/match':>9}")
+    for n_matches in sizes:
+        n_players = max(8, n_matches // 5)
+        rows = synthetic_score_rows(n_matches, n_players)
+        player_ids = list(range(1, n_players + 1))
+        columns = score_columns_from_rows(rows)
+        t_columns = _best_of(lambda: score_columns_from_rows(rows))
+        t_stats = _best_of(lambda: player_statistics_arrays(columns, player_ids))
+        print(f"{n_matches:>8} {n_players:>8} {t_columns * 1e3:>11.2f} {t_stats * 1e3:>9.2f} "
+              f"{(t_columns + t_stats) / n_matches * 1e6:>9.2f}")
+        results.append({'matches': n_matches, 'players': n_players,
+                        'columns_ms': t_columns * 1e3, 'stats_ms': t_stats * 1e3})
+    return results
+
+
+def bench_planner(sizes=(100, 1_000, 2_000, 10_000), games_per_player=20, **_):
+    results = []
+    print(f"{'players':>8} {'matches':>8} {'ms':>9} {'repeats':>8} {'bot fills':>9} {'unplaced':>8}")
+    for n_players in sizes:
+        needs = {pid: games_per_player for pid in range(1, n_players + 1)}
+        bot_ids = [-1, -2, -3, -4]
+        start = time.perf_counter()
+        groups, report = plan_groups(needs, bot_ids, rng=random.Random(0))
+        elapsed = time.perf_counter() - start
+        print(f"{n_players:>8} {report['matches']:>8} {elapsed * 1e3:>9.1f} {report['repeat_pairings']:>8} "
+              f"{report['bot_fills']:>9} {report['unplaced']:>8}")
+        results.append(dict(report, players=n_players, ms=elapsed * 1e3))
+    return results
+
+
+def bench_swiss(sizes=(100, 1_000, 2_000, 10_000), rounds=8, **_):
+    """Pair consecutive Swiss rounds; standings are reshuffled between rounds as if results came in."""
+    results = []
+    print(f"{'players':>8} {'rounds':>7} {'ms/round':>9} {'max ms':>8} {'repeats':>8} {'bot fills':>9}")
+    for n_players in sizes:
+        rng = random.Random(0)
+        ranked = list(range(1, n_players + 1))
+        pair_counts = Counter()
+        times, repeats, fills = [], 0, 0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            _, report = swiss_pairings(ranked, pair_counts, [-1, -2, -3, -4])
+            times.append(time.perf_counter() - start)
+            repeats += report['repeat_pairings']
+            fills += report['bot_fills']
+            rng.shuffle(ranked)
+        mean = sum(times) / len(times)
+        print(f"{n_players:>8} {rounds:>7} {mean * 1e3:>9.1f} {max(times) * 1e3:>8.1f} {repeats:>8} {fills:>9}")
+        results.append({'players': n_players, 'rounds': rounds, 'ms_per_round': mean * 1e3,
+                        'max_ms': max(times) * 1e3, 'repeat_pairings': repeats, 'bot_fills': fills})
+    return results
+
+
+def bench_simulation(iterations=100_000, matches=500, players=200, **_):
+    """Finals odds for a late-stage tournament: simulate() in-process and across the worker pool."""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 40, players).astype(float)
+    slots = np.array([rng.choice(players, 4, replace=False) for _ in range(matches)])
+    strength = rng.normal(0, 0.5, slots.shape)
+    workers = app.config['SIMULATION_WORKERS']
+    results = []
+    print(f"{'weighting':>9} {'workers':>7} {'iterations':>10} {'matches':>7} {'seconds':>8}")
+    for weighting, log_strength in (('uniform', None), ('rating', strength)):
+        for n_workers in sorted({0, workers if workers > 1 else 0}):
+            simulation.simulate(base, slots, log_strength, 1_000, workers=n_workers)  # warm the pool
+            start = time.perf_counter()
+            simulation.simulate(base, slots, log_strength, iterations, workers=n_workers, seed=0)
+            elapsed = time.perf_counter() - start
+            print(f"{weighting:>9} {n_workers:>7} {iterations:>10} {matches:>7} {elapsed:>8.2f}")
+            results.append({'weighting': weighting, 'workers': n_workers, 'iterations': iterations,
+                            'matches': matches, 'seconds': elapsed})
+    return results
+
+
+def seed_tournament(n_players: int, n_matches: int, scored: float = 0.8, seed: int = 0) -> int:
+    """Insert a tournament with random 4-player matches, ~`scored` of them recorded, and
+    standings rebuilt to match. Bypasses the routes so 100k matches seed in seconds."""
+    rng = np.random.default_rng(seed)
+    tournament = Tournament(name=f"Bench {n_players}x{n_matches}")
+    db.session.add(tournament)
+    db.session.flush()
+    db.session.execute(insert(Player), [{'name': f"Racer {i}", 'tournament_id': tournament.id} for i in range(n_players)])
+    player_ids = list(db.session.scalars(select(Player.id).where(Player.tournament_id == tournament.id).order_by(Player.id)))
+    groups = [[player_ids[int(x)] for x in rng.choice(n_players, 4, replace=False)] for _ in range(n_matches)]
+    match_ids = bulk_create_matches(tournament.id, 1, groups)
+    match_rows, participant_rows = [], []
+    for mid, group in zip(match_ids, groups):
+        if rng.random() >= scored:
+            continue
+        positions = rng.permutation(4) + 1
+        scores = [POSITION_POINTS[int(p)] for p in positions]
+        match_rows.append({'id': mid, 'score1': scores[0], 'score2': scores[1], 'score3': scores[2],
+                           'score4': scores[3], 'winner_id': group[int(np.argmin(positions))]})
+        participant_rows.extend({'match_id': mid, 'player_id': pid, 'score': score}
+                                for pid, score in zip(group, scores))
+    if match_rows:
+        db.session.execute(update(Match), match_rows)
+        db.session.execute(update(MatchParticipant), participant_rows)
+    rebuild_standings(tournament.id)
+    db.session.commit()
+    return tournament.id
+
+
+def measure(fn, repeat: int = 3) -> dict:
+    """Best-of wall time plus the SQL statements and peak traced memory of one extra run.
+
+    repeat=0 is for operations that change the tournament and can only run once: that single
+    traced run supplies all three numbers (wall time then includes tracemalloc overhead).
+    """
+    wall = _best_of(fn, repeat) if repeat else None
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return {'ms': (elapsed if wall is None else wall) * 1e3, 'queries': statements, 'peak_kb': peak / 1024}
+
+
+def _report(results, size, name, row):
+    n_players, n_matches = size
+    print(f"{n_players:>8} {n_matches:>8} {name:<24} {row['ms']:>10.2f} {row['queries']:>8} {row['peak_kb']:>10.0f}")
+    results.append(dict(row, players=n_players, matches=n_matches, operation=name))
+
+
+def _header():
+    print(f"{'players':>8} {'matches':>8} {'operation':<24} {'ms':>10} {'queries':>8} {'peak KiB':>10}")
+
+
+def _sizes(max_players):
+    return [size for size in TOURNAMENT_SIZES if size[0] <= max_players]
+
+
+def bench_services(max_players=10_000, **_):
+    """Time the services layer directly, inside one app context per tournament size."""
+    results = []
+    _header()
+    with app.app_context():
+        for size in _sizes(max_players):
+            tid = seed_tournament(*size)
+            players = Player.query.filter_by(tournament_id=tid).all()
+            pid = players[0].id
+            needs = {p.id: 4 for p in players}
+            operations = {
+                'load_standings': lambda: load_standings(tid),
+                'orm_matches': lambda: Match.query.filter_by(tournament_id=tid).all(),
+                'load_snapshot': lambda: load_snapshot(tid),
+                'export_ndjson': lambda: sum(len(block) for block in transfer.export_ndjson(tid)),
+                'statistics_from_standings': lambda: statistics_from_standings(players, load_standings(tid)),
+                'statistics_from_columns': lambda: statistics_from_columns(players, load_score_columns(tid)),
+                'appearance_counts': lambda: appearance_counts(tid),
+                'existing_pair_counts': lambda: existing_pair_counts(tid),
+                'plan_groups': lambda: plan_groups(needs, [-1, -2, -3, -4], existing_pair_counts(tid),
+                                                   rng=random.Random(0)),
+                'player_match_history': lambda: player_match_history(pid),
+                'head_to_head': lambda: head_to_head(pid),
+                'rebuild_standings': lambda: (rebuild_standings(tid), db.session.rollback()),
+                'rebuild_ratings': lambda: (rebuild_ratings(tid), db.session.rollback()),
+            }
+            for name, fn in operations.items():
+                _report(results, size, name, measure(fn))
+                db.session.expunge_all()
+    return results
+
+
+def bench_routes(max_players=10_000, **_):
+    """Time whole requests through the Flask test client, including template rendering."""
+    results = []
+    client = app.test_client()
+    _header()
+    for size in _sizes(max_players):
+        with app.app_context():
+            tid = seed_tournament(*size)
+            open_ids = [mid for (mid,) in db.session.query(Match.id).filter_by(tournament_id=tid, winner_id=None)
+                        .order_by(Match.id).limit(8)]
+            planned_tid = seed_tournament(size[0], 0)
+        base = f"/tournament/{tid}"
+        results_form = {'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'}
+
+        def cold(path):
+            render_cache.clear()
+            return client.get(path)
+
+        pending = iter(open_ids)
+        operations = [
+            ('tournament_detail', lambda: cold(base), 3),
+            ('tournament_detail cached', lambda: client.get(base), 3),
+            ('tournament_results', lambda: cold(f"{base}/results"), 3),
+            ('tournament_results cached', lambda: client.get(f"{base}/results"), 3),
+            ('record_result', lambda: client.post(f"{base}/record_result/{next(pending)}", data=results_form), 3),
+            ('generate_bracket', lambda: client.get(f"{base}/generate_bracket"), 3),
+            # One-shot operations: each run changes the tournament
+            ('plan_schedule', lambda: client.post(f"/tournament/{planned_tid}/plan_schedule",
+                                                  data={'games_per_player': '4'}), 0),
+            ('generate_finals', lambda: client.get(f"{base}/generate_finals"), 0),
+        ]
+        with app.app_context():  # measure() listens on the engine; requests push their own contexts
+            for name, fn, repeat in operations:
+                _report(results, size, name, measure(fn, repeat))
+    return results
+
+
+BENCHMARKS = {
+    'stats': bench_stats,
+    'planner': bench_planner,
+    'swiss': bench_swiss,
+    'simulation': bench_simulation,
+    'services': bench_services,
+    'routes': bench_routes,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', metavar='benchmark',
+                        help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--max-players', type=int, default=10_000,
+                        help='largest synthetic tournament for services/routes (default 10000)')
+    parser.add_argument('--json', metavar='PATH', help='write results as JSON for comparing runs')
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.names) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = {'python': platform.python_version(), 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'benchmarks': {}}
+    for name in args.names or list(BENCHMARKS):
+        print(f"== {name} ==")
+        report['benchmarks'][name] = BENCHMARKS[name](max_players=args.max_players)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(report, fh, indent=2)
+        print(f"wrote {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Per-tournament render cache with ETag revalidation.
+
+Pages are keyed by (endpoint, tournament id, created_at) and tagged with Tournament.version,
+which every mutating route bumps via services.touch_tournament. A stale version simply misses,
+so nothing has to be evicted explicitly and each worker process can keep its own cache.
+created_at tells apart a tournament that reuses a deleted one's id (SQLite hands out freed
+ids again, and versions restart at 0). There is no Last-Modified: updated_at has one-second
+resolution, so two changes within a second would let If-Modified-Since answer 304 for a stale page.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, abort, request
+
+from app import app, db
+from models import Tournament
+
+
+def _template_fingerprint() -> str:
+    """Changes whenever a template changes, so a redeploy never answers 304 with old markup."""
+    digest = hashlib.sha1()
+    folder = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(folder)):
+        stat = os.stat(os.path.join(folder, name))
+        digest.update(f"{name}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+    return digest.hexdigest()[:8]
+
+
+TEMPLATE_FINGERPRINT = _template_fingerprint()
+
+
+class RenderCache:
+    """Small thread-safe LRU of rendered HTML keyed by (endpoint, tournament_id, instance)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, html):
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+render_cache = RenderCache(int(os.getenv('RENDER_CACHE_SIZE', '256')))
+
+
+def instance_tag(created_at) -> str:
+    """Identifies one tournament row across id reuse, for cache keys and ETags."""
+    return created_at.strftime('%Y%m%d%H%M%S%f') if created_at else '0'
+
+
+def cached_tournament_page(view):
+    """Serve a tournament page from the render cache and answer conditional requests with 304.
+
+    Requests with query arguments (flash messages) always render fresh and are not stored.
+    """
+    @wraps(view)
+    def wrapper(tournament_id, **kwargs):
+        if request.args:
+            return view(tournament_id, **kwargs)
+        row = db.session.query(Tournament.version, Tournament.created_at).filter(
+            Tournament.id == tournament_id).first()
+        if row is None:
+            abort(404)
+        version, created_at = row
+        instance = instance_tag(created_at)
+
+        def conditional(response):
+            response.set_etag(f"{request.endpoint}-{tournament_id}-{instance}-{version}-{TEMPLATE_FINGERPRINT}")
+            response.cache_control.no_cache = True
+            return response.make_conditional(request)
+
+        probe = conditional(Response())
+        if probe.status_code == 304:
+            return probe
+        key = (request.endpoint, tournament_id, instance)
+        html = render_cache.get(key, version)
+        if html is None:
+            html = view(tournament_id, **kwargs)
+            render_cache.put(key, version, html)
+        return conditional(Response(html, mimetype='text/html'))
+    return wrapper
@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before it is imported
+_tmp = tempfile.mkdtemp()
+os.environ['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(_tmp, 'test.db')
+os.environ['UPLOAD_FOLDER'] = os.path.join(_tmp, 'uploads')
+
+from app import app as flask_app, db  # noqa: E402
+from caching import render_cache  # noqa: E402
+from services import odds_cache  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    # Page caches are keyed by tournament version, which restarts with every fresh database
+    render_cache.clear()
+    odds_cache.clear()
+    yield flask_app
+    flask_app.config['QUERY_BUDGET'] = 0
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_budget(app):
+    """Fail any request in the test that issues more than the given number of SQL statements."""
+    def set_budget(n):
+        app.config['QUERY_BUDGET'] = n
+    return set_budget
+
+
+def make_tournament(client, n_players, games_per_player=0):
+    """Create tournament 1 with n players and, optionally, a planned group stage."""
+    client.post('/create_tournament', data={'name': 'Cup'})
+    for i in range(n_players):
+        client.post('/tournament/1/add_player', data={'name': f'P{i}'})
+    if games_per_player:
+        client.post('/tournament/1/plan_schedule', data={'games_per_player': str(games_per_player)})
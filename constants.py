@@ -6,3 +6,20 @@ POSITION_POINTS = {1: 4, 2: 3, 3: 2, 4: 1}
 
 # Prefix used to mark bot players created by the planner
 BOT_PREFIX = "[BOT]"
+
+# Cache lifetime for content-addressed player photos (one year)
+UPLOAD_CACHE_SECONDS = 365 * 24 * 3600
+
+# Tournaments per page on the index (keyset pagination, newest first)
+INDEX_PAGE_SIZE = 20
+
+# Rounds per page on the tournament detail page and its /rounds fragments
+ROUNDS_PAGE_SIZE = 20
+
+# Elo-style player ratings: every player starts at RATING_INITIAL; one match moves a player by
+# at most RATING_K (a clean win over three equally rated opponents gains K/2)
+RATING_INITIAL = 1500.0
+RATING_K = 32.0
+
+# Finishing places that count as a podium on season leaderboards
+PODIUM_PLACES = 3
@@ -0,0 +1,235 @@
+"""Multi-stage tournament formats (see TOURNAMENT_PLAN.md).
+
+The format follows from the number of human players: micro (4), small (5-8), medium (9-16),
+large (17-32) and mega (33+). Starting a format stores its whole stage chain as
+TournamentStage rows: pools with their advancement rules, then elimination rounds in pods of
+four and the final. Only the first stage gets entries and matches. Each later stage is
+materialised by advance_stage once the last result of the stage before it is in. Pages read
+the stored rows, so nothing is recomputed on load and a 256-player event never holds
+placeholder matches for rounds nobody has reached yet.
+
+Stage rankings use the points earned in that stage only (then wins, then seed). Pools send
+their top advance // groups through plus the best of the rest; elimination pods send their top
+two. Correcting a result after its stage has closed does not reshuffle the next stage.
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, insert, select
+
+from app import db
+from models import Match, MatchParticipant, Player, StageEntry, Tournament, TournamentStage
+from services import (
+    bulk_create_matches,
+    ensure_bot_ids,
+    existing_pair_counts,
+    human_players,
+    load_standings,
+    next_round_number,
+    plan_groups,
+    statistics_from_standings,
+)
+
+# format -> (label, fewest players, most players or None); a larger field may run a smaller
+# format except micro, which is a single match
+FORMATS = {
+    'micro': ('Micro', 4, 4),
+    'small': ('Small', 5, 8),
+    'medium': ('Medium', 9, 16),
+    'large': ('Large', 17, 32),
+    'mega': ('Mega', 33, None),
+}
+POD_SIZE = 4
+POD_ADVANCE = 2
+GROUP_STAGE_SIZE = 6
+MAIN_QUALIFICATION_SIZE = 16
+
+
+class FormatError(ValueError):
+    """A format that cannot start for this tournament; the message says why."""
+
+
+def select_format(players: int) -> str:
+    """The format TOURNAMENT_PLAN.md recommends for this many players."""
+    if players < 4:
+        raise FormatError('A format needs at least 4 players.')
+    for name, (_, low, high) in FORMATS.items():
+        if low <= players and (high is None or players <= high):
+            return name
+    raise AssertionError(players)
+
+
+def available_formats(players: int) -> List[str]:
+    return [name for name, (_, low, high) in FORMATS.items()
+            if low <= players and (name != 'micro' or players == high)]
+
+
+def _stage(kind: str, name: str, entrants: int, groups: int, games: int, advance: int) -> Dict:
+    return {'kind': kind, 'name': name, 'entrants': entrants, 'groups': groups, 'games': games,
+            'advance': advance}
+
+
+def _eliminations(entrants: int) -> List[Dict]:
+    """Knockout rounds in pods of four, top two through, until four players are left for the final."""
+    rounds = []
+    while entrants > POD_SIZE:
+        pods = math.ceil(entrants / POD_SIZE)
+        rounds.append(_stage('knockout', '', entrants, pods, 1, POD_ADVANCE * pods))
+        entrants = POD_ADVANCE * pods
+    names = ['Semi-finals', 'Quarter-finals']
+    for i, stage in enumerate(reversed(rounds)):
+        stage['name'] = names[i] if i < len(names) else f'Elimination round {len(rounds) - i}'
+    return rounds
+
+
+def _group_stage(entrants: int, groups: int) -> Dict:
+    return _stage('pool', 'Group stage', entrants, groups, 2, POD_ADVANCE * groups)
+
+
+def plan_stages(players: int, fmt: Optional[str] = None) -> List[Dict]:
+    """The stage chain for a field of `players`: dicts with kind ('pool', 'knockout' or
+    'final'), name, entrants, groups, games per player and advance. fmt defaults to
+    select_format(players)."""
+    fmt = fmt or select_format(players)
+    if fmt not in available_formats(players):
+        raise FormatError(f'The {fmt} format does not fit {players} players.')
+    stages = []
+    if fmt == 'small':
+        stages.append(_stage('pool', 'Qualifying rounds', players, 1, 2, POD_SIZE))
+    elif fmt == 'medium':
+        groups = 3 if players <= 12 else 4
+        stages.append(_stage('pool', 'Pool play', players, groups, 2, POD_ADVANCE * groups))
+    elif fmt == 'large':
+        qualified = round(players * 3 / 4)
+        stages.append(_stage('pool', 'Qualifying', players, 1, 1, qualified))
+        stages.append(_group_stage(qualified, max(2, math.ceil(qualified / GROUP_STAGE_SIZE))))
+    elif fmt == 'mega':
+        qualified = round(players * 3 / 4)
+        groups = math.ceil(qualified / MAIN_QUALIFICATION_SIZE)
+        main = max(POD_SIZE * groups, qualified // 2)
+        stages.append(_stage('pool', 'Pre-qualification', players, 1, 1, qualified))
+        stages.append(_stage('pool', 'Main qualification', qualified, groups, 2, main))
+        stages.append(_group_stage(main, max(2, math.ceil(main / GROUP_STAGE_SIZE))))
+    entrants = stages[-1]['advance'] if stages else players
+    stages.extend(_eliminations(entrants))
+    stages.append(_stage('final', 'Final', POD_SIZE, 1, 1, 0))
+    return stages
+
+
+def snake_groups(seeded: List[int], groups: int) -> List[List[int]]:
+    """Deal seeds into groups 1..n, n..1, 1..n, ... so every group gets a fair share of the top."""
+    dealt: List[List[int]] = [[] for _ in range(groups)]
+    for i, pid in enumerate(seeded):
+        lap, pos = divmod(i, groups)
+        dealt[pos if lap % 2 == 0 else groups - 1 - pos].append(pid)
+    return dealt
+
+
+def start_format(tournament: Tournament, fmt: Optional[str] = None) -> List[int]:
+    """Store the tournament's stage chain and materialise its first stage (caller commits).
+    Returns the new match ids. The field is seeded by the current standings."""
+    if db.session.query(Match.id).filter(Match.tournament_id == tournament.id).first():
+        raise FormatError('Reset the matches before starting a format.')
+    players = human_players(tournament.id)
+    if len(players) < 4:
+        raise FormatError('A format needs at least 4 players.')
+    fmt = fmt or select_format(len(players))
+    specs = plan_stages(len(players), fmt)
+    bot_ids = ensure_bot_ids(tournament, POD_SIZE)
+    stages = [TournamentStage(tournament_id=tournament.id, position=i, status='pending', **spec)
+              for i, spec in enumerate(specs, start=1)]
+    db.session.add_all(stages)
+    db.session.flush()
+    tournament.format = fmt
+    seeded = [row['player'].id for row in statistics_from_standings(players, load_standings(tournament.id))]
+    return _materialize(stages[0], seeded, bot_ids)
+
+
+def _materialize(stage: TournamentStage, seeded: List[int], bot_ids: List[int]) -> List[int]:
+    """Create the stage's entries and matches, all in one new round, and mark it active."""
+    groups = snake_groups(seeded, stage.groups)
+    seeds = {pid: seed for seed, pid in enumerate(seeded, start=1)}
+    db.session.execute(insert(StageEntry), [
+        {'stage_id': stage.id, 'player_id': pid, 'group_number': number, 'seed': seeds[pid], 'advanced': False}
+        for number, members in enumerate(groups, start=1) for pid in members])
+    match_groups = []
+    if stage.kind == 'pool':
+        pair_counts = existing_pair_counts(stage.tournament_id)
+        for members in groups:
+            planned, _ = plan_groups({pid: stage.games for pid in members}, bot_ids, pair_counts)
+            match_groups.extend(planned)
+    else:
+        match_groups = [members + bot_ids[:POD_SIZE - len(members)] for members in groups]
+    stage.status = 'active'
+    return bulk_create_matches(stage.tournament_id, next_round_number(stage.tournament_id), match_groups,
+                               same_round=True, stage_id=stage.id)
+
+
+def stage_rows(stage_ids: List[int]) -> Dict[int, Dict[int, List[Dict]]]:
+    """Entries of the given stages with their stage points and wins, ranked within each group:
+    {stage_id: {group_number: [row, ...]}}. One query."""
+    earned = (select(Match.stage_id, MatchParticipant.player_id,
+                     func.coalesce(func.sum(MatchParticipant.score), 0).label('points'),
+                     func.sum(case((Match.winner_id == MatchParticipant.player_id, 1), else_=0)).label('wins'))
+              .join(Match, Match.id == MatchParticipant.match_id)
+              .where(Match.stage_id.in_(stage_ids))
+              .group_by(Match.stage_id, MatchParticipant.player_id)
+              .subquery())
+    rows = db.session.execute(
+        select(StageEntry.stage_id, StageEntry.group_number, StageEntry.player_id, StageEntry.seed,
+               StageEntry.advanced, Player.name, func.coalesce(earned.c.points, 0), func.coalesce(earned.c.wins, 0))
+        .join(Player, Player.id == StageEntry.player_id)
+        .outerjoin(earned, (earned.c.stage_id == StageEntry.stage_id) & (earned.c.player_id == StageEntry.player_id))
+        .where(StageEntry.stage_id.in_(stage_ids)))
+    tables: Dict[int, Dict[int, List[Dict]]] = {}
+    for stage_id, group, pid, seed, advanced, name, points, wins in rows:
+        tables.setdefault(stage_id, {}).setdefault(group, []).append(
+            {'player_id': pid, 'name': name, 'seed': seed, 'advanced': advanced, 'points': points, 'wins': wins})
+    for groups in tables.values():
+        for members in groups.values():
+            members.sort(key=_rank_key)
+    return tables
+
+
+def _rank_key(row: Dict) -> Tuple[int, int, int]:
+    return -row['points'], -row['wins'], row['seed']
+
+
+def advancing_players(stage: TournamentStage, groups: Dict[int, List[Dict]]) -> List[int]:
+    """Who goes through, in seed order for the next stage: group winners first, then runners-up, ..."""
+    quota = stage.advance // stage.groups
+    placed = [(place, row) for members in groups.values() for place, row in enumerate(members)]
+    through = [(place, row) for place, row in placed if place < quota]
+    rest = sorted(((place, row) for place, row in placed if place >= quota),
+                  key=lambda entry: (entry[0], _rank_key(entry[1])))
+    through.extend(rest[:stage.advance - len(through)])
+    through.sort(key=lambda entry: (entry[0], _rank_key(entry[1])))
+    return [row['player_id'] for _, row in through]
+
+
+def advance_stage(tournament: Tournament, stage_id: int) -> Tuple[List[int], bool]:
+    """Close the stage if all its results are in and materialise the next one (caller commits).
+
+    Returns (new match ids, whether the final is done). Does nothing while the stage still
+    has unplayed matches or once it has been closed.
+    """
+    stage = db.session.get(TournamentStage, stage_id)
+    if stage is None or stage.status != 'active':
+        return [], False
+    if db.session.query(Match.id).filter(Match.stage_id == stage_id, Match.winner_id.is_(None)).first():
+        return [], False
+    stage.status = 'done'
+    if stage.kind == 'final':
+        return [], True
+    advancers = advancing_players(stage, stage_rows([stage_id]).get(stage_id, {}))
+    StageEntry.query.filter(StageEntry.stage_id == stage_id, StageEntry.player_id.in_(advancers)).update(
+        {StageEntry.advanced: True}, synchronize_session=False)
+    following = TournamentStage.query.filter_by(tournament_id=tournament.id, position=stage.position + 1).one()
+    return _materialize(following, advancers, ensure_bot_ids(tournament, POD_SIZE)), False
+
+
+def delete_stages(tournament_id: int) -> None:
+    """Bulk-delete a tournament's stages and entries; run after its matches are gone (caller commits)."""
+    stage_ids = db.session.query(TournamentStage.id).filter(TournamentStage.tournament_id == tournament_id)
+    StageEntry.query.filter(StageEntry.stage_id.in_(stage_ids)).delete(synchronize_session=False)
+    TournamentStage.query.filter_by(tournament_id=tournament_id).delete()
@@ -0,0 +1,86 @@
+"""Player photo storage: the uploaded original plus small square thumbnails.
+
+Uploads are content-addressed: the file name is a hash of the bytes, so identical photos are
+stored once and a name never changes meaning (safe to cache forever).
+"""
+import hashlib
+import os
+import re
+from typing import Iterable
+from PIL import Image, ImageOps, features
+
+# Square edge lengths rendered by the templates (match cards, player list, profile)
+THUMBNAIL_SIZES = (24, 32, 128)
+
+# WebP where Pillow was built with it, JPEG otherwise
+THUMBNAIL_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+THUMBNAIL_EXT = '.webp' if THUMBNAIL_FORMAT == 'WEBP' else '.jpg'
+
+
+# Extension per Pillow format for stored originals
+FORMAT_EXTS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+CONTENT_NAME_RE = re.compile(r'^[0-9a-f]{32}\.[a-z]+$')
+
+
+def content_filename(data: bytes, image_format: str) -> str:
+    return hashlib.sha256(data).hexdigest()[:32] + FORMAT_EXTS.get((image_format or '').upper(), '.img')
+
+
+def is_content_filename(filename: str) -> bool:
+    return bool(CONTENT_NAME_RE.match(filename or ''))
+
+
+def store_image(data: bytes, img: Image.Image, folder: str) -> str:
+    """Store an upload under its content hash with thumbnails; returns the file name.
+
+    Nothing is written when the same content is already stored.
+    """
+    filename = content_filename(data, img.format)
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    if missing_thumbnails(folder, filename):
+        save_thumbnails(img, folder, filename)
+    return filename
+
+
+def remove_image(folder: str, filename: str) -> None:
+    """Delete a stored original and its thumbnails, ignoring files that are already gone."""
+    for name in [filename] + [thumbnail_filename(filename, size) for size in THUMBNAIL_SIZES]:
+        try:
+            os.remove(os.path.join(folder, name))
+        except FileNotFoundError:
+            pass
+
+
+def thumbnail_filename(filename: str, size: int) -> str:
+    base, _ = os.path.splitext(filename)
+    return f"{base}_{size}{THUMBNAIL_EXT}"
+
+
+def save_thumbnails(img: Image.Image, folder: str, filename: str, sizes: Iterable[int] = THUMBNAIL_SIZES) -> None:
+    """Write center-cropped square thumbnails of img next to the original upload.
+
+    Animated images contribute their current (first) frame.
+    """
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    if THUMBNAIL_FORMAT == 'WEBP' and has_alpha:
+        base = img.convert('RGBA')
+    else:
+        base = img.convert('RGB')
+    for size in sizes:
+        thumb = ImageOps.fit(base, (size, size), Image.LANCZOS)
+        path = os.path.join(folder, thumbnail_filename(filename, size))
+        if THUMBNAIL_FORMAT == 'WEBP':
+            thumb.save(path, 'WEBP', quality=80, method=4)
+        else:
+            thumb.save(path, 'JPEG', quality=85, optimize=True)
+
+
+def missing_thumbnails(folder: str, filename: str) -> bool:
+    return any(not os.path.exists(os.path.join(folder, thumbnail_filename(filename, size)))
+               for size in THUMBNAIL_SIZES)
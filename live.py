@@ -0,0 +1,232 @@
+"""Live tournament updates over Server-Sent Events.
+
+Routes publish small events (a re-rendered match card, the standings rows that changed, new
+rounds) as TournamentEvent rows in the same transaction as the change itself. Each worker
+process runs one poller thread that reads new rows for the tournaments it has viewers for and
+fans them out to in-memory queues, so the database sees one query per worker per poll rather
+than one per viewer. Because events go through the database, they reach viewers connected to
+any gunicorn worker.
+"""
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from flask import Response, g, render_template
+from sqlalchemy import func
+
+from app import app, db
+from metrics import span
+from models import Match, Player, Standing, Tournament, TournamentEvent
+from services import filter_humans, match_summary, statistics_from_standings
+
+QUEUE_SIZE = 256
+REPLAY_LIMIT = 500
+
+
+def publish(tournament_id: int, kind: str, payload: Dict) -> None:
+    """Queue an event for the tournament's viewers (caller commits)."""
+    db.session.add(TournamentEvent(tournament_id=tournament_id, kind=kind,
+                                   payload=json.dumps(payload, separators=(',', ':'))))
+
+
+def last_event_id(tournament_id: int) -> int:
+    """Newest event id for a tournament; pages embed it so their stream resumes right after the render."""
+    return db.session.query(func.max(TournamentEvent.id)).filter(
+        TournamentEvent.tournament_id == tournament_id).scalar() or 0
+
+
+def _player_map(matches: List[Match]) -> Dict[int, Player]:
+    ids = {pid for m in matches for pid in (m.player1_id, m.player2_id, m.player3_id, m.player4_id, m.winner_id) if pid}
+    return {p.id: p for p in Player.query.filter(Player.id.in_(ids))}
+
+
+@span('live.results_recorded')
+def results_recorded(tournament_id: int, matches: List[Match]) -> None:
+    """Publish re-rendered cards for recorded matches and the standings rows they changed."""
+    tournament = db.session.get(Tournament, tournament_id)
+    player_map = _player_map(matches)
+    # Viewers keep the card's header (and its position number); only the body changes
+    cards = {m.id: render_template('_match_card.html', match=m, match_number=None,
+                                   player_map=player_map, tournament=tournament) for m in matches}
+    publish(tournament_id, 'result', {'cards': cards, 'summary': match_summary(tournament_id)})
+
+    players = filter_humans([player_map[pid] for m in matches for pid in
+                             (m.player1_id, m.player2_id, m.player3_id, m.player4_id)])
+    players = list({p.id: p for p in players}.values())
+    standings = {s.player_id: s for s in Standing.query.filter(Standing.player_id.in_([p.id for p in players]))}
+    rows = [{'player_id': row['player'].id, 'name': row['player'].name, 'matches_played': row['matches_played'],
+             'wins': row['wins'], 'total_score': row['total_score'], 'avg_score': row['avg_score'],
+             'win_rate': row['win_rate'], 'rating': row['rating']} for row in statistics_from_standings(players, standings)]
+    publish(tournament_id, 'standings', {'rows': rows})
+
+
+@span('live.matches_created')
+def matches_created(tournament_id: int, match_ids: Iterable[int], kind: str = 'matches') -> None:
+    """Publish new round sections ('matches', or 'final' for the finals match).
+
+    Large schedules are announced without markup; viewers reload the page instead.
+    """
+    match_ids = list(match_ids)
+    summary = match_summary(tournament_id)
+    payload = {'summary': summary, 'html': None}
+    if len(match_ids) <= app.config['LIVE_MAX_PUSHED_MATCHES']:
+        matches = Match.query.filter(Match.id.in_(match_ids)).order_by(Match.round, Match.id).all()
+        payload['html'] = render_template('_rounds.html', matches=matches, player_map=_player_map(matches),
+                                          tournament=db.session.get(Tournament, tournament_id),
+                                          first_number=summary['total'] - len(matches) + 1)
+    publish(tournament_id, kind, payload)
+
+
+def status_changed(tournament_id: int, status: str) -> None:
+    publish(tournament_id, 'status', {'status': status})
+
+
+def reload_required(tournament_id: int) -> None:
+    """For changes too broad to patch (e.g. all matches reset)."""
+    publish(tournament_id, 'reload', {})
+
+
+class EventBroker:
+    """Per-process fan-out of TournamentEvent rows to subscribed viewer queues."""
+
+    def __init__(self):
+        self._subscribers: Dict[int, set] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.last_id: Optional[int] = None
+        self._last_prune = 0.0
+
+    def subscribe(self, tournament_id: int) -> queue.Queue:
+        """Register a viewer (call inside an app context) and make sure the poller runs."""
+        q = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            if self.last_id is None:
+                # Anything newer is delivered by the poller; anything older is the caller's replay
+                self.last_id = db.session.query(func.max(TournamentEvent.id)).scalar() or 0
+            self._subscribers.setdefault(tournament_id, set()).add(q)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='live-events', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, tournament_id: int, q: queue.Queue) -> None:
+        with self._lock:
+            viewers = self._subscribers.get(tournament_id)
+            if viewers is not None:
+                viewers.discard(q)
+                if not viewers:
+                    del self._subscribers[tournament_id]
+
+    def viewer_count(self) -> int:
+        with self._lock:
+            return sum(len(v) for v in self._subscribers.values())
+
+    def reset(self) -> None:
+        with self._lock:
+            self._subscribers.clear()
+            self.last_id = None
+
+    def poll(self) -> int:
+        """Deliver events newer than last_id to local viewers. Returns the number of rows read."""
+        with self._lock:
+            tournament_ids = list(self._subscribers)
+            if not tournament_ids:
+                self.last_id = None  # idle: stop querying until the next viewer arrives
+                return 0
+            since = self.last_id
+        with app.app_context():
+            g.sqlite_read_only = True
+            rows = (db.session.query(TournamentEvent.id, TournamentEvent.tournament_id,
+                                     TournamentEvent.kind, TournamentEvent.payload)
+                    .filter(TournamentEvent.id > since, TournamentEvent.tournament_id.in_(tournament_ids))
+                    .order_by(TournamentEvent.id).limit(REPLAY_LIMIT).all())
+        with self._lock:
+            if self.last_id is None:
+                return 0
+            for event_id, tournament_id, kind, payload in rows:
+                if event_id <= self.last_id:
+                    continue  # delivered by an overlapping poll
+                for q in self._subscribers.get(tournament_id, ()):
+                    self._deliver(q, (event_id, kind, payload))
+                self.last_id = event_id
+        return len(rows)
+
+    @staticmethod
+    def _deliver(q: queue.Queue, event) -> None:
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            # A viewer this far behind is better served by a fresh page
+            with q.mutex:
+                q.queue.clear()
+            q.put_nowait((event[0], 'reload', '{}'))
+
+    def prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=app.config['LIVE_EVENT_RETENTION_SECONDS'])
+        with app.app_context():
+            TournamentEvent.query.filter(TournamentEvent.created_at < cutoff).delete()
+            db.session.commit()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(app.config['LIVE_POLL_SECONDS'])
+            try:
+                self.poll()
+                if time.monotonic() - self._last_prune > 60:
+                    self._last_prune = time.monotonic()
+                    self.prune()
+            except Exception:  # keep the poller alive; viewers just see updates late
+                app.logger.exception('Live event poll failed')
+
+
+broker = EventBroker()
+
+
+def _format(event_id: int, kind: str, payload: str) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n"
+
+
+def event_stream(tournament_id: int, since: int) -> Response:
+    """SSE response for one viewer: replay events after `since`, then stream new ones.
+
+    Streams end after LIVE_STREAM_SECONDS so threads are recycled; the browser reconnects
+    with Last-Event-ID and nothing is missed.
+    """
+    q = broker.subscribe(tournament_id)
+    replay = (db.session.query(TournamentEvent.id, TournamentEvent.kind, TournamentEvent.payload)
+              .filter(TournamentEvent.tournament_id == tournament_id, TournamentEvent.id > since)
+              .order_by(TournamentEvent.id).limit(REPLAY_LIMIT + 1).all())
+    if len(replay) > REPLAY_LIMIT:
+        replay = [(replay[-1][0], 'reload', '{}')]
+    heartbeat = app.config['LIVE_HEARTBEAT_SECONDS']
+    lifetime = app.config['LIVE_STREAM_SECONDS']
+
+    def generate():
+        last = since
+        try:
+            yield "retry: 3000\n\n"
+            for event_id, kind, payload in replay:
+                last = event_id
+                yield _format(event_id, kind, payload)
+            deadline = time.monotonic() + lifetime
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event_id, kind, payload = q.get(timeout=min(heartbeat, remaining))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if event_id <= last:
+                    continue  # already sent during replay
+                last = event_id
+                yield _format(event_id, kind, payload)
+        finally:
+            broker.unsubscribe(tournament_id, q)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+    response.call_on_close(lambda: broker.unsubscribe(tournament_id, q))
+    return response
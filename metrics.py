@@ -0,0 +1,131 @@
+"""In-process request/SQL/span metrics rendered in the Prometheus text format.
+
+No client library: a few histograms and counters behind one lock are enough for this app.
+Each worker process keeps its own registry, so with several gunicorn workers a scrape shows
+the worker that answered it (scrape each worker, or run one worker when you need exact totals).
+"""
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from flask import g, has_request_context
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_lock = threading.Lock()
+# name -> (type, help, buckets or None, {labels tuple: value or [bucket counts..., sum, count]})
+_metrics = {}
+
+
+def _define(name: str, kind: str, help_text: str, buckets=None) -> str:
+    _metrics[name] = (kind, help_text, buckets, {})
+    return name
+
+
+REQUEST_SECONDS = _define('mariokart_request_duration_seconds', 'histogram',
+                          'Request handling time by endpoint and method.', LATENCY_BUCKETS)
+REQUESTS = _define('mariokart_requests_total', 'counter', 'Requests by endpoint, method and status.')
+REQUEST_SQL = _define('mariokart_request_sql_statements', 'histogram',
+                      'SQL statements issued per request.', COUNT_BUCKETS)
+REQUEST_DB_SECONDS = _define('mariokart_request_db_seconds', 'histogram',
+                             'Time spent executing SQL per request.', LATENCY_BUCKETS)
+SPAN_SECONDS = _define('mariokart_span_duration_seconds', 'histogram',
+                       'Time spent in named service spans and template rendering.', LATENCY_BUCKETS)
+
+
+def inc(name: str, labels: tuple, amount: float = 1) -> None:
+    with _lock:
+        series = _metrics[name][3]
+        series[labels] = series.get(labels, 0) + amount
+
+
+def observe(name: str, labels: tuple, value: float) -> None:
+    buckets = _metrics[name][2]
+    with _lock:
+        series = _metrics[name][3]
+        counts = series.get(labels)
+        if counts is None:
+            counts = series[labels] = [0] * (len(buckets) + 2)
+        i = bisect_left(buckets, value)
+        if i < len(buckets):
+            counts[i] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+
+def reset() -> None:
+    with _lock:
+        for _, _, _, series in _metrics.values():
+            series.clear()
+
+
+_LABEL_NAMES = {
+    REQUEST_SECONDS: ('endpoint', 'method'),
+    REQUESTS: ('endpoint', 'method', 'status'),
+    REQUEST_SQL: ('endpoint',),
+    REQUEST_DB_SECONDS: ('endpoint',),
+    SPAN_SECONDS: ('span',),
+}
+
+
+def _label_text(name: str, labels: tuple, extra: str = '') -> str:
+    pairs = [f'{key}="{value}"' for key, value in zip(_LABEL_NAMES[name], labels)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render_prometheus() -> str:
+    lines = []
+    with _lock:
+        for name, (kind, help_text, buckets, series) in _metrics.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(series.items()):
+                if kind == 'counter':
+                    lines.append(f'{name}{_label_text(name, labels)} {value:g}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    le = 'le="%g"' % bound
+                    lines.append(f'{name}_bucket{_label_text(name, labels, le)} {cumulative}')
+                le = 'le="+Inf"'
+                lines.append(f'{name}_bucket{_label_text(name, labels, le)} {value[-1]}')
+                lines.append(f'{name}_sum{_label_text(name, labels)} {value[-2]:.6f}')
+                lines.append(f'{name}_count{_label_text(name, labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+class span:
+    """Time a block or function as a named span.
+
+    Usable as `with span('planner.plan_groups'):` or as a decorator. Durations go to the span
+    histogram and, inside a request, to g.spans for the slow-request log.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_span(self.name, time.perf_counter() - self._start)
+        return False
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(self.name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+def record_span(name: str, seconds: float) -> None:
+    observe(SPAN_SECONDS, (name,), seconds)
+    if has_request_context():
+        g.setdefault('spans', []).append((name, seconds))
@@ -0,0 +1,252 @@
+"""Versioned schema and data migrations for databases created by older versions of the app.
+
+db.create_all() only creates missing tables, so column, index and data changes to existing
+tables live here as numbered steps. The database's PRAGMA user_version records the last step
+applied. run_migrations applies newer steps at startup (unless AUTO_MIGRATE=0), and
+`flask --app app migrate` applies them on demand. Every step is also idempotent, so a fresh
+database (already at the latest schema) or two processes migrating at once come to no harm.
+Steps run before later columns exist, so they use raw SQL or column-only queries unless
+every column of the models they load is in place.
+"""
+import os
+import click
+from PIL import Image
+from sqlalchemy import text
+from app import app, db
+from images import is_content_filename, missing_thumbnails, remove_image, save_thumbnails, store_image
+from constants import BOT_PREFIX
+from models import Player, Season, Tournament
+from services import backfill_standings, rebuild_all_ratings, rebuild_ratings, rebuild_season, touch_tournament
+
+
+def add_missing_column(table: str, column: str, ddl: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN when an existing table predates a model column."""
+    existing = {row[1] for row in db.session.execute(text(f'PRAGMA table_info("{table}")'))}
+    if column in existing:
+        return False
+    db.session.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+    db.session.commit()
+    return True
+
+
+def create_index(name: str, table: str, columns: str) -> None:
+    db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({columns})'))
+    db.session.commit()
+
+
+def create_listing_indexes() -> None:
+    """Indexes behind the index page's filters and the detail page's round paging
+    (create_all skips tables that already exist)."""
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_tournament_status_id ON tournament (status, id)'))
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_tournament_name_nocase ON tournament (name COLLATE NOCASE)'))
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_match_tournament_round ON "match" (tournament_id, round)'))
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_player_tournament_bot ON player (tournament_id, is_bot)'))
+    db.session.commit()
+
+
+def backfill_bot_flags() -> int:
+    """Flag the planner's bots, which older databases only marked with BOT_PREFIX in the name."""
+    result = db.session.execute(text("UPDATE player SET is_bot = 1 WHERE substr(name, 1, :n) = :prefix"),
+                                {'n': len(BOT_PREFIX), 'prefix': BOT_PREFIX})
+    db.session.commit()
+    return result.rowcount
+
+
+def backfill_match_participants() -> int:
+    """Create MatchParticipant rows for matches that predate the participants table."""
+    slots = ' UNION ALL '.join(
+        f'SELECT m.player{n}_id, m.id, {n}, m.score{n} FROM "match" m '
+        f'WHERE NOT EXISTS (SELECT 1 FROM match_participant mp WHERE mp.match_id = m.id)'
+        for n in range(1, 5)
+    )
+    result = db.session.execute(text(
+        f'INSERT OR IGNORE INTO match_participant (player_id, match_id, slot, score) {slots}'
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def backfill_thumbnails() -> int:
+    """Generate thumbnails for uploads saved before thumbnails existed. Returns files processed."""
+    folder = app.config['UPLOAD_FOLDER']
+    done = 0
+    filenames = db.session.query(Player.image_filename).filter(Player.image_filename.isnot(None)).distinct()
+    for (filename,) in filenames:
+        path = os.path.join(folder, filename)
+        if not os.path.exists(path) or not missing_thumbnails(folder, filename):
+            continue
+        try:
+            with Image.open(path) as img:
+                img.load()
+                save_thumbnails(img, folder, filename)
+            done += 1
+        except (OSError, ValueError):
+            # Skip unreadable legacy files; a new upload replaces them
+            continue
+    return done
+
+
+def migrate_uploads_to_content_names() -> int:
+    """Move uploads saved as t{tournament}_p{player}.ext to content-hash names, merging byte-identical
+    files, and repoint every Player at the new name. Returns the number of old names converted."""
+    db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_player_image_filename ON player (image_filename)'))
+    folder = app.config['UPLOAD_FOLDER']
+    converted = 0
+    filenames = [f for (f,) in db.session.query(Player.image_filename).filter(
+        Player.image_filename.isnot(None)).distinct()]
+    for old_name in filenames:
+        if is_content_filename(old_name):
+            continue
+        path = os.path.join(folder, old_name)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            with Image.open(path) as img:
+                img.load()
+                new_name = store_image(data, img, folder)
+        except (OSError, ValueError):
+            # Skip unreadable legacy files; a new upload replaces them
+            continue
+        Player.query.filter_by(image_filename=old_name).update({Player.image_filename: new_name})
+        db.session.commit()
+        remove_image(folder, old_name)
+        converted += 1
+    db.session.commit()
+    return converted
+
+
+@app.cli.command('rebuild-ratings')
+@click.option('--tournament', 'tournament_id', type=int, help='Only this tournament (default: all).')
+def rebuild_ratings_command(tournament_id):
+    """Recompute player ratings by replaying recorded matches."""
+    if tournament_id is None:
+        click.echo(f"Rebuilt ratings for {rebuild_all_ratings()} tournament(s).")
+    else:
+        rebuild_ratings(tournament_id)
+        touch_tournament(tournament_id)
+        db.session.commit()
+        click.echo(f"Rebuilt ratings for tournament {tournament_id}.")
+
+
+@app.cli.command('rebuild-seasons')
+@click.option('--season', 'season_id', type=int, help='Only this season (default: all).')
+def rebuild_seasons_command(season_id):
+    """Recompute season leaderboards from their completed tournaments."""
+    season_ids = [season_id] if season_id is not None else [sid for (sid,) in db.session.query(Season.id)]
+    for sid in season_ids:
+        rebuild_season(sid)
+    # Like every other write to a tournament's data, move the version of the season's tournaments
+    for (tid,) in db.session.query(Tournament.id).filter(Tournament.season_id.in_(season_ids)):
+        touch_tournament(tid)
+    db.session.commit()
+    click.echo(f"Rebuilt {len(season_ids)} season leaderboard(s).")
+
+
+def add_tournament_versioning() -> None:
+    add_missing_column('tournament', 'version', 'INTEGER NOT NULL DEFAULT 0')
+    add_missing_column('tournament', 'updated_at', 'DATETIME')
+
+
+def add_standing_ratings() -> None:
+    if add_missing_column('standing', 'rating', 'FLOAT NOT NULL DEFAULT 1500.0'):
+        rebuild_all_ratings()
+
+
+def add_station_columns() -> None:
+    add_missing_column('tournament', 'slot_minutes', 'INTEGER')
+    add_missing_column('match', 'station', 'INTEGER')
+    add_missing_column('match', 'time_slot', 'INTEGER')
+
+
+def add_bot_flags() -> None:
+    if add_missing_column('player', 'is_bot', 'BOOLEAN NOT NULL DEFAULT 0'):
+        backfill_bot_flags()
+
+
+def create_hot_path_indexes() -> None:
+    """Results, summaries and station queues filter a tournament's matches on winner_id."""
+    create_index('ix_match_tournament_winner', 'match', 'tournament_id, winner_id')
+
+
+def add_season_columns() -> None:
+    """Season links on existing tournament and player tables (the season tables themselves come from create_all)."""
+    add_missing_column('tournament', 'season_id', 'INTEGER REFERENCES season (id)')
+    add_missing_column('tournament', 'rolled_up_at', 'DATETIME')
+    add_missing_column('player', 'identity_id', 'INTEGER REFERENCES player_identity (id)')
+    create_index('ix_tournament_season_id', 'tournament', 'season_id')
+    create_index('ix_player_identity_id', 'player', 'identity_id')
+
+
+def add_stage_columns() -> None:
+    """Format stage links on existing tournament and match tables (stage tables come from create_all)."""
+    add_missing_column('tournament', 'format', 'VARCHAR(10)')
+    add_missing_column('match', 'stage_id', 'INTEGER REFERENCES tournament_stage (id)')
+    create_index('ix_match_stage_id', 'match', 'stage_id')
+
+
+# (version, description, step) in order; append new steps, never renumber or edit applied ones
+MIGRATIONS = (
+    (1, 'tournament version and updated_at', add_tournament_versioning),
+    (2, 'standing ratings', add_standing_ratings),
+    (3, 'station scheduling columns', add_station_columns),
+    (4, 'player bot flags', add_bot_flags),
+    (5, 'listing indexes', create_listing_indexes),
+    (6, 'match participant rows', backfill_match_participants),
+    (7, 'persisted standings', backfill_standings),
+    (8, 'match (tournament_id, winner_id) index', create_hot_path_indexes),
+    (9, 'season leaderboards', add_season_columns),
+    (10, 'multi-stage formats', add_stage_columns),
+)
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version() -> int:
+    return db.session.execute(text('PRAGMA user_version')).scalar()
+
+
+def set_schema_version(version: int) -> None:
+    db.session.execute(text(f'PRAGMA user_version = {int(version)}'))
+    db.session.commit()
+
+
+def apply_migrations() -> list:
+    """Run the steps newer than the database's version. Returns the versions applied."""
+    applied = []
+    current = schema_version()
+    for version, description, step in MIGRATIONS:
+        if version <= current:
+            continue
+        step()
+        set_schema_version(version)
+        app.logger.info('Applied migration %d: %s', version, description)
+        applied.append(version)
+    return applied
+
+
+def run_maintenance() -> None:
+    """File-based upkeep that depends on the upload folder rather than the schema; runs every startup."""
+    migrate_uploads_to_content_names()
+    backfill_thumbnails()
+
+
+def run_migrations() -> None:
+    apply_migrations()
+    run_maintenance()
+
+
+@app.cli.command('migrate')
+@click.option('--status', is_flag=True, help='Only show the schema version.')
+def migrate_command(status):
+    """Apply pending schema migrations."""
+    current = schema_version()
+    if status:
+        pending = [f"{version}: {description}" for version, description, _ in MIGRATIONS if version > current]
+        click.echo(f"Schema version {current} of {LATEST_VERSION}.")
+        for line in pending:
+            click.echo(f"  pending {line}")
+        return
+    applied = apply_migrations()
+    run_maintenance()
+    click.echo(f"Applied {len(applied)} migration(s); schema version {schema_version()}.")
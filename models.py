@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from constants import RATING_INITIAL
 
 db = SQLAlchemy()
 
@@ -8,14 +9,35 @@ class Tournament(db.Model):
     name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='active')  # 'active', 'completed'
+    # Bumped by every change to the tournament, its players or matches; keys page caches and ETags
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Length of one station time slot, set when matches are scheduled onto stations
+    slot_minutes = db.Column(db.Integer, nullable=True)
+    # Season whose leaderboard this tournament counts towards; rolled_up_at is set once its
+    # results are in that leaderboard (services.roll_up_tournament)
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), nullable=True, index=True)
+    rolled_up_at = db.Column(db.DateTime, nullable=True)
+    # Multi-stage format run by formats.py ('micro' ... 'mega'); NULL for hand-planned tournaments
+    format = db.Column(db.String(10), nullable=True)
     players = db.relationship('Player', backref='tournament', lazy=True)
     matches = db.relationship('Match', backref='tournament', lazy=True)
+    # Index page: status filter walks (status, id) in keyset order; name search is a case-insensitive prefix
+    __table_args__ = (db.Index('ix_tournament_status_id', 'status', 'id'),)
+
+db.Index('ix_tournament_name_nocase', db.collate(Tournament.name, 'NOCASE'))
 
 class Player(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
-    image_filename = db.Column(db.String(255), nullable=True)  # stored in static/uploads
+    image_filename = db.Column(db.String(255), nullable=True, index=True)  # content-hash name in static/uploads
+    # Planner-created fill-ins; set at creation (names keep the BOT_PREFIX for display)
+    is_bot = db.Column(db.Boolean, nullable=False, default=False, server_default='0')
+    # The same person in other tournaments; linked by name when a season rollup takes this tournament
+    identity_id = db.Column(db.Integer, db.ForeignKey('player_identity.id'), nullable=True, index=True)
+    # Humans-only and bots-only lookups for a tournament
+    __table_args__ = (db.Index('ix_player_tournament_bot', 'tournament_id', 'is_bot'),)
 
 class Match(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -30,8 +52,100 @@ class Match(db.Model):
     score4 = db.Column(db.Integer, nullable=True)
     winner_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    # Console and time slot from the station scheduler (services.assign_stations); NULL until scheduled
+    station = db.Column(db.Integer, nullable=True)
+    time_slot = db.Column(db.Integer, nullable=True)
+    # Format stage this match belongs to (formats.py); NULL for hand-planned matches
+    stage_id = db.Column(db.Integer, db.ForeignKey('tournament_stage.id'), nullable=True, index=True)
     player1 = db.relationship('Player', foreign_keys=[player1_id])
     player2 = db.relationship('Player', foreign_keys=[player2_id])
     player3 = db.relationship('Player', foreign_keys=[player3_id])
     player4 = db.relationship('Player', foreign_keys=[player4_id])
     winner = db.relationship('Player', foreign_keys=[winner_id])
+    participants = db.relationship('MatchParticipant', backref='match', cascade='all, delete-orphan')
+    # Detail page and /rounds fragments walk a tournament's matches in round order; results,
+    # summaries and station queues split them on winner_id
+    __table_args__ = (db.Index('ix_match_tournament_round', 'tournament_id', 'round'),
+                      db.Index('ix_match_tournament_winner', 'tournament_id', 'winner_id'))
+
+class MatchParticipant(db.Model):
+    """One row per player in a Match so per-player lookups use an index instead of OR-ing four columns."""
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    match_id = db.Column(db.Integer, db.ForeignKey('match.id'), primary_key=True, index=True)
+    slot = db.Column(db.Integer, nullable=False)  # 1-4, matches Match.playerN_id / scoreN
+    score = db.Column(db.Integer, nullable=True)
+
+class Standing(db.Model):
+    """Running per-player totals, updated alongside every recorded Match result."""
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False, index=True)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    matches_played = db.Column(db.Integer, nullable=False, default=0)
+    # Elo-style rating from finishing positions, applied in recording order (services.update_ratings)
+    rating = db.Column(db.Float, nullable=False, default=RATING_INITIAL, server_default=str(RATING_INITIAL))
+    player = db.relationship('Player', backref=db.backref('standing', uselist=False))
+
+class TournamentEvent(db.Model):
+    """A live update for viewers of a tournament, streamed over SSE by live.py and pruned after a while."""
+    __table_args__ = {'sqlite_autoincrement': True}  # ids never reused, so pollers can resume from the last id
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'result', 'standings', 'matches', 'final', 'status', 'reload'
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class Season(db.Model):
+    """A series of tournaments that share one leaderboard."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    tournaments = db.relationship('Tournament', backref='season', lazy=True)
+
+class PlayerIdentity(db.Model):
+    """A person across tournaments, matched by name (case-insensitive); each tournament has its own Player rows."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    players = db.relationship('Player', backref='identity', lazy=True)
+
+db.Index('ix_player_identity_name_nocase', db.collate(PlayerIdentity.name, 'NOCASE'), unique=True)
+
+class SeasonStanding(db.Model):
+    """Season totals per identity, added to as each of the season's tournaments ends, so the
+    leaderboard never reads matches."""
+    season_id = db.Column(db.Integer, db.ForeignKey('season.id'), primary_key=True)
+    identity_id = db.Column(db.Integer, db.ForeignKey('player_identity.id'), primary_key=True)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    matches_played = db.Column(db.Integer, nullable=False, default=0)
+    podiums = db.Column(db.Integer, nullable=False, default=0)  # top 3 finishes
+    identity = db.relationship('PlayerIdentity')
+    # Leaderboard walks a season by points
+    __table_args__ = (db.Index('ix_season_standing_season_points', 'season_id', 'points'),)
+
+class TournamentStage(db.Model):
+    """One phase of a multi-stage format: pools, an elimination round or the final.
+
+    The whole chain is created when the format starts; a stage's entries and matches only when
+    the stage before it is done (formats.advance_stage).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournament.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 1, 2, ... in playing order
+    kind = db.Column(db.String(10), nullable=False)  # 'pool', 'knockout', 'final'
+    name = db.Column(db.String(50), nullable=False)
+    entrants = db.Column(db.Integer, nullable=False)
+    groups = db.Column(db.Integer, nullable=False)  # pools, or 4-player pods for knockout and final
+    games = db.Column(db.Integer, nullable=False)  # matches per player
+    advance = db.Column(db.Integer, nullable=False)  # players going through to the next stage
+    status = db.Column(db.String(10), nullable=False, default='pending')  # 'pending', 'active', 'done'
+    __table_args__ = (db.Index('ix_tournament_stage_position', 'tournament_id', 'position'),)
+
+class StageEntry(db.Model):
+    """A player's seed and pool (or pod) in a stage, and whether they went through."""
+    stage_id = db.Column(db.Integer, db.ForeignKey('tournament_stage.id'), primary_key=True)
+    player_id = db.Column(db.Integer, db.ForeignKey('player.id'), primary_key=True)
+    group_number = db.Column(db.Integer, nullable=False)
+    seed = db.Column(db.Integer, nullable=False)
+    advanced = db.Column(db.Boolean, nullable=False, default=False)
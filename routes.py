@@ -1,28 +1,80 @@
-from flask import render_template, request, redirect, url_for
-from app import app, db
-from models import Tournament, Player, Match
+from flask import Response, render_template, request, redirect, url_for, jsonify, send_from_directory, stream_with_context
+from app import app, db, writes_database
+from models import Tournament, Player, Match, Standing, TournamentEvent, Season, TournamentStage
 import random
-from sqlalchemy import or_
-from constants import POSITION_POINTS, BOT_PREFIX
-from validators import sanitize_name, is_allowed_image, clamp_int
+from sqlalchemy import or_, func, distinct
+from constants import ROUNDS_PAGE_SIZE, UPLOAD_CACHE_SECONDS
+from validators import sanitize_name, open_allowed_image, clamp_int, parse_result, result_rows_from_csv, result_rows_from_json, rank_by_arg
 from services import (
-    ensure_bots,
-    human_distribution,
-    take_distinct,
+    plan_groups,
+    swiss_pairings,
+    assign_stations,
+    appearance_counts,
+    existing_pair_counts,
     player_in_any_match,
+    player_match_history,
+    head_to_head,
+    create_match,
+    set_match_result,
+    bulk_create_matches,
+    final_among,
+    load_matches_by_id,
+    update_standings_batch,
+    delete_tournament_matches,
+    release_images,
+    touch_tournament,
     filter_humans,
-    totals_for_player_ids,
+    is_bot_name,
+    human_players,
+    ensure_bot_ids,
+    forget_bot_ids,
     top_n_players_by_totals,
-    find_match_with_exact_players,
-    compute_player_statistics,
+    top_n_players_by_rating,
+    finals_odds,
+    find_tournament_match_with_players,
+    next_round_number,
+    load_standings,
+    match_scores,
+    match_player_ids,
+    update_standings,
+    clear_standings,
+    statistics_from_standings,
+    statistics_from_columns,
+    tournament_snapshot,
+    roll_up_tournament,
+    rebuild_season,
+    set_tournament_season,
+    season_leaderboard,
+    tournament_index_page,
+    match_summary,
+    round_page,
+    matches_in_rounds,
+    match_numbers_before,
 )
-from werkzeug.utils import secure_filename
+from images import store_image
+from caching import cached_tournament_page
+from metrics import render_prometheus
+import formats
+import live
+import transfer
 import os
 
 @app.route('/')
 def index():
-    tournaments = Tournament.query.all()
-    return render_template('index.html', tournaments=tournaments)
+    """Tournaments newest first, a page at a time, optionally filtered by name prefix and status."""
+    search = sanitize_name(request.args.get('q')) or None
+    status = request.args.get('status')
+    if status not in ('active', 'completed'):
+        status = None
+    before = request.args.get('before', type=int)
+    after = request.args.get('after', type=int)
+    tournaments, has_older, has_newer = tournament_index_page(before=before, after=after,
+                                                              search=search, status=status)
+    filters = {k: v for k, v in (('q', search), ('status', status)) if v}
+    older_url = url_for('index', before=tournaments[-1].id, **filters) if has_older and tournaments else None
+    newer_url = url_for('index', after=tournaments[0].id, **filters) if has_newer and tournaments else None
+    return render_template('index.html', tournaments=tournaments, search=search or '', status=status,
+                           older_url=older_url, newer_url=newer_url)
 
 @app.route('/create_tournament', methods=['POST'])
 def create_tournament():
@@ -35,47 +87,118 @@ def create_tournament():
     return redirect(url_for('tournament_detail', tournament_id=tournament.id))
 
 @app.route('/tournament/<int:tournament_id>')
+@cached_tournament_page
 def tournament_detail(tournament_id):
+    """Players, the match summary and the first page of unplayed rounds; completed rounds and
+    later pages load on demand from /rounds."""
     tournament = Tournament.query.get_or_404(tournament_id)
     players = Player.query.filter_by(tournament_id=tournament_id).all()
     # Separate humans from bots for UI convenience
     human_players = filter_humans(players)
     bot_players = [p for p in players if p not in human_players]
-    matches = Match.query.filter_by(tournament_id=tournament_id).order_by(Match.round).all()
+    summary = match_summary(tournament_id)
+    rounds, next_pending = round_page(tournament_id, 'pending')
+    matches = matches_in_rounds(tournament_id, rounds)
     # Detect finals match: a match whose 4 players are the current top 4 humans by totals
-    top4 = top_n_players_by_totals(human_players, matches, 4)
-    top4_ids = [p.id for p in top4]
-    finals_match = find_match_with_exact_players(matches, set(top4_ids)) if len(top4_ids) == 4 else None
+    top4 = top_n_players_by_totals(human_players, load_standings(tournament_id), 4)
+    top4_ids = {p.id for p in top4}
+    finals_match = find_tournament_match_with_players(tournament_id, top4_ids) if len(top4_ids) == 4 else None
     finals_exists = finals_match is not None
-    champion_name = finals_match.winner.name if finals_match and finals_match.winner else None
-    return render_template('tournament_detail.html', tournament=tournament, players=players, human_players=human_players, bot_players=bot_players, matches=matches, finals_exists=finals_exists, champion_name=champion_name)
+    # Templates resolve match players through this map instead of the lazy Match relationships
+    player_map = {p.id: p for p in players}
+    champion = player_map.get(finals_match.winner_id) if finals_match else None
+    champion_name = champion.name if champion else None
+    format_choices = [(name, formats.FORMATS[name][0]) for name in formats.available_formats(len(human_players))]
+    return render_template('tournament_detail.html', tournament=tournament, players=players, human_players=human_players, bot_players=bot_players,
+                           summary=summary, format_choices=format_choices, matches=matches, round_offsets=match_numbers_before(tournament_id, rounds),
+                           next_pending=next_pending, player_map=player_map, finals_exists=finals_exists, champion_name=champion_name,
+                           live_since=live.last_event_id(tournament_id))
+
+
+@app.route('/tournament/<int:tournament_id>/rounds')
+def tournament_rounds(tournament_id):
+    """A page of 'completed' (default) or 'pending' rounds after the `after` round, as HTML
+    match cards or, with format=json, as data. The next page's cursor is in X-Next-After
+    (HTML) or next_after (JSON)."""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    state = 'pending' if request.args.get('state') == 'pending' else 'completed'
+    limit = clamp_int(request.args.get('limit', ROUNDS_PAGE_SIZE, type=int), 1, 100)
+    rounds, next_after = round_page(tournament_id, state, request.args.get('after', type=int), limit)
+    matches = matches_in_rounds(tournament_id, rounds)
+    offsets = match_numbers_before(tournament_id, rounds)
+    player_ids = {pid for m in matches for pid in match_player_ids(m)}
+    player_map = {p.id: p for p in Player.query.filter(Player.id.in_(player_ids))} if player_ids else {}
+
+    if request.args.get('format') == 'json':
+        by_round = {}
+        for match in matches:
+            by_round.setdefault(match.round, []).append(match)
+        return jsonify(state=state, next_after=next_after, rounds=[{
+            'round': round_num,
+            'matches': [{
+                'id': m.id,
+                'number': offsets[round_num] + i,
+                'winner_id': m.winner_id,
+                'players': [{'id': pid, 'name': player_map[pid].name, 'score': score}
+                            for pid, score in zip(match_player_ids(m), match_scores(m))],
+            } for i, m in enumerate(round_matches, start=1)],
+        } for round_num, round_matches in by_round.items()])
+
+    response = app.make_response(render_template(
+        '_rounds.html', matches=matches, round_offsets=offsets, player_map=player_map, tournament=tournament))
+    if next_after is not None:
+        response.headers['X-Next-After'] = str(next_after)
+    return response
 
 @app.route('/tournament/<int:tournament_id>/add_player', methods=['POST'])
 def add_player(tournament_id):
     name = sanitize_name(request.form.get('name'))
     if not name:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Player name cannot be empty.', cat='danger'))
-    if name.startswith(BOT_PREFIX):
+    if is_bot_name(name):
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Name cannot start with BOT prefix.', cat='danger'))
     # Handle optional image upload
     image_file = request.files.get('image')
     filename = None
     if image_file and image_file.filename:
-        if not is_allowed_image(image_file):
+        img = open_allowed_image(image_file)
+        if img is None:
             return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Invalid image file.', cat='danger'))
-        safe = secure_filename(image_file.filename)
-        # Prefix with tournament and player name to reduce collisions
-        base, ext = os.path.splitext(safe)
-        filename = f"t{tournament_id}_{base}{ext}"
-        image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        image_file.save(image_path)
+        # Stored under a content hash, so identical photos share one file
+        filename = store_image(image_file.stream.read(), img, app.config['UPLOAD_FOLDER'])
 
     player = Player(name=name, tournament_id=tournament_id, image_filename=filename)
     db.session.add(player)
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
 
+@app.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    """Serve player photos. Names are content hashes, so responses never go stale."""
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename,
+                                   max_age=UPLOAD_CACHE_SECONDS, etag=os.path.splitext(filename)[0])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/tournament/<int:tournament_id>/events')
+def tournament_events(tournament_id):
+    """Server-Sent Events stream of live updates for the detail and results pages."""
+    Tournament.query.get_or_404(tournament_id)
+    since = max(request.args.get('since', 0, type=int),
+                request.headers.get('Last-Event-ID', 0, type=int))
+    return live.event_stream(tournament_id, since)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Request latency, SQL and span metrics for this worker in the Prometheus text format."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/tournament/<int:tournament_id>/player/<int:player_id>/upload', methods=['POST'])
 def upload_player_image(tournament_id, player_id):
     """Upload/replace a player's photo."""
@@ -85,68 +208,59 @@ def upload_player_image(tournament_id, player_id):
     image_file = request.files.get('image')
     if not image_file or not image_file.filename:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='No image selected.', cat='warning'))
-    if not is_allowed_image(image_file):
+    img = open_allowed_image(image_file)
+    if img is None:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Invalid image file.', cat='danger'))
-    safe = secure_filename(image_file.filename)
-    base, ext = os.path.splitext(safe)
-    filename = f"t{tournament_id}_p{player_id}{ext}"
-    image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    image_file.save(image_path)
-    player.image_filename = filename
+    previous = player.image_filename
+    player.image_filename = store_image(image_file.stream.read(), img, app.config['UPLOAD_FOLDER'])
+    touch_tournament(tournament_id)
     db.session.commit()
+    release_images([previous], app.config['UPLOAD_FOLDER'])
     return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Player photo updated.', cat='success'))
 
+@app.route('/tournament/<int:tournament_id>/player/<int:player_id>')
+def player_detail(tournament_id, player_id):
+    """Match history and head-to-head record for one player."""
+    player = Player.query.get_or_404(player_id)
+    if player.tournament_id != tournament_id:
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id))
+    history = player_match_history(player_id)
+    meetings = head_to_head(player_id)
+    opponents = {p.id: p for p in Player.query.filter(Player.id.in_(list(meetings))).all()}
+    rivals = sorted(((opponents[oid], rec) for oid, rec in meetings.items() if oid in opponents),
+                    key=lambda x: x[1]['meetings'], reverse=True)
+    return render_template('player_detail.html', tournament=player.tournament, player=player,
+                           history=history, rivals=rivals)
+
 @app.route('/tournament/<int:tournament_id>/generate_bracket')
+@writes_database
 def generate_bracket(tournament_id):
     tournament = Tournament.query.get_or_404(tournament_id)
-    players = filter_humans(Player.query.filter_by(tournament_id=tournament_id).all())
+    players = human_players(tournament_id)
     if len(players) < 4:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
-    # Get existing matches to track player pairings
-    existing_matches = Match.query.filter_by(tournament_id=tournament_id).all()
-    next_round = max([m.round for m in existing_matches], default=0) + 1
-
-    # Calculate player statistics for balanced matching
-    player_stats = {}
-    for player in players:
-        player_matches = [m for m in existing_matches if m.player1_id == player.id or m.player2_id == player.id or
-                         m.player3_id == player.id or m.player4_id == player.id]
-
-        total_score = 0
-        wins = 0
-        matches_played = len(player_matches)
-
-        for match in player_matches:
-            if match.player1_id == player.id and match.score1:
-                total_score += match.score1
-                if match.winner_id == player.id:
-                    wins += 1
-            elif match.player2_id == player.id and match.score2:
-                total_score += match.score2
-                if match.winner_id == player.id:
-                    wins += 1
-            elif match.player3_id == player.id and match.score3:
-                total_score += match.score3
-                if match.winner_id == player.id:
-                    wins += 1
-            elif match.player4_id == player.id and match.score4:
-                total_score += match.score4
-                if match.winner_id == player.id:
-                    wins += 1
-
-        avg_score = total_score / matches_played if matches_played > 0 else 0
-
-        player_stats[player.id] = {
-            'player': player,
-            'matches_played': matches_played,
-            'total_score': total_score,
-            'avg_score': avg_score,
-            'wins': wins
-        }
-
-    # Sort players by performance for balanced grouping
-    sorted_players = sorted(player_stats.values(), key=lambda x: (x['total_score'], x['wins'], x['avg_score']), reverse=True)
+    next_round = next_round_number(tournament_id)
+    created = []
+    snapshot = tournament_snapshot(tournament_id)
+
+    # Player statistics for balanced matching, already sorted by performance: points (single
+    # vectorized pass) or, with ?rank_by=rating, the persisted ratings
+    if rank_by_arg(request.args.get('rank_by')) == 'rating':
+        sorted_players = statistics_from_standings(players, load_standings(tournament_id), rank_by='rating')
+    else:
+        sorted_players = statistics_from_columns(players, snapshot)
+
+    if request.args.get('pairing') == 'swiss':
+        # Swiss round: everyone plays, in pods of similar standing that avoid repeat opponents
+        ranked_ids = [row['player'].id for row in sorted_players]
+        bot_ids = ensure_bot_ids(tournament) if len(ranked_ids) % 4 else []
+        groups, _ = swiss_pairings(ranked_ids, existing_pair_counts(tournament_id, snapshot), bot_ids)
+        match_ids = bulk_create_matches(tournament_id, next_round, groups, same_round=True)
+        live.matches_created(tournament_id, match_ids)
+        touch_tournament(tournament_id)
+        db.session.commit()
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
     # For final round (if this is the championship round), pair best vs best, worst vs worst
     if next_round > 1 and len(sorted_players) >= 8:  # Only for championship rounds
@@ -155,31 +269,18 @@ def generate_bracket(tournament_id):
         bottom_players = sorted_players[-4:]  # Bottom 4 players
 
         # Shuffle within groups to avoid same pairings
-        import random
         random.shuffle(top_players)
         random.shuffle(bottom_players)
 
         # Create top bracket matches
         for i in range(0, len(top_players), 4):
             if i + 3 < len(top_players):
-                match = Match(round=next_round,
-                            player1_id=top_players[i]['player'].id,
-                            player2_id=top_players[i+1]['player'].id,
-                            player3_id=top_players[i+2]['player'].id,
-                            player4_id=top_players[i+3]['player'].id,
-                            tournament_id=tournament_id)
-                db.session.add(match)
+                created.append(create_match(tournament_id, next_round, [s['player'].id for s in top_players[i:i+4]]))
 
         # Create bottom bracket matches
         for i in range(0, len(bottom_players), 4):
             if i + 3 < len(bottom_players):
-                match = Match(round=next_round,
-                            player1_id=bottom_players[i]['player'].id,
-                            player2_id=bottom_players[i+1]['player'].id,
-                            player3_id=bottom_players[i+2]['player'].id,
-                            player4_id=bottom_players[i+3]['player'].id,
-                            tournament_id=tournament_id)
-                db.session.add(match)
+                created.append(create_match(tournament_id, next_round, [s['player'].id for s in bottom_players[i:i+4]]))
     else:
         # Regular round: Create balanced groups
         # Shuffle players to mix up groupings
@@ -189,14 +290,11 @@ def generate_bracket(tournament_id):
         # Create matches with mixed skill levels
         for i in range(0, len(available_players), 4):
             if i + 3 < len(available_players):
-                match = Match(round=next_round,
-                            player1_id=available_players[i].id,
-                            player2_id=available_players[i+1].id,
-                            player3_id=available_players[i+2].id,
-                            player4_id=available_players[i+3].id,
-                            tournament_id=tournament_id)
-                db.session.add(match)
+                created.append(create_match(tournament_id, next_round, [p.id for p in available_players[i:i+4]]))
 
+    db.session.flush()
+    live.matches_created(tournament_id, [m.id for m in created])
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
@@ -213,98 +311,158 @@ def plan_schedule(tournament_id):
     except ValueError:
         games_per_player = 0
 
-    players = Player.query.filter_by(tournament_id=tournament_id).all()
+    players = human_players(tournament_id)
     # Allow planning with 2+ players; will fill with bots if needed
     if games_per_player <= 0 or len(players) < 2:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
-    existing_matches = Match.query.filter_by(tournament_id=tournament_id).all()
-    next_round = max([m.round for m in existing_matches], default=0) + 1
+    # Remaining appearances per player after already scheduled/played matches
+    snapshot = tournament_snapshot(tournament_id)
+    assigned = appearance_counts(tournament_id, snapshot)
+    needs = {p.id: max(0, games_per_player - assigned.get(p.id, 0)) for p in players}
+    if sum(needs.values()) < 2:
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
-    # Count already scheduled/played matches per player
-    assigned = {p.id: 0 for p in players}
-    for m in existing_matches:
-        for pid in (m.player1_id, m.player2_id, m.player3_id, m.player4_id):
-            if pid in assigned:
-                assigned[pid] += 1
+    bot_ids = ensure_bot_ids(tournament, 4)
 
-    # Determine target matches for each player
-    base_target = {p.id: games_per_player for p in players}
+    # Minimize matches, prefer the 3-human configuration and avoid repeat pairings
+    groups, report = plan_groups(needs, bot_ids, existing_pair_counts(tournament_id, snapshot))
 
-    # Build a working list of player IDs repeated (target - assigned) times
-    pool = []
-    for p in players:
-        need = max(0, base_target[p.id] - assigned[p.id])
-        pool.extend([p.id] * need)
+    # One round per match to separate them visually; inserted in bulk
+    match_ids = bulk_create_matches(tournament_id, next_round_number(tournament_id), groups)
 
-    random.shuffle(pool)
+    if groups:
+        live.matches_created(tournament_id, match_ids)
+        touch_tournament(tournament_id)
+        db.session.commit()
+        msg = (f"Planned {report['matches']} matches "
+               f"({report['repeat_pairings']} repeat pairings, {report['bot_fills']} bot slots).")
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg=msg, cat='success'))
 
-    bots = ensure_bots(tournament_id, 4)
+    return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
-    # Minimize matches, then prefer 3-human configuration
-    total_appearances = len(pool)
-    if total_appearances < 2:
-        return redirect(url_for('tournament_detail', tournament_id=tournament_id))
-    human_counts = human_distribution(total_appearances)
 
-    matches_created = 0
-    round_num = next_round
-    for target in human_counts:
-        if target <= 0:
-            continue
-        group = take_distinct(pool, min(target, 4))
-        # If not enough distinct to reach target, try a smaller target >=2
-        if len(group) < 2 and pool:
-            # Put back and reshuffle to try later
-            pool.extend(group)
-            random.shuffle(pool)
-            group = take_distinct(pool, 2)
-        # Fill with bots to 4
-        if len(group) < 4:
-            bot_ids = [b.id for b in bots]
-            bi = 0
-            while len(group) < 4:
-                group.append(bot_ids[bi % len(bot_ids)])
-                bi += 1
-        match = Match(round=round_num,
-                      player1_id=group[0],
-                      player2_id=group[1],
-                      player3_id=group[2],
-                      player4_id=group[3],
-                      tournament_id=tournament_id)
-        db.session.add(match)
-        matches_created += 1
-        # increment round after each match to separate visually
-        round_num += 1
-
-    # Any leftover appearances (due to distinct-constraint), drain with 3 or 2 humans, prefer 3
-    while pool:
-        target = 3 if len(pool) >= 3 else 2
-        group = take_distinct(pool, target)
-        if not group:
-            break
-        # Avoid 1-human matches
-        if len(group) < 2:
-            break
-        bot_ids = [b.id for b in bots]
-        bi = 0
-        while len(group) < 4:
-            group.append(bot_ids[bi % len(bot_ids)])
-            bi += 1
-        match = Match(round=round_num,
-                      player1_id=group[0],
-                      player2_id=group[1],
-                      player3_id=group[2],
-                      player4_id=group[3],
-                      tournament_id=tournament_id)
-        db.session.add(match)
-        matches_created += 1
-        round_num += 1
-
-    if matches_created > 0:
-        db.session.commit()
+@app.route('/tournament/<int:tournament_id>/start_format', methods=['POST'])
+def start_format(tournament_id):
+    """Run the tournament as a multi-stage format (formats.py): the recommended one for the
+    field, or the one named in 'format'. Only the first stage's matches are created now."""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    try:
+        match_ids = formats.start_format(tournament, request.form.get('format') or None)
+    except formats.FormatError as exc:
+        db.session.rollback()
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg=str(exc), cat='danger'))
+    live.matches_created(tournament_id, match_ids)
+    touch_tournament(tournament_id)
+    db.session.commit()
+    msg = f"{formats.FORMATS[tournament.format][0]} format started with {len(match_ids)} matches."
+    return redirect(url_for('tournament_stages', tournament_id=tournament_id, msg=msg, cat='success'))
 
-    return redirect(url_for('tournament_detail', tournament_id=tournament_id))
+
+@app.route('/tournament/<int:tournament_id>/stages')
+@cached_tournament_page
+def tournament_stages(tournament_id):
+    """The format's stage chain with each started stage's groups, stage points and who went through."""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    stages = TournamentStage.query.filter_by(tournament_id=tournament_id).order_by(TournamentStage.position).all()
+    tables = formats.stage_rows([s.id for s in stages if s.status != 'pending']) if stages else {}
+    return render_template('stages.html', tournament=tournament, stages=stages, tables=tables,
+                           format_label=formats.FORMATS[tournament.format][0] if tournament.format else None)
+
+
+@app.route('/tournament/<int:tournament_id>/schedule_stations', methods=['POST'])
+def schedule_stations(tournament_id):
+    """Assign the unplayed matches to consoles and time slots (see services.schedule_stations)."""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    try:
+        stations = clamp_int(int(request.form.get('stations', '0')), 1, 64)
+        slot_minutes = clamp_int(int(request.form.get('slot_minutes', '10')), 1, 180)
+        min_rest = clamp_int(int(request.form.get('min_rest', '0')), 0, 10)
+    except ValueError:
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id,
+                                msg='Stations, slot length and rest must be numbers.', cat='danger'))
+    report = assign_stations(tournament_id, stations, slot_minutes, min_rest)
+    touch_tournament(tournament_id)
+    db.session.commit()
+    if not report['matches']:
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='No unplayed matches to schedule.', cat='info'))
+    msg = (f"Scheduled {report['matches']} matches on {stations} stations in {report['slots']} slots "
+           f"(at least {report['lower_bound']} needed), {report['matches_per_hour']:.1f} matches per hour.")
+    return redirect(url_for('station_queues', tournament_id=tournament_id, msg=msg, cat='success'))
+
+
+@app.route('/tournament/<int:tournament_id>/stations')
+@cached_tournament_page
+def station_queues(tournament_id):
+    """What each console plays next: scheduled, unplayed matches per station in slot order."""
+    tournament = Tournament.query.get_or_404(tournament_id)
+    matches = (Match.query.filter(Match.tournament_id == tournament_id, Match.station.isnot(None),
+                                  Match.winner_id.is_(None))
+               .order_by(Match.time_slot, Match.station).all())
+    queues = {}
+    for match in matches:
+        queues.setdefault(match.station, []).append(match)
+    unscheduled = db.session.query(func.count(Match.id)).filter(
+        Match.tournament_id == tournament_id, Match.station.is_(None), Match.winner_id.is_(None)).scalar()
+    player_ids = {pid for m in matches for pid in match_player_ids(m)}
+    player_map = {p.id: p for p in Player.query.filter(Player.id.in_(player_ids))} if player_ids else {}
+    return render_template('stations.html', tournament=tournament, queues=dict(sorted(queues.items())),
+                           unscheduled=unscheduled, player_map=player_map)
+
+
+@app.route('/tournament/<int:tournament_id>/odds')
+def finals_odds_page(tournament_id):
+    """Simulated chance of each player making the finals if every unplayed match is played.
+
+    iterations sets the number of simulated runs, weight=rating favours higher-rated players and
+    format=json returns the rows as data.
+    """
+    tournament = Tournament.query.get_or_404(tournament_id)
+    iterations = clamp_int(request.args.get('iterations', 10_000, type=int), 100, 200_000)
+    weighting = 'rating' if request.args.get('weight') == 'rating' else 'uniform'
+    rows = finals_odds(tournament_id, iterations, weighting)
+    pending = match_summary(tournament_id)['pending']
+    if request.args.get('format') == 'json':
+        return jsonify(iterations=iterations, weighting=weighting, pending=pending, players=rows)
+    return render_template('odds.html', tournament=tournament, rows=rows, iterations=iterations,
+                           weighting=weighting, pending=pending)
+
+
+@app.route('/tournament/<int:tournament_id>/export')
+def export_tournament(tournament_id):
+    """Stream the tournament's players, stages, matches and standings as NDJSON, or CSV with format=csv."""
+    Tournament.query.get_or_404(tournament_id)
+    if request.args.get('format') == 'csv':
+        body, mimetype, extension = transfer.export_csv(tournament_id), 'text/csv', 'csv'
+    else:
+        body, mimetype, extension = transfer.export_ndjson(tournament_id), 'application/x-ndjson', 'ndjson'
+    # stream_with_context keeps the session (and its read transaction) open until the last row
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="tournament-{tournament_id}.{extension}"'
+    return response
+
+
+@app.route('/import', methods=['POST'])
+def import_tournament():
+    """Load an export (NDJSON or CSV) as a new tournament, from a 'file' upload or the raw body.
+    Nothing is kept unless the whole file loads."""
+    # Exports of big tournaments are far larger than the photo upload limit
+    request.max_content_length = app.config['IMPORT_MAX_BYTES']
+    upload = request.files.get('file')
+    from_form = upload is not None
+    try:
+        loaded = transfer.import_tournament(transfer.read_records(upload.stream if from_form else request.stream))
+    except (transfer.TransferError, UnicodeDecodeError) as error:
+        db.session.rollback()
+        msg = str(error) if isinstance(error, transfer.TransferError) else 'The file is not UTF-8 text.'
+        if from_form:
+            return redirect(url_for('index', msg=f'Import failed. {msg}', cat='danger'))
+        return jsonify(errors=[msg]), 400
+    db.session.commit()
+    if from_form:
+        msg = f"Imported {loaded['players']} players and {loaded['matches']} matches."
+        return redirect(url_for('tournament_detail', tournament_id=loaded['tournament_id'], msg=msg, cat='success'))
+    return jsonify(loaded), 201
 
 
 @app.route('/tournament/<int:tournament_id>/player/<int:player_id>/edit', methods=['POST'])
@@ -316,12 +474,13 @@ def edit_player(tournament_id, player_id):
     new_name = sanitize_name(request.form.get('name'))
     if not new_name:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Name cannot be empty.', cat='danger'))
-    if new_name.startswith(BOT_PREFIX):
+    if is_bot_name(new_name):
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Name cannot start with BOT prefix.', cat='danger'))
     # Don't allow renaming bots via UI route
-    if player.name.startswith(BOT_PREFIX):
+    if player.is_bot:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Bot players cannot be renamed.', cat='warning'))
     player.name = new_name
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Player renamed.', cat='success'))
 
@@ -332,66 +491,106 @@ def delete_player(tournament_id, player_id):
     player = Player.query.get_or_404(player_id)
     if player.tournament_id != tournament_id:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id))
-    if player.name.startswith(BOT_PREFIX):
+    if player.is_bot:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Bot players cannot be deleted.', cat='warning'))
 
     # Check if player is referenced in any match
     if player_in_any_match(player.id):
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Cannot delete player with scheduled matches. Reset matches first.', cat='danger'))
 
+    image_filename = player.image_filename
+    Standing.query.filter_by(player_id=player.id).delete()
     db.session.delete(player)
+    touch_tournament(tournament_id)
     db.session.commit()
+    release_images([image_filename], app.config['UPLOAD_FOLDER'])
     return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Player deleted.', cat='success'))
 
+def _complete_tournament(tournament):
+    """Mark a tournament completed, tell live viewers and add it to its season's leaderboard (caller commits)."""
+    tournament.status = 'completed'
+    live.status_changed(tournament.id, 'completed')
+    roll_up_tournament(tournament)
+    touch_tournament(tournament.id)
+
+
+def _advance_stages(tournament, stage_ids):
+    """Let each format stage that just got results advance (formats.advance_stage). Completes the
+    tournament and returns True when the final is done (caller commits)."""
+    for stage_id in stage_ids:
+        match_ids, final_done = formats.advance_stage(tournament, stage_id)
+        if match_ids:
+            live.matches_created(tournament.id, match_ids)
+        if final_done:
+            _complete_tournament(tournament)
+            return True
+    return False
+
+
+def _reopen_tournament(tournament):
+    """After a reset nothing is left to count: reopen a completed tournament and take it off its
+    season's leaderboard, so ending it again rolls up the new results (caller commits)."""
+    if tournament.status != 'completed':
+        return
+    tournament.status = 'active'
+    if tournament.rolled_up_at is not None:
+        tournament.rolled_up_at = None
+        db.session.flush()
+        rebuild_season(tournament.season_id)
+
+
 @app.route('/tournament/<int:tournament_id>/end_tournament')
+@writes_database
 def end_tournament(tournament_id):
     tournament = Tournament.query.get_or_404(tournament_id)
-    tournament.status = 'completed'
+    _complete_tournament(tournament)
     db.session.commit()
     return redirect(url_for('tournament_results', tournament_id=tournament_id))
 
 @app.route('/tournament/<int:tournament_id>/results')
+@cached_tournament_page
 def tournament_results(tournament_id):
     tournament = Tournament.query.get_or_404(tournament_id)
     # Exclude BOTs from standings
-    players = filter_humans(Player.query.filter_by(tournament_id=tournament_id).all())
-    matches = Match.query.filter_by(tournament_id=tournament_id).all()
+    players = human_players(tournament_id)
 
-    # Calculate player statistics
-    player_stats = compute_player_statistics(players, matches)
+    # Rankings come from the persisted standings; only counts are needed from the matches
+    rank_by = rank_by_arg(request.args.get('rank_by'))
+    player_stats = statistics_from_standings(players, load_standings(tournament_id), rank_by=rank_by)
+    match_count, round_count = db.session.query(func.count(Match.id), func.count(distinct(Match.round))).filter(
+        Match.tournament_id == tournament_id).one()
 
     return render_template('tournament_results.html', tournament=tournament,
-                         player_stats=player_stats, matches=matches)
+                         player_stats=player_stats, match_count=match_count, round_count=round_count,
+                         rank_by=rank_by, live_since=live.last_event_id(tournament_id))
 
 
 @app.route('/tournament/<int:tournament_id>/generate_finals')
+@writes_database
 def generate_finals(tournament_id):
-    """Create a final match with the current top 4 players by points."""
+    """Create a final match with the current top 4 players by points (or rating, with ?rank_by=rating)."""
     tournament = Tournament.query.get_or_404(tournament_id)
     # Only consider human players for finals
-    players = filter_humans(Player.query.filter_by(tournament_id=tournament_id).all())
-    matches = Match.query.filter_by(tournament_id=tournament_id).all()
+    players = human_players(tournament_id)
 
-    # Compute standings and get top 4
-    totals = totals_for_player_ids(matches, {p.id for p in players})
-    top4 = sorted(players, key=lambda p: totals.get(p.id, 0), reverse=True)[:4]
+    # Read standings and get top 4
+    if rank_by_arg(request.args.get('rank_by')) == 'rating':
+        top4 = top_n_players_by_rating(players, load_standings(tournament_id), 4)
+    else:
+        top4 = top_n_players_by_totals(players, load_standings(tournament_id), 4)
     if len(top4) < 4:
         return redirect(url_for('tournament_detail', tournament_id=tournament_id))
     # Prevent duplicate finals: if a match already exists with these exact 4 players (any round), don't create another
     top4_set = {p.id for p in top4}
-    if find_match_with_exact_players(matches, top4_set):
+    if find_tournament_match_with_players(tournament_id, top4_set):
         return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Final already created.', cat='info'))
 
-    existing_matches = Match.query.filter_by(tournament_id=tournament_id).all()
-    next_round = max([m.round for m in existing_matches], default=0) + 1
+    next_round = next_round_number(tournament_id)
 
-    final_match = Match(round=next_round,
-                        player1_id=top4[0].id,
-                        player2_id=top4[1].id,
-                        player3_id=top4[2].id,
-                        player4_id=top4[3].id,
-                        tournament_id=tournament_id)
-    db.session.add(final_match)
+    final = create_match(tournament_id, next_round, [p.id for p in top4])
+    db.session.flush()
+    live.matches_created(tournament_id, [final.id], kind='final')
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('tournament_detail', tournament_id=tournament_id))
 
@@ -400,8 +599,14 @@ def generate_finals(tournament_id):
 def reset_matches(tournament_id):
     """Delete all matches for a tournament but keep players and tournament record."""
     tournament = Tournament.query.get_or_404(tournament_id)
-    # Delete matches
-    Match.query.filter_by(tournament_id=tournament_id).delete()
+    # Delete matches and zero the standings in the same transaction
+    delete_tournament_matches(tournament_id)
+    formats.delete_stages(tournament_id)
+    tournament.format = None
+    clear_standings(tournament_id)
+    _reopen_tournament(tournament)
+    live.reload_required(tournament_id)
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='All matches removed.', cat='success'))
 
@@ -410,12 +615,21 @@ def reset_matches(tournament_id):
 def delete_all(tournament_id):
     """Permanently delete tournament, its players, and matches."""
     tournament = Tournament.query.get_or_404(tournament_id)
-    # Remove related matches and players first
-    Match.query.filter_by(tournament_id=tournament_id).delete()
+    image_filenames = [f for (f,) in db.session.query(Player.image_filename).filter(
+        Player.tournament_id == tournament_id, Player.image_filename.isnot(None))]
+    # Take it off its season's leaderboard, then remove related matches, standings and players
+    set_tournament_season(tournament, None)
+    delete_tournament_matches(tournament_id)
+    formats.delete_stages(tournament_id)
+    Standing.query.filter_by(tournament_id=tournament_id).delete()
+    TournamentEvent.query.filter_by(tournament_id=tournament_id).delete()
     Player.query.filter_by(tournament_id=tournament_id).delete()
     # Delete tournament
     db.session.delete(tournament)
     db.session.commit()
+    forget_bot_ids(tournament)
+    # Photos no other tournament shares are now orphaned
+    release_images(image_filenames, app.config['UPLOAD_FOLDER'])
     return redirect(url_for('index', msg='Tournament deleted', cat='warning'))
 
 
@@ -427,92 +641,152 @@ def edit_tournament(tournament_id):
     if not new_name:
         return redirect(url_for('index', msg='Tournament name cannot be empty.', cat='danger'))
     tournament.name = new_name
+    touch_tournament(tournament_id)
     db.session.commit()
     return redirect(url_for('index', msg='Tournament renamed.', cat='success'))
 
-@app.route('/tournament/<int:tournament_id>/record_result/<int:match_id>', methods=['POST'])
-def record_result(tournament_id, match_id):
-    match = Match.query.get_or_404(match_id)
-
-    # Support new position-based scoring; fallback to direct scores if provided
-    pos1 = request.form.get('pos1')
-    pos2 = request.form.get('pos2')
-    pos3 = request.form.get('pos3')
-    pos4 = request.form.get('pos4')
+@app.route('/seasons')
+def seasons():
+    return render_template('seasons.html', seasons=Season.query.order_by(Season.id.desc()).all())
 
-    if pos1 and pos2 and pos3 and pos4:
-        # Convert positions to integer points
-        try:
-            p1 = int(pos1)
-            p2 = int(pos2)
-            p3 = int(pos3)
-            p4 = int(pos4)
-        except ValueError:
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Positions must be integers.', cat='danger'))
-
-        # Validate positions: must be 1..4 and unique
-        positions = [p1, p2, p3, p4]
-        if any(p < 1 or p > 4 for p in positions):
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Positions must be between 1 and 4.', cat='danger'))
-        if len(set(positions)) != 4:
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Positions must be unique for each player.', cat='danger'))
-        score1 = POSITION_POINTS.get(p1, 0)
-        score2 = POSITION_POINTS.get(p2, 0)
-        score3 = POSITION_POINTS.get(p3, 0)
-        score4 = POSITION_POINTS.get(p4, 0)
-
-        match.score1 = score1
-        match.score2 = score2
-        match.score3 = score3
-        match.score4 = score4
-
-        # Winner is position 1 (highest points by mapping)
-        match.winner_id = match.player1_id if p1 == 1 else (
-            match.player2_id if p2 == 1 else (
-                match.player3_id if p3 == 1 else (
-                    match.player4_id if p4 == 1 else None)))
-    else:
-        # Backward-compatible: read direct 1-10 scores
-        try:
-            score1 = int(request.form['score1'])
-            score2 = int(request.form['score2'])
-            score3 = int(request.form['score3'])
-            score4 = int(request.form['score4'])
-        except (ValueError, KeyError):
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Scores must be integers between 1 and 10.', cat='danger'))
-
-        # Validate scores range and uniqueness
-        scores_list = [score1, score2, score3, score4]
-        if any(s < 1 or s > 10 for s in scores_list):
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Scores must be between 1 and 10.', cat='danger'))
-        if len(set(scores_list)) != 4:
-            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg='Scores must be unique for each player.', cat='danger'))
-
-        match.score1 = score1
-        match.score2 = score2
-        match.score3 = score3
-        match.score4 = score4
-
-        # Determine winner (highest score)
-        scores = [(score1, match.player1_id), (score2, match.player2_id),
-                  (score3, match.player3_id), (score4, match.player4_id)]
-        max_score = max(scores, key=lambda x: x[0])
-        match.winner_id = max_score[1]
 
+@app.route('/seasons', methods=['POST'])
+def create_season():
+    name = sanitize_name(request.form.get('name'))
+    if not name:
+        return redirect(url_for('seasons', msg='Season name cannot be empty.', cat='danger'))
+    season = Season(name=name)
+    db.session.add(season)
     db.session.commit()
+    return redirect(url_for('season_detail', season_id=season.id))
+
+
+@app.route('/season/<int:season_id>')
+def season_detail(season_id):
+    """Season leaderboard, read from the precomputed SeasonStanding rollups, and its tournaments."""
+    season = Season.query.get_or_404(season_id)
+    tournaments = Tournament.query.filter_by(season_id=season_id).order_by(Tournament.id).all()
+    # Candidates for adding: the most recent tournaments not in any season
+    unassigned = Tournament.query.filter(Tournament.season_id.is_(None)).order_by(Tournament.id.desc()).limit(50).all()
+    return render_template('season.html', season=season, leaderboard=season_leaderboard(season_id),
+                           tournaments=tournaments, unassigned=unassigned)
+
+
+@app.route('/season/<int:season_id>/tournaments', methods=['POST'])
+def season_tournaments(season_id):
+    """Add a tournament to the season (tournament_id), or take it out again with remove=1."""
+    Season.query.get_or_404(season_id)
+    tournament = db.session.get(Tournament, request.form.get('tournament_id', 0, type=int))
+    if tournament is None:
+        return redirect(url_for('season_detail', season_id=season_id, msg='Choose a tournament.', cat='warning'))
+    removing = request.form.get('remove') == '1'
+    if removing and tournament.season_id != season_id:
+        return redirect(url_for('season_detail', season_id=season_id))
+    set_tournament_season(tournament, None if removing else season_id)
+    touch_tournament(tournament.id)
+    db.session.commit()
+    msg = f"{'Removed' if removing else 'Added'} {tournament.name}."
+    return redirect(url_for('season_detail', season_id=season_id, msg=msg, cat='success'))
 
-    # If this match is the finals (top 4 humans), auto-complete and go to results
-    tournament = Tournament.query.get_or_404(tournament_id)
-    players = filter_humans(Player.query.filter_by(tournament_id=tournament_id).all())
-    matches = Match.query.filter_by(tournament_id=tournament_id).all()
-    totals = totals_for_player_ids(matches, {p.id for p in players})
-    top4_ids = [pid for pid, _ in sorted(totals.items(), key=lambda x: x[1], reverse=True)[:4]]
-    if len(top4_ids) == 4:
-        final_set = set([match.player1_id, match.player2_id, match.player3_id, match.player4_id])
-        if set(top4_ids) == final_set:
-            tournament.status = 'completed'
+
+@app.route('/tournament/<int:tournament_id>/record_result/<int:match_id>', methods=['POST'])
+def record_result(tournament_id, match_id):
+    match = Match.query.get_or_404(match_id)
+    # Keep the old result so a resubmission replaces its standings contribution
+    previous_scores = match_scores(match)
+    previous_winner_id = match.winner_id
+
+    # Position-based scoring; falls back to direct scores if provided
+    result, error = parse_result(request.form)
+    if error:
+        return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg=error, cat='danger'))
+    set_match_result(match, *result)
+    update_standings(match, previous_scores, previous_winner_id)
+    db.session.flush()
+    live.results_recorded(tournament_id, [match])
+    if match.stage_id is not None:
+        # Format matches: the last result of a stage starts the next one, the final ends the tournament
+        tournament = Tournament.query.get_or_404(tournament_id)
+        if _advance_stages(tournament, [match.stage_id]):
             db.session.commit()
             return redirect(url_for('tournament_results', tournament_id=tournament_id))
+    touch_tournament(tournament_id)
+    db.session.commit()
+
+    # If this match is the finals (top 4 humans), auto-complete and go to results
+    if match.stage_id is None and final_among(tournament_id, [match]):
+        tournament = Tournament.query.get_or_404(tournament_id)
+        _complete_tournament(tournament)
+        db.session.commit()
+        return redirect(url_for('tournament_results', tournament_id=tournament_id))
 
     # Don't automatically create next round - let user decide when to create new matches
     return redirect(url_for('tournament_detail', tournament_id=tournament_id))
+
+
+@app.route('/tournament/<int:tournament_id>/record_results', methods=['POST'])
+def record_results(tournament_id):
+    """Record many results in one transaction.
+
+    Accepts a JSON list ([{match_id, positions: [..]}] or pos1..pos4/score1..score4 keys), a
+    text/csv body (match_id,pos1,pos2,pos3,pos4), or the same CSV in a 'results' form field.
+    Every row is validated first; nothing is written unless all rows are valid.
+    """
+    tournament = Tournament.query.get_or_404(tournament_id)
+    from_form = 'results' in request.form
+
+    def respond(msg, cat, status=200, **payload):
+        if from_form:
+            return redirect(url_for('tournament_detail', tournament_id=tournament_id, msg=msg, cat=cat))
+        return jsonify(payload), status
+
+    if from_form:
+        rows = result_rows_from_csv(request.form['results'])
+    elif request.is_json:
+        rows = result_rows_from_json(request.get_json(silent=True))
+    else:
+        rows = result_rows_from_csv(request.get_data(as_text=True))
+    if not rows:
+        return respond('No results submitted.', 'warning', 400, errors=['No results submitted.'])
+
+    errors = []
+    parsed = {}
+    for i, row in enumerate(rows, start=1):
+        try:
+            match_id = int(row.get('match_id'))
+        except (TypeError, ValueError):
+            errors.append(f'Row {i}: match_id must be an integer.')
+            continue
+        result, error = parse_result(row)
+        if error:
+            errors.append(f'Row {i}: {error}')
+        elif match_id in parsed:
+            errors.append(f'Row {i}: match {match_id} appears more than once.')
+        else:
+            parsed[match_id] = result
+    matches = load_matches_by_id(tournament_id, list(parsed))
+    errors.extend(f'Match {mid} is not part of this tournament.' for mid in parsed if mid not in matches)
+    if errors:
+        return respond(' '.join(errors), 'danger', 400, errors=errors)
+
+    updates = []
+    for match_id, result in parsed.items():
+        match = matches[match_id]
+        updates.append((match, match_scores(match), match.winner_id))
+        set_match_result(match, *result)
+    update_standings_batch(updates)
+    db.session.flush()
+    live.results_recorded(tournament_id, list(matches.values()))
+    stage_ids = sorted({m.stage_id for m in matches.values() if m.stage_id is not None})
+    completed = _advance_stages(tournament, stage_ids)
+    touch_tournament(tournament_id)
+    db.session.commit()
+
+    unstaged = [m for m in matches.values() if m.stage_id is None]
+    if not completed and unstaged and final_among(tournament_id, unstaged) is not None:
+        completed = True
+        _complete_tournament(tournament)
+        db.session.commit()
+    if completed and from_form:
+        return redirect(url_for('tournament_results', tournament_id=tournament_id))
+    return respond(f'{len(parsed)} results recorded.', 'success', recorded=len(parsed), completed=completed)
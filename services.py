@@ -1,24 +1,141 @@
-from typing import List, Tuple, Dict, Optional, Set
-from app import db
-from models import Player, Match
-from constants import BOT_PREFIX
-from sqlalchemy import or_
+from typing import List, Tuple, Dict, Optional, Sequence, Set, Union
+from datetime import datetime
+from collections import Counter
+from flask import g, has_app_context
+from app import app, db
+from models import Tournament, Player, Match, MatchParticipant, Standing, PlayerIdentity, SeasonStanding
+from constants import BOT_PREFIX, INDEX_PAGE_SIZE, PODIUM_PLACES, RATING_INITIAL, RATING_K, ROUNDS_PAGE_SIZE
+from images import remove_image
+from metrics import span
+from caching import RenderCache, instance_tag
+import simulation
+from sqlalchemy import func, case, insert, select, update, cast, Float, distinct
+from sqlalchemy.orm import aliased, selectinload
+import numpy as np
+import heapq
+from itertools import islice
 import random
 
+# (player_ids[n, 4], scores[n, 4] with NaN for unrecorded slots, winner_ids[n] with 0 for no winner)
+ScoreColumns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# Rows fetched per step while building a snapshot, so the transient Row objects stay bounded
+SNAPSHOT_CHUNK = 5_000
+
+
+class TournamentSnapshot:
+    """A tournament's matches as parallel NumPy columns in (round, id) order.
+
+    About 90 bytes per match where a loaded Match with its ORM state costs a few KB. Unrecorded
+    scores are NaN and winner_ids is 0 until a result is in. Get one from load_snapshot, or from
+    tournament_snapshot to share it for the rest of the request.
+    """
+    __slots__ = ('tournament_id', 'match_ids', 'rounds', 'player_ids', 'scores', 'winner_ids')
+
+    def __init__(self, tournament_id: int, data: np.ndarray):
+        """data: (matches, 11) float rows of id, round, p1-p4, s1-s4, winner_id (NaN for NULL)."""
+        self.tournament_id = tournament_id
+        self.match_ids = data[:, 0].astype(np.int64)
+        self.rounds = data[:, 1].astype(np.int64)
+        self.player_ids = data[:, 2:6].astype(np.int64)
+        self.scores = data[:, 6:10].copy()
+        self.winner_ids = np.nan_to_num(data[:, 10], nan=0).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.match_ids)
+
+    @property
+    def columns(self) -> ScoreColumns:
+        return self.player_ids, self.scores, self.winner_ids
+
+    def rows(self):
+        """(p1, p2, p3, p4, s1, s2, s3, s4, winner_id) tuples with None for NULL, like a column query."""
+        for pids, scores, winner in zip(self.player_ids.tolist(), self.scores.tolist(), self.winner_ids.tolist()):
+            yield tuple(pids) + tuple(None if score != score else int(score) for score in scores) + (winner or None,)
+
+    def find_match(self, player_set: Set[int]) -> Optional[int]:
+        """Id of the first match whose four players are exactly player_set."""
+        if len(player_set) != 4 or not len(self):
+            return None
+        target = np.sort(np.fromiter(player_set, dtype=np.int64))
+        hits = np.flatnonzero((np.sort(self.player_ids, axis=1) == target).all(axis=1))
+        return int(self.match_ids[hits[0]]) if len(hits) else None
+
+
+@span('snapshot.load')
+def load_snapshot(tournament_id: int) -> TournamentSnapshot:
+    """Build a TournamentSnapshot with one column-only query (no ORM objects)."""
+    result = db.session.execute(select(
+        Match.id, Match.round, Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id,
+        Match.score1, Match.score2, Match.score3, Match.score4, Match.winner_id,
+    ).where(Match.tournament_id == tournament_id).order_by(Match.round, Match.id),
+        execution_options={'yield_per': SNAPSHOT_CHUNK})
+    parts = [np.array([tuple(row) for row in part], dtype=float) for part in result.partitions()]
+    data = np.concatenate(parts) if parts else np.empty((0, 11))
+    del parts  # only the combined rows are needed while the columns are split out
+    return TournamentSnapshot(tournament_id, data)
+
+
+def tournament_snapshot(tournament_id: int) -> TournamentSnapshot:
+    """load_snapshot, shared by everything in the current app context (one request).
+    touch_tournament drops it, so build it again after changing the tournament's matches."""
+    if not has_app_context():
+        return load_snapshot(tournament_id)
+    snapshots = g.setdefault('snapshots', {})
+    if tournament_id not in snapshots:
+        snapshots[tournament_id] = load_snapshot(tournament_id)
+    return snapshots[tournament_id]
+
+
+def touch_tournament(tournament_id: int) -> None:
+    """Bump the tournament's version so cached pages and ETags are invalidated (caller commits)."""
+    Tournament.query.filter_by(id=tournament_id).update(
+        {Tournament.version: Tournament.version + 1, Tournament.updated_at: datetime.utcnow()},
+        synchronize_session=False)
+    if has_app_context():
+        g.get('snapshots', {}).pop(tournament_id, None)
+
 
 def ensure_bots(tournament_id: int, min_count: int = 4) -> List[Player]:
-    bots = Player.query.filter(Player.tournament_id == tournament_id, Player.name.like(f"{BOT_PREFIX}%")).all()
+    bots = Player.query.filter_by(tournament_id=tournament_id, is_bot=True).order_by(Player.id).all()
     needed = max(0, min_count - len(bots))
     if needed:
         start_idx = len(bots) + 1
         for i in range(needed):
-            bot = Player(name=f"{BOT_PREFIX} {start_idx + i}", tournament_id=tournament_id)
+            bot = Player(name=f"{BOT_PREFIX} {start_idx + i}", tournament_id=tournament_id, is_bot=True)
             db.session.add(bot)
+            bots.append(bot)
+        touch_tournament(tournament_id)
         db.session.commit()
-        bots = Player.query.filter(Player.tournament_id == tournament_id, Player.name.like(f"{BOT_PREFIX}%")).all()
     return bots
 
 
+# (tournament id, created_at) -> bot ids. Bots are only ever added, and created_at keeps a
+# reused tournament id (SQLite can hand out a deleted tournament's id) from matching old bots.
+_bot_ids: Dict[Tuple[int, datetime], List[int]] = {}
+
+
+def ensure_bot_ids(tournament: Tournament, min_count: int = 4) -> List[int]:
+    """ensure_bots for callers that only need ids, cached per process so planning again skips the query."""
+    key = (tournament.id, tournament.created_at)
+    ids = _bot_ids.get(key)
+    if ids is None or len(ids) < min_count:
+        ids = _bot_ids[key] = [bot.id for bot in ensure_bots(tournament.id, min_count)]
+    return ids
+
+
+def forget_bot_ids(tournament: Tournament) -> None:
+    _bot_ids.pop((tournament.id, tournament.created_at), None)
+
+
+def human_players(tournament_id: int) -> List[Player]:
+    return Player.query.filter_by(tournament_id=tournament_id, is_bot=False).all()
+
+
+def bot_player_ids(tournament_id: int) -> Set[int]:
+    return {pid for (pid,) in db.session.query(Player.id).filter_by(tournament_id=tournament_id, is_bot=True)}
+
+
 def human_distribution(total_appearances: int) -> List[int]:
     """Return a list of human counts per match that minimizes matches, prefers 3-human games,
     and never creates a 1-human match. Converts (4,2) -> (3,3)."""
@@ -42,29 +159,370 @@ def human_distribution(total_appearances: int) -> List[int]:
     return counts
 
 
-def take_distinct(pool: List[int], k: int) -> List[int]:
-    """Pop up to k distinct player IDs from pool (in-place)."""
-    group = []
-    i = 0
-    while i < len(pool) and len(group) < k:
-        pid = pool[i]
-        if pid not in group:
-            group.append(pid)
-            pool.pop(i)
-        else:
-            i += 1
+# Extra heap entries considered per group when looking for players who haven't met yet
+PLANNER_WINDOW = 4
+
+
+def pair_key(a: int, b: int) -> Tuple[int, int]:
+    return (a, b) if a < b else (b, a)
+
+
+def _pick_group(heap: List, target: int, pair_counts: Counter) -> List[Tuple[int, float, int]]:
+    """Pop up to target distinct players: the neediest first, then whoever repeats the fewest pairings."""
+    window = [heapq.heappop(heap) for _ in range(min(len(heap), target + PLANNER_WINDOW))]
+    group = window[:1]
+    rest = window[1:]
+    while len(group) < target and rest:
+        best = min(range(len(rest)), key=lambda j: (
+            sum(pair_counts[pair_key(rest[j][2], g[2])] for g in group), rest[j][0], rest[j][1]))
+        group.append(rest.pop(best))
+    for entry in rest:
+        heapq.heappush(heap, entry)
     return group
 
 
+@span('planner.plan_groups')
+def plan_groups(needs: Dict[int, int], bot_ids: List[int], pair_counts: Optional[Counter] = None,
+                rng: Optional[random.Random] = None) -> Tuple[List[List[int]], Dict[str, int]]:
+    """Split each player's remaining appearances into 4-player groups filled up with bots.
+
+    Group sizes follow human_distribution. Players are drawn from a max-heap on remaining
+    appearances, so nobody is left needing several games at the end, and bots come from a
+    min-heap on uses so fills are spread evenly. Returns (groups, report) where report has
+    matches, repeat_pairings, bot_fills and unplaced appearances.
+    """
+    rng = rng or random.Random()
+    pair_counts = Counter() if pair_counts is None else pair_counts
+    heap = [(-n, rng.random(), pid) for pid, n in needs.items() if n > 0]
+    heapq.heapify(heap)
+    bot_heap = [(0, i, bid) for i, bid in enumerate(bot_ids)]
+    total = sum(-entry[0] for entry in heap)
+    groups: List[List[int]] = []
+    report = {'matches': 0, 'repeat_pairings': 0, 'bot_fills': 0, 'unplaced': 0}
+
+    def place(target: int) -> bool:
+        picked = _pick_group(heap, target, pair_counts)
+        if len(picked) < 2:
+            for entry in picked:
+                heapq.heappush(heap, entry)
+            return False
+        group = [pid for _, _, pid in picked]
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                key = pair_key(a, b)
+                if pair_counts[key]:
+                    report['repeat_pairings'] += 1
+                pair_counts[key] += 1
+        for neg_need, _, pid in picked:
+            if neg_need < -1:
+                heapq.heappush(heap, (neg_need + 1, rng.random(), pid))
+        bots = [heapq.heappop(bot_heap) for _ in range(min(4 - len(group), len(bot_heap)))]
+        for uses, order, bid in bots:
+            group.append(bid)
+            heapq.heappush(bot_heap, (uses + 1, order, bid))
+        report['bot_fills'] += len(bots)
+        groups.append(group)
+        return True
+
+    for target in human_distribution(total):
+        if not place(target):
+            break
+    # Short groups (too few distinct players left) leave appearances behind; drain them in 3s/2s
+    while len(heap) >= 2 and place(3 if len(heap) >= 3 else 2):
+        pass
+    report['matches'] = len(groups)
+    report['unplaced'] = sum(-entry[0] for entry in heap)
+    return groups, report
+
+
+# Candidates considered after a Swiss pod's best-ranked player when choosing the other three
+SWISS_WINDOW = 12
+
+
+@span('planner.swiss_pairings')
+def swiss_pairings(ranked_ids: List[int], pair_counts: Optional[Counter] = None,
+                   bot_ids: Sequence[int] = ()) -> Tuple[List[List[int]], Dict[str, int]]:
+    """Pair one Swiss round of 4-player pods from player ids ordered best first.
+
+    Each pod starts from the best unpaired player and adds, one at a time, whichever of the next
+    SWISS_WINDOW players has met the pod least often, ties going to the closest rank, so pods
+    stay within a score band. When the field isn't a multiple of 4 the lowest-ranked pods are
+    short (sizes from human_distribution, never one human) and topped up from bot_ids. Returns
+    (groups, report) like plan_groups; pair_counts is updated with the new pods.
+    """
+    pair_counts = Counter() if pair_counts is None else pair_counts
+    sizes = sorted(human_distribution(len(ranked_ids)), reverse=True)
+    if max((4 - size for size in sizes), default=0) > len(bot_ids):
+        raise ValueError('Not enough bots to fill the short pods.')
+    remaining = list(ranked_ids)
+    groups: List[List[int]] = []
+    report = {'matches': 0, 'repeat_pairings': 0, 'bot_fills': 0, 'unplaced': 0}
+    for size in sizes:
+        window = remaining[1:1 + SWISS_WINDOW]
+        group = [remaining[0]]
+        chosen: List[int] = []
+        while len(group) < size:
+            best = min((i for i in range(len(window)) if i not in chosen), key=lambda i: (
+                sum(pair_counts.get(pair_key(window[i], pid), 0) for pid in group), i))
+            chosen.append(best)
+            group.append(window[best])
+        for i in sorted(chosen, reverse=True):
+            del remaining[1 + i]
+        del remaining[0]
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                key = pair_key(a, b)
+                if pair_counts[key]:
+                    report['repeat_pairings'] += 1
+                pair_counts[key] += 1
+        # Rotate through the bots so fills are spread across them
+        group += [bot_ids[(report['bot_fills'] + n) % len(bot_ids)] for n in range(4 - size)]
+        report['bot_fills'] += 4 - size
+        groups.append(group)
+    report['matches'] = len(groups)
+    report['unplaced'] = len(remaining)
+    return groups, report
+
+
+# Unscheduled matches, in round order, considered when filling a time slot's stations
+STATION_LOOKAHEAD = 64
+
+
+@span('planner.schedule_stations')
+def schedule_stations(matches: List[Tuple[int, Sequence[int]]], stations: int, bot_ids: Set[int] = frozenset(),
+                      min_rest: int = 0) -> Tuple[Dict[int, Tuple[int, int]], Dict[str, int]]:
+    """Assign (match_id, player_ids) pairs, listed in play order, to (time_slot, station).
+
+    Slot by slot, every station gets the earliest of the next STATION_LOOKAHEAD matches whose
+    players are all free, so a console only idles when no waiting match can start. Matches whose
+    players sat out the previous slot go first, giving rest gaps where the field allows; min_rest
+    makes a gap of that many slots mandatory. Bots are console-controlled and never conflict.
+    Returns (assignments, report) with slots used, lower_bound (neither stations nor the busiest
+    player allow fewer) and back_to_back player appearances.
+    """
+    pending = iter((mid, [pid for pid in pids if pid not in bot_ids]) for mid, pids in matches)
+    window: List[Tuple[int, List[int]]] = []
+    last_slot: Dict[int, int] = {}
+    appearances: Counter = Counter()
+    assignments: Dict[int, Tuple[int, int]] = {}
+    report = {'matches': 0, 'slots': 0, 'lower_bound': 0, 'back_to_back': 0}
+    slot = 0
+    while True:
+        window.extend(islice(pending, STATION_LOOKAHEAD - len(window)))
+        if not window:
+            break
+        busy: Set[int] = set()
+        placed: List[int] = []
+        for rested_only in (True, False):
+            for index, (mid, humans) in enumerate(window):
+                if len(placed) == stations:
+                    break
+                if index in placed or any(pid in busy for pid in humans):
+                    continue
+                gaps = [slot - last_slot[pid] - 1 for pid in humans if pid in last_slot]
+                if any(gap < min_rest for gap in gaps) or (rested_only and any(gap < 1 for gap in gaps)):
+                    continue
+                assignments[mid] = (slot, len(placed) + 1)
+                report['back_to_back'] += sum(1 for gap in gaps if gap < 1)
+                busy.update(humans)
+                placed.append(index)
+        for pid in busy:
+            last_slot[pid] = slot
+        for index in placed:
+            appearances.update(window[index][1])
+        placed_set = set(placed)
+        window = [entry for index, entry in enumerate(window) if index not in placed_set]
+        slot += 1
+    report['matches'] = len(assignments)
+    report['slots'] = max((s for s, _ in assignments.values()), default=-1) + 1
+    report['lower_bound'] = max(-(-len(assignments) // stations) if stations else 0,
+                                max(appearances.values(), default=0))
+    return assignments, report
+
+
+def assign_stations(tournament_id: int, stations: int, slot_minutes: int, min_rest: int = 0) -> Dict[str, int]:
+    """Schedule the tournament's unplayed matches onto stations from slot 0 and store them on the
+    Match rows; played matches drop out of the queue (caller commits). Returns the report."""
+    rows = db.session.query(Match.id, Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id,
+                            Match.winner_id).filter(Match.tournament_id == tournament_id).order_by(Match.round, Match.id)
+    pending, played = [], []
+    for mid, p1, p2, p3, p4, winner_id in rows:
+        if winner_id is None:
+            pending.append((mid, (p1, p2, p3, p4)))
+        else:
+            played.append(mid)
+    bot_ids = bot_player_ids(tournament_id)
+    assignments, report = schedule_stations(pending, stations, bot_ids, min_rest)
+    updates = [{'id': mid, 'station': station, 'time_slot': slot} for mid, (slot, station) in assignments.items()]
+    updates += [{'id': mid, 'station': None, 'time_slot': None} for mid in played]
+    if updates:
+        db.session.execute(update(Match), updates)
+    Tournament.query.filter_by(id=tournament_id).update({Tournament.slot_minutes: slot_minutes},
+                                                        synchronize_session=False)
+    report['matches_per_hour'] = (report['matches'] * 60 / (report['slots'] * slot_minutes)
+                                  if report['slots'] else 0)
+    return report
+
+
+@span('planner.appearance_counts')
+def appearance_counts(tournament_id: int, snapshot: Optional[TournamentSnapshot] = None) -> Dict[int, int]:
+    """Number of scheduled matches per player, counted from the participant rows (or the snapshot)."""
+    if snapshot is not None:
+        ids, counts = np.unique(snapshot.player_ids, return_counts=True)
+        return dict(zip(ids.tolist(), counts.tolist()))
+    rows = (db.session.query(MatchParticipant.player_id, func.count())
+            .join(Match, Match.id == MatchParticipant.match_id)
+            .filter(Match.tournament_id == tournament_id)
+            .group_by(MatchParticipant.player_id)
+            .all())
+    return dict(rows)
+
+
+@span('planner.existing_pair_counts')
+def existing_pair_counts(tournament_id: int, snapshot: Optional[TournamentSnapshot] = None) -> Counter:
+    """How often every pair of players already shares a match in this tournament."""
+    if snapshot is not None:
+        return _snapshot_pair_counts(snapshot)
+    counts: Counter = Counter()
+    rows = db.session.query(Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id).filter(
+        Match.tournament_id == tournament_id)
+    for row in rows:
+        for i in range(4):
+            for j in range(i + 1, 4):
+                counts[pair_key(row[i], row[j])] += 1
+    return counts
+
+
+def _snapshot_pair_counts(snapshot: TournamentSnapshot) -> Counter:
+    pids = snapshot.player_ids
+    if not len(pids):
+        return Counter()
+    # Encode each (low, high) pair as one integer so the six slot pairs count in a single unique()
+    base = int(pids.max()) + 1
+    a = pids[:, [0, 0, 0, 1, 1, 2]]
+    b = pids[:, [1, 2, 3, 2, 3, 3]]
+    keys, counts = np.unique(np.minimum(a, b) * base + np.maximum(a, b), return_counts=True)
+    return Counter({(k // base, k % base): c for k, c in zip(keys.tolist(), counts.tolist())})
+
+
+def create_match(tournament_id: int, round_num: int, player_ids: List[int]) -> Match:
+    """Add a 4-player Match together with its participant rows (caller commits)."""
+    match = Match(round=round_num,
+                  player1_id=player_ids[0],
+                  player2_id=player_ids[1],
+                  player3_id=player_ids[2],
+                  player4_id=player_ids[3],
+                  tournament_id=tournament_id,
+                  participants=[MatchParticipant(player_id=pid, slot=slot)
+                                for slot, pid in enumerate(player_ids[:4], start=1)])
+    db.session.add(match)
+    return match
+
+
+def bulk_create_matches(tournament_id: int, first_round: int, groups: List[List[int]],
+                        same_round: bool = False, stage_id: Optional[int] = None) -> List[int]:
+    """Insert one match per group (rounds first_round, first_round + 1, ..., or all in first_round
+    with same_round) and their participant rows with two executemany statements. Returns the new
+    match ids (caller commits).
+
+    first_round must be past the tournament's existing rounds (next_round_number): the ids are
+    read back by round range, because RETURNING with ordered ids makes SQLite insert row by row.
+    """
+    if not groups:
+        return []
+    last_round = first_round if same_round else first_round + len(groups) - 1
+    match_rows = [{
+        'round': first_round if same_round else first_round + i,
+        'player1_id': g[0], 'player2_id': g[1], 'player3_id': g[2], 'player4_id': g[3],
+        'tournament_id': tournament_id, 'stage_id': stage_id,
+    } for i, g in enumerate(groups)]
+    db.session.execute(insert(Match), match_rows)
+    match_ids = list(db.session.scalars(select(Match.id).where(
+        Match.tournament_id == tournament_id, Match.round.between(first_round, last_round)).order_by(Match.id)))
+    db.session.execute(insert(MatchParticipant), [
+        {'player_id': pid, 'match_id': mid, 'slot': slot, 'score': None}
+        for mid, g in zip(match_ids, groups)
+        for slot, pid in enumerate(g[:4], start=1)
+    ])
+    return match_ids
+
+
+def set_match_result(match: Match, scores: List[int], winner_slot: int) -> None:
+    """Store validated scores (see validators.parse_result) on the match and its participants."""
+    match.score1, match.score2, match.score3, match.score4 = scores
+    match.winner_id = match_player_ids(match)[winner_slot]
+    sync_participant_scores(match)
+
+
+def sync_participant_scores(match: Match) -> None:
+    scores = match_scores(match)
+    for participant in match.participants:
+        participant.score = scores[participant.slot - 1]
+
+
+def final_among(tournament_id: int, matches: Union[Sequence[Match], TournamentSnapshot]) -> Optional[int]:
+    """Return the id of the match whose players are exactly the current top 4 humans by points, if any."""
+    players = human_players(tournament_id)
+    top4_ids = {p.id for p in top_n_players_by_totals(players, load_standings(tournament_id), 4)}
+    if len(top4_ids) < 4:
+        return None
+    match = find_match_with_exact_players(matches, top4_ids)
+    return match if match is None or isinstance(match, int) else match.id
+
+
+def load_matches_by_id(tournament_id: int, match_ids: List[int]) -> Dict[int, Match]:
+    """Fetch a tournament's matches by id with their participants in two queries."""
+    matches = (Match.query.options(selectinload(Match.participants))
+               .filter(Match.tournament_id == tournament_id, Match.id.in_(match_ids))
+               .all())
+    return {m.id: m for m in matches}
+
+
+def delete_tournament_matches(tournament_id: int) -> None:
+    """Bulk-delete a tournament's matches and their participant rows (caller commits)."""
+    match_ids = db.session.query(Match.id).filter(Match.tournament_id == tournament_id)
+    MatchParticipant.query.filter(MatchParticipant.match_id.in_(match_ids)).delete(synchronize_session=False)
+    Match.query.filter_by(tournament_id=tournament_id).delete()
+
+
 def player_in_any_match(player_id: int) -> bool:
-    return Match.query.filter(
-        or_(
-            Match.player1_id == player_id,
-            Match.player2_id == player_id,
-            Match.player3_id == player_id,
-            Match.player4_id == player_id,
-        )
-    ).first() is not None
+    return MatchParticipant.query.filter_by(player_id=player_id).first() is not None
+
+
+def player_match_history(player_id: int) -> List[Tuple[Match, MatchParticipant]]:
+    """All matches a player is in, ordered by round, with their participant row (slot and score)."""
+    return (db.session.query(Match, MatchParticipant)
+            .join(MatchParticipant, MatchParticipant.match_id == Match.id)
+            .filter(MatchParticipant.player_id == player_id)
+            .order_by(Match.round, Match.id)
+            .all())
+
+
+def head_to_head(player_id: int) -> Dict[int, Dict[str, int]]:
+    """Per-opponent meetings for a player: {opponent_id: {'meetings', 'ahead', 'behind'}}.
+
+    'ahead'/'behind' count recorded matches where the player scored above/below that opponent.
+    """
+    me = aliased(MatchParticipant)
+    other = aliased(MatchParticipant)
+    rows = (db.session.query(
+                other.player_id,
+                func.count(),
+                func.sum(case((me.score > other.score, 1), else_=0)),
+                func.sum(case((me.score < other.score, 1), else_=0)))
+            .join(other, other.match_id == me.match_id)
+            .filter(me.player_id == player_id, other.player_id != player_id)
+            .group_by(other.player_id)
+            .all())
+    return {opp: {'meetings': meetings, 'ahead': ahead or 0, 'behind': behind or 0}
+            for opp, meetings, ahead, behind in rows}
+
+
+def release_images(filenames, folder: str) -> None:
+    """Delete stored photos that no Player references any more (call after committing)."""
+    for filename in {f for f in filenames if f}:
+        if Player.query.filter_by(image_filename=filename).first() is None:
+            remove_image(folder, filename)
 
 
 def is_bot_name(name: str) -> bool:
@@ -72,73 +530,624 @@ def is_bot_name(name: str) -> bool:
 
 
 def is_bot_player(player: Player) -> bool:
-    return is_bot_name(player.name)
+    return player.is_bot
 
 
 def filter_humans(players: List[Player]) -> List[Player]:
     return [p for p in players if not is_bot_player(p)]
 
 
-def totals_for_player_ids(matches: List[Match], player_ids: Set[int]) -> Dict[int, int]:
-    totals: Dict[int, int] = {pid: 0 for pid in player_ids}
-    for m in matches:
-        for pid, score in (
-            (m.player1_id, m.score1),
-            (m.player2_id, m.score2),
-            (m.player3_id, m.score3),
-            (m.player4_id, m.score4),
-        ):
-            if score is not None and pid in totals:
-                totals[pid] += score
-    return totals
+def escape_like(value: str, escape: str = '\\') -> str:
+    """Escape LIKE wildcards so user input matches literally (pair with escape=...)."""
+    return value.replace(escape, escape * 2).replace('%', escape + '%').replace('_', escape + '_')
+
+
+@span('index.page')
+def tournament_index_page(before: Optional[int] = None, after: Optional[int] = None,
+                          search: Optional[str] = None, status: Optional[str] = None,
+                          limit: int = INDEX_PAGE_SIZE) -> Tuple[List, bool, bool]:
+    """One page of tournaments, newest first, with aggregates in a single query.
+
+    Keyset pagination on id: pass `before` (the last id shown) for older tournaments, or
+    `after` (the first id shown) for newer ones. `search` is a case-insensitive name prefix
+    (served by ix_tournament_name_nocase); `status` uses ix_tournament_status_id.
+    Rows carry id, name, status, created_at, player_count, match_count, recorded_count and
+    leader (top human by standings; the champion once completed).
+    Returns (rows, has_older, has_newer).
+    """
+    page = select(Tournament.id)
+    if search:
+        page = page.where(Tournament.name.like(escape_like(search) + '%', escape='\\'))
+    if status:
+        page = page.where(Tournament.status == status)
+    if after is not None:
+        page = page.where(Tournament.id > after).order_by(Tournament.id.asc())
+    else:
+        if before is not None:
+            page = page.where(Tournament.id < before)
+        page = page.order_by(Tournament.id.desc())
+    page = page.limit(limit + 1).subquery('page')
+    page_ids = select(page.c.id)
+
+    humans = Player.is_bot.is_(False)
+    players = (select(Player.tournament_id, func.count().label('n'))
+               .where(Player.tournament_id.in_(page_ids), humans)
+               .group_by(Player.tournament_id).subquery('players'))
+    matches = (select(Match.tournament_id, func.count().label('n'), func.count(Match.winner_id).label('recorded'))
+               .where(Match.tournament_id.in_(page_ids))
+               .group_by(Match.tournament_id).subquery('matches'))
+    # Same order as _sort_statistics: points, wins, average
+    average = cast(Standing.points, Float) / func.max(Standing.matches_played, 1)
+    ranked = (select(Standing.tournament_id, Player.name,
+                     func.row_number().over(partition_by=Standing.tournament_id,
+                                            order_by=(Standing.points.desc(), Standing.wins.desc(),
+                                                      average.desc(), Standing.player_id)).label('rank'))
+              .join(Player, Player.id == Standing.player_id)
+              .where(Standing.tournament_id.in_(page_ids), Standing.matches_played > 0, humans)
+              .subquery('ranked'))
+
+    rows = db.session.execute(
+        select(Tournament.id, Tournament.name, Tournament.status, Tournament.created_at,
+               func.coalesce(players.c.n, 0).label('player_count'),
+               func.coalesce(matches.c.n, 0).label('match_count'),
+               func.coalesce(matches.c.recorded, 0).label('recorded_count'),
+               ranked.c.name.label('leader'))
+        .join(page, page.c.id == Tournament.id)
+        .outerjoin(players, players.c.tournament_id == Tournament.id)
+        .outerjoin(matches, matches.c.tournament_id == Tournament.id)
+        .outerjoin(ranked, (ranked.c.tournament_id == Tournament.id) & (ranked.c.rank == 1))
+        .order_by(Tournament.id.desc())
+    ).all()
+
+    more = len(rows) > limit
+    if after is not None:
+        rows = rows[1:] if more else rows  # drop the extra row, which is the newest
+        return rows, True, more
+    return rows[:limit], more, before is not None
+
+
+def top_n_players_by_totals(players: List[Player], standings: Dict[int, Standing], n: int) -> List[Player]:
+    """Order players by standings points (ties keep the incoming order) and keep the first n."""
+    return sorted(players, key=lambda p: standing_points(standings, p.id), reverse=True)[:n]
 
 
-def top_n_players_by_totals(players: List[Player], matches: List[Match], n: int) -> List[Player]:
-    ids = {p.id for p in players}
-    totals = totals_for_player_ids(matches, ids)
-    return sorted(players, key=lambda p: totals.get(p.id, 0), reverse=True)[:n]
+def top_n_players_by_rating(players: List[Player], standings: Dict[int, Standing], n: int) -> List[Player]:
+    """Order players by rating (ties keep the incoming order) and keep the first n."""
+    return sorted(players, key=lambda p: standing_rating(standings, p.id), reverse=True)[:n]
 
 
-def find_match_with_exact_players(matches: List[Match], player_set: Set[int]) -> Optional[Match]:
+# finals_odds results keyed by (tournament, instance_tag, iterations, weighting) and tagged with
+# Tournament.version, so recording a result (which bumps the version) retires them
+odds_cache = RenderCache(64)
+
+
+@span('simulation.finals_odds')
+def finals_odds(tournament_id: int, iterations: int = 10_000, weighting: str = 'uniform',
+                seed: Optional[int] = None) -> List[Dict]:
+    """Chance of each human finishing in the top 4 by points (the generate_finals field) once
+    every unplayed match is played, from `iterations` Monte Carlo runs (see simulation.py).
+
+    weighting='rating' draws finishing orders from the players' ratings instead of uniformly.
+    Rows are sorted by top-4 chance and carry id, name, points, top4, first and expected_points
+    (plain values, since they outlive the session through odds_cache).
+    """
+    version, created_at = db.session.query(Tournament.version, Tournament.created_at).filter(
+        Tournament.id == tournament_id).one()
+    key = (tournament_id, instance_tag(created_at), iterations, weighting)
+    cached = odds_cache.get(key, version) if seed is None else None
+    if cached is not None:
+        return cached
+
+    players = human_players(tournament_id)  # id order, the tie order top_n_players_by_totals sees
+    standings = load_standings(tournament_id)
+    pending = db.session.query(Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id).filter(
+        Match.tournament_id == tournament_id, Match.winner_id.is_(None)).all()
+    index = {p.id: i for i, p in enumerate(players)}
+    slots = np.array([[index.get(pid, -1) for pid in row] for row in pending], dtype=np.int64).reshape(-1, 4)
+    base_points = np.array([standing_points(standings, p.id) for p in players], dtype=float)
+    log_strength = None
+    if weighting == 'rating':
+        # Elo odds: a 400-point gap is a factor of 10 in strength
+        log_strength = np.array([[standing_rating(standings, pid) for pid in row] for row in pending],
+                                dtype=float).reshape(-1, 4) * (np.log(10) / 400)
+    work = iterations * max(1, len(pending))
+    workers = app.config['SIMULATION_WORKERS'] if work >= app.config['SIMULATION_POOL_MIN_WORK'] else 0
+    top_counts, first_counts, points_sum = simulation.simulate(base_points, slots, log_strength, iterations,
+                                                               workers=workers, seed=seed)
+    rows = [{
+        'id': player.id,
+        'name': player.name,
+        'points': int(base_points[i]),
+        'top4': top_counts[i] / iterations,
+        'first': first_counts[i] / iterations,
+        'expected_points': points_sum[i] / iterations,
+    } for i, player in enumerate(players)]
+    rows.sort(key=lambda row: (row['top4'], row['first'], row['points']), reverse=True)
+    if seed is None:
+        odds_cache.put(key, version, rows)
+    return rows
+
+
+def find_match_with_exact_players(matches: Union[Sequence[Match], TournamentSnapshot],
+                                  player_set: Set[int]) -> Union[Match, int, None]:
+    """First match with exactly these players: the Match, or its id when given a snapshot."""
+    if isinstance(matches, TournamentSnapshot):
+        return matches.find_match(player_set)
     for m in matches:
         if {m.player1_id, m.player2_id, m.player3_id, m.player4_id} == player_set:
             return m
     return None
 
 
-def compute_player_statistics(players: List[Player], matches: List[Match]) -> List[Dict]:
+def find_tournament_match_with_players(tournament_id: int, player_set: Set[int]) -> Optional[Match]:
+    """Database-side variant of find_match_with_exact_players for a set of 4 distinct players."""
+    ids = list(player_set)
+    return Match.query.filter(
+        Match.tournament_id == tournament_id,
+        Match.player1_id.in_(ids),
+        Match.player2_id.in_(ids),
+        Match.player3_id.in_(ids),
+        Match.player4_id.in_(ids),
+    ).first()
+
+
+def next_round_number(tournament_id: int) -> int:
+    last = db.session.query(func.max(Match.round)).filter(Match.tournament_id == tournament_id).scalar()
+    return (last or 0) + 1
+
+
+def match_summary(tournament_id: int) -> Dict[str, int]:
+    """Match, round and completion counts for a tournament in one aggregate query."""
+    completed_rounds = select(func.count()).select_from(
+        _round_groups(tournament_id, 'completed').subquery()).scalar_subquery()
+    total, rounds, completed, completed_rounds = db.session.query(
+        func.count(Match.id), func.count(distinct(Match.round)), func.count(Match.winner_id),
+        completed_rounds).filter(Match.tournament_id == tournament_id).one()
+    return {'total': total, 'rounds': rounds, 'completed': completed, 'pending': total - completed,
+            'completed_rounds': completed_rounds}
+
+
+def _round_groups(tournament_id: int, state: str):
+    """Round numbers in order. 'completed' rounds have every result recorded; 'pending' rounds
+    still need results, plus the latest round so the page always shows where play is."""
+    latest = select(func.max(Match.round)).where(Match.tournament_id == tournament_id).scalar_subquery()
+    all_recorded = func.count() == func.count(Match.winner_id)
+    having = (all_recorded & (Match.round < latest)) if state == 'completed' else (~all_recorded | (Match.round == latest))
+    return (db.session.query(Match.round).filter(Match.tournament_id == tournament_id)
+            .group_by(Match.round).having(having).order_by(Match.round))
+
+
+def round_page(tournament_id: int, state: str, after: Optional[int] = None,
+               limit: int = ROUNDS_PAGE_SIZE) -> Tuple[List[int], Optional[int]]:
+    """One page of 'completed' or 'pending' round numbers after the `after` cursor, walking
+    ix_match_tournament_round. Returns (rounds, cursor for the next page or None)."""
+    query = _round_groups(tournament_id, state)
+    if after is not None:
+        query = query.filter(Match.round > after)
+    rounds = [r for (r,) in query.limit(limit + 1)]
+    if len(rounds) > limit:
+        return rounds[:limit], rounds[limit - 1]
+    return rounds, None
+
+
+def matches_in_rounds(tournament_id: int, rounds: List[int]) -> List[Match]:
+    if not rounds:
+        return []
+    return (Match.query.filter(Match.tournament_id == tournament_id, Match.round.in_(rounds))
+            .order_by(Match.round, Match.id).all())
+
+
+def match_numbers_before(tournament_id: int, rounds: List[int]) -> Dict[int, int]:
+    """{round: matches in earlier rounds}, so a page of rounds can number its matches like the
+    full schedule (Match 1, 2, ... in round order) without loading the rounds in between."""
+    if not rounds:
+        return {}
+    first, last = min(rounds), max(rounds)
+    running = db.session.query(func.count(Match.id)).filter(
+        Match.tournament_id == tournament_id, Match.round < first).scalar()
+    counts = (db.session.query(Match.round, func.count(Match.id))
+              .filter(Match.tournament_id == tournament_id, Match.round.between(first, last))
+              .group_by(Match.round).order_by(Match.round))
+    offsets = {}
+    for round_num, count in counts:
+        offsets[round_num] = running
+        running += count
+    return offsets
+
+
+def match_player_ids(match: Match) -> Tuple[int, int, int, int]:
+    return (match.player1_id, match.player2_id, match.player3_id, match.player4_id)
+
+
+def match_scores(match: Match) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    return (match.score1, match.score2, match.score3, match.score4)
+
+
+def load_standings(tournament_id: int) -> Dict[int, Standing]:
+    """Return {player_id: Standing} for a tournament in a single query."""
+    return {s.player_id: s for s in Standing.query.filter_by(tournament_id=tournament_id).all()}
+
+
+def standing_points(standings: Dict[int, Standing], player_id: int) -> int:
+    standing = standings.get(player_id)
+    return standing.points if standing else 0
+
+
+def standing_rating(standings: Dict[int, Standing], player_id: int) -> float:
+    standing = standings.get(player_id)
+    return standing.rating if standing else RATING_INITIAL
+
+
+def _add_standings_deltas(deltas: Dict[int, List[int]], player_ids, scores, winner_id: Optional[int], sign: int) -> None:
+    """Accumulate [points, wins, matches_played] changes per player for one match result."""
+    for pid, score in zip(player_ids, scores):
+        if score is None:
+            continue
+        row = deltas.setdefault(pid, [0, 0, 0])
+        row[0] += sign * score
+        row[1] += sign if pid == winner_id else 0
+        row[2] += sign
+
+
+def _apply_standings_deltas(tournament_id: int, deltas: Dict[int, List[int]]) -> Dict[int, Standing]:
+    """Apply the deltas and return the touched {player_id: Standing} rows."""
+    if not deltas:
+        return {}
+    existing = {s.player_id: s for s in Standing.query.filter(Standing.player_id.in_(list(deltas))).all()}
+    for pid, (points, wins, played) in deltas.items():
+        standing = existing.get(pid)
+        if standing is None:
+            standing = existing[pid] = Standing(player_id=pid, tournament_id=tournament_id, points=0, wins=0,
+                                                matches_played=0, rating=RATING_INITIAL)
+            db.session.add(standing)
+        standing.points += points
+        standing.wins += wins
+        standing.matches_played += played
+    return existing
+
+
+@span('standings.update')
+def update_standings(match: Match, previous_scores: Optional[Tuple] = None, previous_winner_id: Optional[int] = None) -> None:
+    """Add the match's current result to the standings (caller commits).
+
+    Pass the scores/winner the match held before this submission so a re-recorded
+    result replaces the old contribution instead of being counted twice.
+    """
+    update_standings_batch([(match, previous_scores, previous_winner_id)])
+
+
+@span('standings.update_batch')
+def update_standings_batch(results: List[Tuple[Match, Optional[Tuple], Optional[int]]]) -> None:
+    """update_standings for many (match, previous_scores, previous_winner_id) at once, with one
+    standings read and write at the end (caller commits). Ratings move with the same rows."""
+    deltas: Dict[int, List[int]] = {}
+    tournament_id = None
+    corrected = False
+    for match, previous_scores, previous_winner_id in results:
+        tournament_id = match.tournament_id
+        player_ids = match_player_ids(match)
+        if previous_scores is not None:
+            _add_standings_deltas(deltas, player_ids, previous_scores, previous_winner_id, -1)
+            corrected = corrected or any(score is not None for score in previous_scores)
+        _add_standings_deltas(deltas, player_ids, match_scores(match), match.winner_id, 1)
+    standings = _apply_standings_deltas(tournament_id, deltas)
+    if corrected:
+        # Elo is order-dependent, so a changed result is replayed rather than patched
+        rebuild_ratings(tournament_id)
+    else:
+        update_ratings(standings, [match for match, _, _ in results])
+
+
+def clear_standings(tournament_id: int) -> None:
+    Standing.query.filter_by(tournament_id=tournament_id).update(
+        {Standing.points: 0, Standing.wins: 0, Standing.matches_played: 0, Standing.rating: RATING_INITIAL},
+        synchronize_session=False)
+
+
+@span('standings.rebuild')
+def rebuild_standings(tournament_id: int) -> None:
+    """Recompute a tournament's standings and ratings from its Match rows (caller commits)."""
+    totals: Dict[int, List[int]] = {}
+    results = list(load_snapshot(tournament_id).rows())
+    for row in results:
+        _add_standings_deltas(totals, row[:4], row[4:8], row[8], 1)
+    ratings = compute_ratings(results)
+    Standing.query.filter_by(tournament_id=tournament_id).delete()
+    for pid, (points, wins, played) in totals.items():
+        db.session.add(Standing(player_id=pid, tournament_id=tournament_id, points=points, wins=wins,
+                                matches_played=played, rating=ratings.get(pid, RATING_INITIAL)))
+
+
+def rating_deltas(ratings: List[float], scores: List[int], k: float = RATING_K) -> List[float]:
+    """Multi-player Elo: every pair in the match counts as a head-to-head game (higher score wins,
+    equal scores draw), and each player moves by K/(n-1) times their summed surprise."""
+    n = len(ratings)
+    deltas = [0.0] * n
+    if n < 2:
+        return deltas
+    scale = k / (n - 1)
+    for i in range(n):
+        for j in range(i + 1, n):
+            expected = 1.0 / (1.0 + 10.0 ** ((ratings[j] - ratings[i]) / 400.0))
+            actual = 1.0 if scores[i] > scores[j] else 0.0 if scores[i] < scores[j] else 0.5
+            change = scale * (actual - expected)
+            deltas[i] += change
+            deltas[j] -= change
+    return deltas
+
+
+def compute_ratings(results, initial: float = RATING_INITIAL, k: float = RATING_K) -> Dict[int, float]:
+    """Replay (p1, p2, p3, p4, s1, s2, s3, s4) rows in order from scratch; unrecorded slots are skipped."""
+    ratings: Dict[int, float] = {}
+    for row in results:
+        recorded = [(pid, score) for pid, score in zip(row[:4], row[4:8]) if score is not None]
+        if len(recorded) < 2:
+            continue
+        current = [ratings.get(pid, initial) for pid, _ in recorded]
+        for (pid, _), before, change in zip(recorded, current,
+                                            rating_deltas(current, [score for _, score in recorded], k)):
+            ratings[pid] = before + change
+    return ratings
+
+
+@span('ratings.update')
+def update_ratings(standings: Dict[int, Standing], matches: List[Match]) -> None:
+    """Apply newly recorded matches, in order, to the players' Standing rows (caller commits)."""
+    for match in matches:
+        recorded = [(pid, score) for pid, score in zip(match_player_ids(match), match_scores(match))
+                    if score is not None and pid in standings]
+        if len(recorded) < 2:
+            continue
+        rows = [standings[pid] for pid, _ in recorded]
+        for standing, change in zip(rows, rating_deltas([s.rating for s in rows], [score for _, score in recorded])):
+            standing.rating += change
+
+
+@span('ratings.rebuild')
+def rebuild_ratings(tournament_id: int) -> None:
+    """Replay every recorded match in (round, id) order into Standing.rating (caller commits).
+
+    Incremental updates follow recording order, so a rebuild only reproduces them exactly when
+    results were entered round by round; corrections and the rebuild-ratings command use this.
+    """
+    rows = db.session.query(
+        Match.player1_id, Match.player2_id, Match.player3_id, Match.player4_id,
+        Match.score1, Match.score2, Match.score3, Match.score4,
+    ).filter(Match.tournament_id == tournament_id, Match.winner_id.isnot(None)).order_by(Match.round, Match.id)
+    ratings = compute_ratings(rows)
+    for standing in Standing.query.filter_by(tournament_id=tournament_id):
+        standing.rating = ratings.get(standing.player_id, RATING_INITIAL)
+
+
+def rebuild_all_ratings() -> int:
+    """rebuild_ratings (and touch_tournament) for every tournament with standings and commit.
+    Returns tournaments rebuilt."""
+    tournament_ids = [tid for (tid,) in db.session.query(Standing.tournament_id).distinct()]
+    for tid in tournament_ids:
+        rebuild_ratings(tid)
+        touch_tournament(tid)
+    db.session.commit()
+    return len(tournament_ids)
+
+
+def backfill_standings() -> None:
+    """Build standings for tournaments with recorded results but no standings rows yet
+    (databases created before standings were persisted)."""
+    scored = {tid for (tid,) in db.session.query(Match.tournament_id).filter(Match.winner_id.isnot(None)).distinct()}
+    tracked = {tid for (tid,) in db.session.query(Standing.tournament_id).distinct()}
+    missing = scored - tracked
+    for tid in sorted(missing):
+        rebuild_standings(tid)
+    if missing:
+        db.session.commit()
+
+
+def _statistics_row(player: Player, matches_played: int, wins: int, total_score: int) -> Dict:
+    avg_score = total_score / matches_played if matches_played > 0 else 0
+    return {
+        'player': player,
+        'matches_played': matches_played,
+        'wins': wins,
+        'total_score': total_score,
+        'avg_score': avg_score,
+        'win_rate': wins / matches_played if matches_played > 0 else 0
+    }
+
+
+def _sort_statistics(stats: List[Dict], rank_by: str = 'points') -> List[Dict]:
+    if rank_by == 'rating':
+        stats.sort(key=lambda x: (x['rating'], x['total_score'], x['wins']), reverse=True)
+    else:
+        stats.sort(key=lambda x: (x['total_score'], x['wins'], x['avg_score']), reverse=True)
+    return stats
+
+
+@span('stats.from_standings')
+def statistics_from_standings(players: List[Player], standings: Dict[int, Standing],
+                              rank_by: str = 'points') -> List[Dict]:
+    """Same rows as statistics_from_columns plus 'rating', read from persisted standings in
+    O(players) and ordered by points (default) or rating."""
     stats = []
     for player in players:
-        player_matches = [m for m in matches if player.id in {m.player1_id, m.player2_id, m.player3_id, m.player4_id}]
-        total_score = 0
-        wins = 0
-        for m in player_matches:
-            if m.player1_id == player.id and m.score1 is not None:
-                total_score += m.score1
-                if m.winner_id == player.id:
-                    wins += 1
-            elif m.player2_id == player.id and m.score2 is not None:
-                total_score += m.score2
-                if m.winner_id == player.id:
-                    wins += 1
-            elif m.player3_id == player.id and m.score3 is not None:
-                total_score += m.score3
-                if m.winner_id == player.id:
-                    wins += 1
-            elif m.player4_id == player.id and m.score4 is not None:
-                total_score += m.score4
-                if m.winner_id == player.id:
-                    wins += 1
-        matches_played = len(player_matches)
-        avg_score = total_score / matches_played if matches_played > 0 else 0
+        s = standings.get(player.id)
+        if s is None:
+            row = _statistics_row(player, 0, 0, 0)
+            row['rating'] = RATING_INITIAL
+        else:
+            row = _statistics_row(player, s.matches_played, s.wins, s.points)
+            row['rating'] = s.rating
+        stats.append(row)
+    return _sort_statistics(stats, rank_by)
+
+
+def score_columns_from_rows(rows) -> ScoreColumns:
+    """Build ScoreColumns from (p1, p2, p3, p4, s1, s2, s3, s4, winner_id) tuples."""
+    data = np.array(list(rows), dtype=float).reshape(-1, 9)
+    player_ids = data[:, 0:4].astype(np.int64)
+    scores = data[:, 4:8]
+    winner_ids = np.nan_to_num(data[:, 8], nan=0).astype(np.int64)
+    return player_ids, scores, winner_ids
+
+
+def score_columns_from_matches(matches: List[Match]) -> ScoreColumns:
+    return score_columns_from_rows(match_player_ids(m) + match_scores(m) + (m.winner_id,) for m in matches)
+
+
+@span('stats.load_score_columns')
+def load_score_columns(tournament_id: int) -> ScoreColumns:
+    """Pull a tournament's score columns with one column-only query (no ORM objects)."""
+    return load_snapshot(tournament_id).columns
+
+
+@span('stats.arrays')
+def player_statistics_arrays(columns: Union[ScoreColumns, TournamentSnapshot],
+                             player_ids: List[int]) -> Dict[str, np.ndarray]:
+    """Total score, wins, matches played, average and win rate for every player in one pass.
+
+    Arrays are aligned with player_ids. Like the standings, a match counts as played, and its
+    score and win count, only once the player's slot is recorded (zero is a valid score).
+    """
+    if isinstance(columns, TournamentSnapshot):
+        columns = columns.columns
+    pids, scores, winners = columns
+    ids = np.asarray(player_ids, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    sorted_ids = ids[order]
+    n = len(ids)
+    total_score = np.zeros(n)
+    wins = np.zeros(n, dtype=np.int64)
+    matches_played = np.zeros(n, dtype=np.int64)
+    if n and len(pids):
+        # Map every slot's player id to its position in sorted_ids; -1 for players not asked about
+        pos = np.searchsorted(sorted_ids, pids)
+        pos_clipped = np.minimum(pos, n - 1)
+        slot_idx = np.where(sorted_ids[pos_clipped] == pids, pos_clipped, -1)
+        present = slot_idx >= 0
+        recorded = present & ~np.isnan(scores)
+        won = recorded & (pids == winners[:, None])
+        matches_played = np.bincount(slot_idx[recorded], minlength=n)
+        total_score = np.bincount(slot_idx[recorded], weights=scores[recorded], minlength=n)
+        wins = np.bincount(slot_idx[won], minlength=n)
+        # Back to the caller's order
+        inverse = np.empty(n, dtype=np.int64)
+        inverse[order] = np.arange(n)
+        matches_played, total_score, wins = matches_played[inverse], total_score[inverse], wins[inverse]
+    total_score = total_score.astype(np.int64)
+    safe_played = np.maximum(matches_played, 1)
+    return {
+        'total_score': total_score,
+        'wins': wins,
+        'matches_played': matches_played,
+        'avg_score': np.where(matches_played > 0, total_score / safe_played, 0.0),
+        'win_rate': np.where(matches_played > 0, wins / safe_played, 0.0),
+    }
+
+
+@span('stats.from_columns')
+def statistics_from_columns(players: List[Player], columns: Union[ScoreColumns, TournamentSnapshot]) -> List[Dict]:
+    arrays = player_statistics_arrays(columns, [p.id for p in players])
+    stats = []
+    for i, player in enumerate(players):
         stats.append({
             'player': player,
-            'matches_played': matches_played,
-            'wins': wins,
-            'total_score': total_score,
-            'avg_score': avg_score,
-            'win_rate': wins / matches_played if matches_played > 0 else 0
+            'matches_played': int(arrays['matches_played'][i]),
+            'wins': int(arrays['wins'][i]),
+            'total_score': int(arrays['total_score'][i]),
+            'avg_score': float(arrays['avg_score'][i]),
+            'win_rate': float(arrays['win_rate'][i]),
         })
-    stats.sort(key=lambda x: (x['total_score'], x['wins'], x['avg_score']), reverse=True)
-    return stats
+    return _sort_statistics(stats)
+
+
+def link_identities(players: List[Player]) -> None:
+    """Point unlinked players at the PlayerIdentity with the same name (case-insensitive),
+    creating the missing identities in bulk (caller commits)."""
+    unlinked = [p for p in players if p.identity_id is None]
+    if not unlinked:
+        return
+    names = {p.name.lower(): p.name for p in unlinked}
+    found = {i.name.lower(): i.id for i in PlayerIdentity.query.filter(
+        db.collate(PlayerIdentity.name, 'NOCASE').in_(list(names.values())))}
+    missing = [name for key, name in names.items() if key not in found]
+    if missing:
+        # Plain executemany: RETURNING with ordered ids would make SQLite insert row by row
+        db.session.execute(insert(PlayerIdentity), [{'name': name} for name in missing])
+        found.update((i.name.lower(), i.id) for i in PlayerIdentity.query.filter(
+            db.collate(PlayerIdentity.name, 'NOCASE').in_(missing)))
+    for player in unlinked:
+        player.identity_id = found[player.name.lower()]
+
+
+@span('season.roll_up')
+def roll_up_tournament(tournament: Tournament) -> int:
+    """Add a finished tournament's standings to its season's leaderboard, once (caller commits).
+
+    Humans who played are linked to identities and each gets one event, their points, wins and
+    matches, and a podium for a top-PODIUM_PLACES finish in the results-page order. Returns the
+    number of identities updated.
+    """
+    if tournament.season_id is None or tournament.rolled_up_at is not None:
+        return 0
+    players = human_players(tournament.id)
+    ranked = [row for row in statistics_from_standings(players, load_standings(tournament.id))
+              if row['matches_played']]
+    link_identities([row['player'] for row in ranked])
+    deltas: Dict[int, List[int]] = {}
+    for place, row in enumerate(ranked, start=1):
+        delta = deltas.setdefault(row['player'].identity_id, [0, 0, 0, 0, 0])
+        delta[0] = 1  # one event however many entries share a name
+        delta[1] += row['total_score']
+        delta[2] += row['wins']
+        delta[3] += row['matches_played']
+        delta[4] = max(delta[4], int(place <= PODIUM_PLACES))
+    existing = {s.identity_id: s for s in SeasonStanding.query.filter(
+        SeasonStanding.season_id == tournament.season_id, SeasonStanding.identity_id.in_(list(deltas)))} if deltas else {}
+    for identity_id, (events, points, wins, played, podiums) in deltas.items():
+        standing = existing.get(identity_id)
+        if standing is None:
+            standing = SeasonStanding(season_id=tournament.season_id, identity_id=identity_id, events=0, points=0,
+                                      wins=0, matches_played=0, podiums=0)
+            db.session.add(standing)
+        standing.events += events
+        standing.points += points
+        standing.wins += wins
+        standing.matches_played += played
+        standing.podiums += podiums
+    tournament.rolled_up_at = datetime.utcnow()
+    return len(deltas)
+
+
+@span('season.rebuild')
+def rebuild_season(season_id: int) -> None:
+    """Recompute a season's leaderboard from its completed tournaments (caller commits); for
+    tournaments joining or leaving the season after they ended, and results corrected since."""
+    SeasonStanding.query.filter_by(season_id=season_id).delete()
+    db.session.flush()
+    for tournament in Tournament.query.filter_by(season_id=season_id, status='completed').order_by(Tournament.id):
+        tournament.rolled_up_at = None
+        roll_up_tournament(tournament)
+        db.session.flush()  # the next tournament adds to these rows
+
+
+def set_tournament_season(tournament: Tournament, season_id: Optional[int]) -> None:
+    """Move a tournament into a season (or out, with None), keeping both leaderboards right (caller commits)."""
+    previous = tournament.season_id
+    if previous == season_id:
+        return
+    tournament.season_id = season_id
+    tournament.rolled_up_at = None
+    if tournament.status == 'completed':
+        db.session.flush()
+        for affected in (previous, season_id):
+            if affected is not None:
+                rebuild_season(affected)
+
 
+def season_leaderboard(season_id: int) -> List[Tuple[SeasonStanding, str]]:
+    """(SeasonStanding, identity name) rows, best first, straight from the rollups."""
+    return (db.session.query(SeasonStanding, PlayerIdentity.name)
+            .join(PlayerIdentity, PlayerIdentity.id == SeasonStanding.identity_id)
+            .filter(SeasonStanding.season_id == season_id)
+            .order_by(SeasonStanding.points.desc(), SeasonStanding.wins.desc(), SeasonStanding.podiums.desc(),
+                      PlayerIdentity.name)
+            .all())
@@ -0,0 +1,122 @@
+"""Monte Carlo simulation of a tournament's unplayed matches.
+
+Pure NumPy with no app imports, so worker processes (spawned, not forked from a threaded web
+worker) only pay for importing NumPy, plus re-running the main script as __mp_main__ (app.py
+skips its database setup there). services.finals_odds gathers the standings and the
+unplayed matches and calls simulate().
+
+A 4-player match has only 24 finishing orders, so each simulated match draws one order index:
+uniformly, or from Plackett-Luce probabilities when players have strengths. That probability
+table is computed once per match rather than once per iteration. Whole batches of iterations
+are sampled as (iterations, matches) arrays.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+from typing import Optional, Tuple
+
+import numpy as np
+
+from constants import POSITION_POINTS
+
+# Upper bound on simulated matches (iterations x matches) held in memory at once
+BATCH_MATCHES = 250_000
+
+# ORDERS[k] lists the slots from 1st to 4th place; ORDER_POINTS[k, slot] is that slot's points
+ORDERS = np.array(list(permutations(range(4))))
+ORDER_POINTS = np.zeros((len(ORDERS), 4), dtype=np.float32)
+for _k, _order in enumerate(ORDERS):
+    ORDER_POINTS[_k, _order] = [POSITION_POINTS[place] for place in range(1, 5)]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def order_probabilities(log_strength: np.ndarray) -> np.ndarray:
+    """Plackett-Luce probability of each of the 24 finishing orders, per match: (matches, 24).
+
+    Each place goes to one of the remaining players with probability proportional to strength.
+    """
+    strength = np.exp(log_strength - log_strength.max(axis=1, keepdims=True))
+    picked = strength[:, ORDERS]  # (matches, 24, 4) strengths in finishing order
+    remaining = strength.sum(axis=1)[:, None, None] - np.cumsum(picked, axis=2) + picked
+    return np.prod(picked[:, :, :3] / remaining[:, :, :3], axis=2)
+
+
+def simulate_chunk(base_points: np.ndarray, slots: np.ndarray, log_strength: Optional[np.ndarray],
+                   iterations: int, seed, top_n: int = 4) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Simulate `iterations` completions of the schedule.
+
+    base_points[p] is player p's current total; slots[m] holds the player indexes of unplayed
+    match m, -1 for anyone not tracked (bots); log_strength, shaped like slots, weights the draw
+    (None: every order equally likely). Ties in the final table go to the lower player index,
+    like top_n_players_by_totals keeping the incoming order. Returns per-player counts of top_n
+    finishes and first places, and the summed final points.
+    """
+    rng = np.random.default_rng(seed)
+    n_players = len(base_points)
+    n_matches = len(slots)
+    top_counts = np.zeros(n_players, dtype=np.int64)
+    first_counts = np.zeros(n_players, dtype=np.int64)
+    points_sum = np.zeros(n_players)
+    if n_players == 0 or iterations <= 0:
+        return top_counts, first_counts, points_sum
+    columns = n_players + 1  # last column collects untracked slots
+    targets = np.where(slots < 0, n_players, slots)
+    cumulative = None
+    if log_strength is not None and n_matches:
+        cumulative = np.cumsum(order_probabilities(log_strength), axis=1)
+        cumulative[:, -1] = np.inf  # rounding must never push a draw past the last order
+    # Higher points first, then lower index; integral points keep this exact in float64
+    tiebreak = (n_players - 1 - np.arange(n_players)) / n_players
+    batch = max(1, BATCH_MATCHES // max(1, n_matches))
+    done = 0
+    while done < iterations:
+        n = min(batch, iterations - done)
+        done += n
+        totals = np.broadcast_to(base_points, (n, n_players)).copy()
+        if n_matches:
+            if cumulative is None:
+                orders = rng.integers(0, len(ORDERS), size=(n, n_matches))
+            else:
+                orders = (rng.random((n, n_matches))[:, :, None] >= cumulative[None]).sum(axis=2)
+            gained = np.take(ORDER_POINTS, orders, axis=0)  # (n, matches, 4)
+            flat = (targets[None, :, :] + (np.arange(n) * columns)[:, None, None]).ravel()
+            totals += np.bincount(flat, weights=gained.ravel(), minlength=n * columns).reshape(n, columns)[:, :n_players]
+        key = totals + tiebreak
+        if n_players > top_n:
+            top = np.argpartition(-key, top_n - 1, axis=1)[:, :top_n]
+            top_counts += np.bincount(top.ravel(), minlength=n_players)
+        else:
+            top_counts += n
+        first_counts += np.bincount(key.argmax(axis=1), minlength=n_players)
+        points_sum += totals.sum(axis=0)
+    return top_counts, first_counts, points_sum
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def simulate(base_points: np.ndarray, slots: np.ndarray, log_strength: Optional[np.ndarray],
+             iterations: int, workers: int = 0, seed=None, top_n: int = 4):
+    """simulate_chunk split across `workers` processes (0 or 1 runs in this process), each with an
+    independent child seed. Same return value."""
+    seeds = np.random.SeedSequence(seed).spawn(max(1, workers))
+    if workers <= 1:
+        return simulate_chunk(base_points, slots, log_strength, iterations, seeds[0], top_n)
+    shares = [iterations // workers + (1 if i < iterations % workers else 0) for i in range(workers)]
+    pool = _get_pool(workers)
+    futures = [pool.submit(simulate_chunk, base_points, slots, log_strength, share, child, top_n)
+               for share, child in zip(shares, seeds) if share]
+    results = [future.result() for future in futures]
+    return tuple(sum(parts) for parts in zip(*results))
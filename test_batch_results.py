@@ -0,0 +1,83 @@
+from sqlalchemy import event
+
+from conftest import make_tournament
+from app import db
+from models import Match, MatchParticipant, Standing
+from services import rebuild_standings
+
+
+def _match_ids(app):
+    with app.app_context():
+        return [m.id for m in Match.query.order_by(Match.id).all()]
+
+
+def _standings(app):
+    with app.app_context():
+        return {s.player_id: (s.points, s.wins, s.matches_played) for s in Standing.query.all()}
+
+
+def test_plan_schedule_bulk_inserts_matches_with_participants(app, client):
+    make_tournament(client, 40)
+    inserts = []
+
+    def record(conn, cursor, statement, *args):
+        if statement.startswith('INSERT'):
+            inserts.append(statement.split('(')[0])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.post('/tournament/1/plan_schedule', data={'games_per_player': '3'})
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    # One executemany per table, not one INSERT per match
+    assert inserts.count('INSERT INTO "match" ') == inserts.count('INSERT INTO match_participant ') == 1
+    with app.app_context():
+        matches = Match.query.order_by(Match.id).all()
+        assert [m.round for m in matches] == list(range(1, len(matches) + 1))
+        assert MatchParticipant.query.count() == 4 * len(matches)
+
+
+def test_json_batch_standings_match_a_full_rebuild(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    ids = _match_ids(app)
+    orders = [[1, 2, 3, 4], [4, 3, 2, 1]]
+    # Re-recording a match inside a later batch must replace, not add to, its first result
+    client.post(f'/tournament/1/record_result/{ids[0]}', data={'pos1': '3', 'pos2': '4', 'pos3': '1', 'pos4': '2'})
+    resp = client.post('/tournament/1/record_results', json={'results': [
+        {'match_id': mid, 'positions': orders[i % 2]} for i, mid in enumerate(ids)]})
+    assert resp.status_code == 200
+    assert resp.get_json()['recorded'] == len(ids)
+    incremental = _standings(app)
+    with app.app_context():
+        rebuild_standings(1)
+        db.session.commit()
+    assert _standings(app) == incremental
+
+
+def test_csv_batch_is_all_or_nothing(app, client):
+    make_tournament(client, 8, games_per_player=1)
+    ids = _match_ids(app)
+    body = f"match_id,pos1,pos2,pos3,pos4\n{ids[0]},1,2,3,4\n{ids[1]},1,1,3,4\n"
+    resp = client.post('/tournament/1/record_results', data=body, content_type='text/csv')
+    assert resp.status_code == 400
+    assert 'Row 2: Positions must be unique for each player.' in resp.get_json()['errors']
+    with app.app_context():
+        assert Match.query.filter(Match.winner_id.isnot(None)).count() == 0
+
+    body = '\n'.join(f'{mid},4,3,2,1' for mid in ids)
+    resp = client.post('/tournament/1/record_results', data=body, content_type='text/csv')
+    assert resp.status_code == 200
+    with app.app_context():
+        assert Match.query.filter(Match.winner_id.is_(None)).count() == 0
+        match = db.session.get(Match, ids[0])
+        assert match.winner_id == match.player4_id
+        assert sorted(p.score for p in match.participants) == [1, 2, 3, 4]
+
+
+def test_form_batch_rejects_foreign_match(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    resp = client.post('/tournament/1/record_results', data={'results': '999,1,2,3,4'})
+    assert resp.status_code == 302
+    assert 'not+part+of+this+tournament' in resp.headers['Location']
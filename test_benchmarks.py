@@ -0,0 +1,25 @@
+import json
+
+import benchmarks
+from services import load_score_columns, load_standings, player_statistics_arrays
+
+
+def test_smallest_benchmark_sizes_run_and_write_json(app, tmp_path):
+    out = tmp_path / 'bench.json'
+    benchmarks.main(['services', 'routes', '--max-players', '8', '--json', str(out)])
+    report = json.loads(out.read_text())
+    routes = {row['operation']: row for row in report['benchmarks']['routes']}
+    assert {'plan_schedule', 'generate_bracket', 'generate_finals', 'record_result',
+            'tournament_detail', 'tournament_results'} <= set(routes)
+    assert routes['tournament_detail cached']['queries'] < routes['tournament_detail']['queries']
+    assert all(row['peak_kb'] > 0 for row in report['benchmarks']['services'])
+
+
+def test_seeded_standings_match_seeded_results(app):
+    with app.app_context():
+        tid = benchmarks.seed_tournament(20, 60)
+        standings = load_standings(tid)
+        columns = load_score_columns(tid)
+        pids = sorted(standings)
+        arrays = player_statistics_arrays(columns, pids)
+        assert [standings[p].points for p in pids] == [int(x) for x in arrays['total_score']]
@@ -0,0 +1,45 @@
+from sqlalchemy import event, text
+
+from conftest import make_tournament
+from app import db
+from models import Player
+from migrations import backfill_bot_flags
+
+
+def test_backfill_flags_prefixed_names_only(app):
+    with app.app_context():
+        db.session.execute(text("INSERT INTO tournament (name, version) VALUES ('Old', 0)"))
+        db.session.execute(text("INSERT INTO player (name, tournament_id, is_bot) VALUES "
+                                "('[BOT] 1', 1, 0), ('Bob', 1, 0), ('Not [BOT]', 1, 0)"))
+        db.session.commit()
+        assert backfill_bot_flags() == 1
+        assert [p.name for p in Player.query.filter_by(is_bot=True)] == ['[BOT] 1']
+
+
+def test_planning_again_reuses_cached_bot_ids(app, client):
+    make_tournament(client, 5)
+    client.post('/tournament/1/plan_schedule', data={'games_per_player': '1'})
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        assert Player.query.filter_by(is_bot=True).count() == 4
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.post('/tournament/1/plan_schedule', data={'games_per_player': '2'})
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert not [s for s in statements if 'player.is_bot = 1' in s]
+    with app.app_context():
+        assert Player.query.filter_by(is_bot=True).count() == 4
+
+
+def test_bots_cannot_be_renamed(app, client):
+    make_tournament(client, 5, games_per_player=1)
+    with app.app_context():
+        bot_id = Player.query.filter_by(is_bot=True).first().id
+    resp = client.post(f'/tournament/1/player/{bot_id}/edit', data={'name': 'Sneaky'})
+    assert 'Bot+players+cannot+be+renamed' in resp.headers['Location']
@@ -0,0 +1,103 @@
+import multiprocessing
+
+import pytest
+
+from conftest import make_tournament
+from test_batch_results import _match_ids, _standings
+from app import db
+from models import Match
+from services import rebuild_standings
+
+WRITERS = 8
+
+fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(),
+                          reason='needs fork to share the test app with worker processes')
+
+
+def _record(app, match_id, barrier, errors):
+    """One 'worker process': wait for the others, then post a result."""
+    with app.app_context():
+        db.engine.dispose(close=False)  # never reuse the parent's SQLite handles
+    client = app.test_client()
+    barrier.wait()
+    try:
+        resp = client.post(f'/tournament/1/record_result/{match_id}',
+                           data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+        if resp.status_code != 302 or 'cat=danger' in resp.headers['Location']:
+            errors.put(f'{match_id}: {resp.status_code} {resp.headers.get("Location")}')
+    except Exception as exc:  # "database is locked" surfaces as OperationalError
+        errors.put(f'{match_id}: {exc!r}')
+
+
+def _generate(app, barrier, errors):
+    """A 'worker process' that opens a swiss round through the GET link on the detail page."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+    client = app.test_client()
+    barrier.wait()
+    try:
+        resp = client.get('/tournament/1/generate_bracket?pairing=swiss')
+        if resp.status_code != 302:
+            errors.put(f'generate_bracket: {resp.status_code}')
+    except Exception as exc:
+        errors.put(f'generate_bracket: {exc!r}')
+
+
+def test_sqlite_runs_in_wal_mode(app):
+    with app.app_context():
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert db.session.execute(db.text('PRAGMA busy_timeout')).scalar() == app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+
+@fork
+def test_concurrent_record_result_writers_do_not_lock(app, client):
+    make_tournament(client, 2 * WRITERS, games_per_player=2)
+    ids = _match_ids(app)[:WRITERS]
+    with app.app_context():
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(WRITERS)
+    errors = ctx.Queue()
+    workers = [ctx.Process(target=_record, args=(app, mid, barrier, errors)) for mid in ids]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(60)
+    assert [w.exitcode for w in workers] == [0] * WRITERS
+    assert errors.empty(), errors.get()
+
+    with app.app_context():
+        assert Match.query.filter(Match.id.in_(ids), Match.winner_id.isnot(None)).count() == WRITERS
+    # Interleaved read-modify-write of shared standings rows must not lose updates
+    incremental = _standings(app)
+    with app.app_context():
+        rebuild_standings(1)
+        db.session.commit()
+    assert _standings(app) == incremental
+
+
+@fork
+def test_get_bracket_generation_queues_with_result_writers(app, client):
+    # generate_bracket writes on a GET; a deferred transaction there hits SQLITE_BUSY on upgrade
+    make_tournament(client, 2 * WRITERS, games_per_player=2)
+    ids = _match_ids(app)[:WRITERS // 2]
+    with app.app_context():
+        rounds = db.session.query(db.func.max(Match.round)).scalar()
+        db.engine.dispose()
+
+    ctx = multiprocessing.get_context('fork')
+    barrier = ctx.Barrier(WRITERS)
+    errors = ctx.Queue()
+    workers = [ctx.Process(target=_record, args=(app, mid, barrier, errors)) for mid in ids]
+    workers += [ctx.Process(target=_generate, args=(app, barrier, errors)) for _ in range(WRITERS - len(ids))]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(60)
+    assert [w.exitcode for w in workers] == [0] * WRITERS
+    assert errors.empty(), errors.get()
+
+    with app.app_context():
+        assert Match.query.filter(Match.id.in_(ids), Match.winner_id.isnot(None)).count() == len(ids)
+        assert db.session.query(db.func.max(Match.round)).scalar() == rounds + WRITERS - len(ids)
@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import insert
+
+from conftest import make_tournament
+from app import db
+from formats import FormatError, plan_stages, select_format
+from models import Match, Player, StageEntry, Tournament, TournamentStage
+
+
+def _play_pending(app, client):
+    """Record every unplayed match (slot order = finishing order); returns how many were played."""
+    with app.app_context():
+        ids = [m.id for m in Match.query.filter(Match.winner_id.is_(None)).order_by(Match.id)]
+    for mid in ids:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    return len(ids)
+
+
+def test_format_follows_the_field_size():
+    assert [select_format(n) for n in (4, 5, 8, 9, 16, 17, 32, 33, 256)] == [
+        'micro', 'small', 'small', 'medium', 'medium', 'large', 'large', 'mega', 'mega']
+    stages = plan_stages(256)
+    assert [s['name'] for s in stages][-3:] == ['Quarter-finals', 'Semi-finals', 'Final']
+    # Every stage takes exactly the players the stage before it sends through
+    assert all(b['entrants'] == a['advance'] for a, b in zip(stages, stages[1:]))
+    assert plan_stages(20, 'small')[0]['entrants'] == 20
+    with pytest.raises(FormatError):
+        select_format(3)
+    with pytest.raises(FormatError):
+        plan_stages(5, 'micro')
+
+
+def test_large_field_only_materialises_the_first_stage(app, client):
+    client.post('/create_tournament', data={'name': 'Open'})
+    with app.app_context():
+        db.session.execute(insert(Player), [{'name': f'P{i}', 'tournament_id': 1} for i in range(256)])
+        db.session.commit()
+    client.post('/tournament/1/start_format')
+    with app.app_context():
+        assert db.session.get(Tournament, 1).format == 'mega'
+        stages = TournamentStage.query.order_by(TournamentStage.position).all()
+        assert len(stages) == len(plan_stages(256))
+        assert [s.status for s in stages] == ['active'] + ['pending'] * (len(stages) - 1)
+        assert {m.stage_id for m in Match.query} == {stages[0].id}
+        assert StageEntry.query.count() == 256
+        humans = {p.id for p in Player.query.filter_by(is_bot=False)}
+        appearances = [pid for m in Match.query for pid in (m.player1_id, m.player2_id, m.player3_id, m.player4_id)
+                       if pid in humans]
+        assert sorted(appearances) == sorted(humans)
+    assert client.get('/tournament/1/stages').status_code == 200
+
+
+def test_results_advance_stages_until_the_final_ends_the_tournament(app, client):
+    make_tournament(client, 10)
+    client.post('/tournament/1/start_format')
+    rounds = 0
+    while _play_pending(app, client):
+        rounds += 1
+    with app.app_context():
+        stages = TournamentStage.query.order_by(TournamentStage.position).all()
+        assert [s.name for s in stages] == ['Pool play', 'Semi-finals', 'Final']
+        assert rounds == 3 and all(s.status == 'done' for s in stages)
+        for stage in stages[:-1]:
+            assert StageEntry.query.filter_by(stage_id=stage.id, advanced=True).count() == stage.advance
+        final = Match.query.filter_by(stage_id=stages[-1].id).one()
+        finalists = {final.player1_id, final.player2_id, final.player3_id, final.player4_id}
+        assert not Player.query.filter(Player.id.in_(finalists), Player.is_bot.is_(True)).count()
+        assert db.session.get(Tournament, 1).status == 'completed'
+    page = client.get('/tournament/1/stages').get_data(as_text=True)
+    assert 'Semi-finals' in page and 'table-success' in page
+
+
+def test_start_needs_a_clean_slate_and_reset_removes_the_stages(app, client):
+    make_tournament(client, 6, games_per_player=1)
+    resp = client.post('/tournament/1/start_format')
+    assert 'Reset+the+matches' in resp.headers['Location']
+    client.post('/tournament/1/reset_matches')
+    client.post('/tournament/1/start_format', data={'format': 'small'})
+    client.post('/tournament/1/reset_matches')
+    with app.app_context():
+        assert not TournamentStage.query.count() and not StageEntry.query.count()
+        assert db.session.get(Tournament, 1).format is None
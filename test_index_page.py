@@ -0,0 +1,55 @@
+from app import db
+from models import Match, Tournament
+from services import tournament_index_page
+from conftest import make_tournament
+
+
+def _create(client, names):
+    for name in names:
+        client.post('/create_tournament', data={'name': name})
+
+
+def test_index_pages_with_keyset_cursors(app, client):
+    _create(client, [f'Weekly {i:02d}' for i in range(45)])
+    with app.app_context():
+        first, has_older, has_newer = tournament_index_page(limit=20)
+        assert [r.id for r in first] == list(range(45, 25, -1)) and has_older and not has_newer
+        second, has_older, has_newer = tournament_index_page(before=first[-1].id, limit=20)
+        assert [r.id for r in second] == list(range(25, 5, -1)) and has_older and has_newer
+        last, has_older, _ = tournament_index_page(before=second[-1].id, limit=20)
+        assert [r.id for r in last] == [5, 4, 3, 2, 1] and not has_older
+        back, _, has_newer = tournament_index_page(after=last[0].id, limit=20)
+        assert back == second and has_newer
+
+    body = client.get('/?before=26').get_data(as_text=True)
+    assert 'Weekly 24' in body and 'Weekly 25' not in body
+    assert 'after=25' in body and 'before=6' in body
+
+
+def test_index_aggregates_come_from_one_query(app, client, query_budget):
+    make_tournament(client, 4, games_per_player=1)
+    client.post('/tournament/1/record_result/1', data={'pos1': '2', 'pos2': '1', 'pos3': '3', 'pos4': '4'})
+    query_budget(1)
+    body = client.get('/').get_data(as_text=True)
+    with app.app_context():
+        [row], _, _ = tournament_index_page()
+        winner = db.session.get(Match, 1).winner.name
+    assert (row.player_count, row.match_count, row.recorded_count) == (4, 1, 1)
+    assert row.leader == winner
+    # A 4-player tournament completes with its only match (see final_among)
+    assert 'Players: 4' in body and '100% played' in body and f'Champion: {winner}' in body
+
+
+def test_index_search_is_a_literal_prefix_and_filters_status(app, client):
+    _create(client, ['Spring Cup', 'spring_final', 'Summer Cup', 'Springfield'])
+    with app.app_context():
+        db.session.get(Tournament, 4).status = 'completed'
+        db.session.commit()
+        names = lambda **kw: [r.name for r in tournament_index_page(**kw)[0]]
+        assert names(search='spring') == ['Springfield', 'spring_final', 'Spring Cup']
+        assert names(search='spring_') == ['spring_final']  # '_' is not a wildcard
+        assert names(search='spring', status='active') == ['spring_final', 'Spring Cup']
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM tournament WHERE name LIKE 'spr%' ORDER BY id DESC")).all()
+        assert 'ix_tournament_name_nocase' in ' '.join(row[-1] for row in plan)
+    assert 'Springfield' not in client.get('/?q=Spring&status=active').get_data(as_text=True)
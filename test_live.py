@@ -0,0 +1,90 @@
+import json
+
+from conftest import make_tournament
+from live import broker
+from models import Match, TournamentEvent
+
+POSITIONS = {'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'}
+
+
+def _events(app, kind=None):
+    with app.app_context():
+        query = TournamentEvent.query.order_by(TournamentEvent.id)
+        if kind:
+            query = query.filter_by(kind=kind)
+        return [(e.id, e.kind, json.loads(e.payload)) for e in query]
+
+
+def _open_match(app):
+    with app.app_context():
+        return Match.query.filter_by(winner_id=None).order_by(Match.id).first().id
+
+
+def test_record_result_publishes_card_and_changed_standings(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    mid = _open_match(app)
+    client.post(f'/tournament/1/record_result/{mid}', data=POSITIONS)
+
+    [(_, _, result)] = _events(app, 'result')
+    assert list(result['cards']) == [str(mid)]
+    assert f'id="match-{mid}"' in result['cards'][str(mid)] and 'Winner:' in result['cards'][str(mid)]
+    assert result['summary']['completed'] == 1
+    [(_, _, standings)] = _events(app, 'standings')
+    assert sorted(row['total_score'] for row in standings['rows']) == [1, 2, 3, 4]
+
+
+def test_new_matches_are_pushed_as_rounds_unless_too_many(app, client):
+    make_tournament(client, 8)
+    client.get('/tournament/1/generate_bracket')
+    [(_, _, pushed)] = _events(app, 'matches')
+    assert pushed['html'].count('data-round=') == 1 and pushed['summary']['total'] == 2
+
+    app.config['LIVE_MAX_PUSHED_MATCHES'] = 3
+    try:
+        client.post('/tournament/1/plan_schedule', data={'games_per_player': '4'})
+    finally:
+        app.config['LIVE_MAX_PUSHED_MATCHES'] = 50
+    assert _events(app, 'matches')[-1][2]['html'] is None
+
+
+def test_one_poll_fans_out_to_every_viewer(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    broker.reset()
+    with app.app_context():
+        viewers = [broker.subscribe(1) for _ in range(200)]
+    watermark = broker.last_id
+    client.post(f'/tournament/1/record_result/{_open_match(app)}', data=POSITIONS)
+    broker.poll()
+    try:
+        # Everything published after the viewers connected: result, standings (and status if it was the final)
+        expected = [(event_id, kind) for event_id, kind, _ in _events(app) if event_id > watermark]
+        assert [kind for _, kind in expected][:2] == ['result', 'standings']
+        for q in viewers:
+            assert [q.get_nowait()[:2] for _ in range(q.qsize())] == expected
+    finally:
+        broker.reset()
+
+
+def test_stream_replays_after_since_and_last_event_id(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    client.post(f'/tournament/1/record_result/{_open_match(app)}', data=POSITIONS)
+    first_id = _events(app)[0][0]
+    app.config['LIVE_STREAM_SECONDS'] = 0.05
+    try:
+        resp = client.get('/tournament/1/events?since=0')
+        assert resp.mimetype == 'text/event-stream'
+        body = resp.get_data(as_text=True)
+        assert body.startswith('retry: ') and 'event: result\n' in body and 'event: standings\n' in body
+        resumed = client.get('/tournament/1/events', headers={'Last-Event-ID': str(first_id)}).get_data(as_text=True)
+    finally:
+        app.config['LIVE_STREAM_SECONDS'] = 300
+        broker.reset()
+    assert f'id: {first_id}\n' not in resumed and 'event: standings\n' in resumed
+    assert broker.viewer_count() == 0
+
+
+def test_pages_embed_their_stream_position(app, client):
+    make_tournament(client, 8, games_per_player=1)
+    last = _events(app)[-1][0]
+    assert f'/tournament/1/events?since={last}' in client.get('/tournament/1').get_data(as_text=True)
+    assert 'id="rankings"' in client.get('/tournament/1/results').get_data(as_text=True)
@@ -0,0 +1,38 @@
+import logging
+
+import metrics
+from conftest import make_tournament
+from models import Match
+
+
+def test_metrics_endpoint_reports_latency_sql_and_spans(app, client):
+    metrics.reset()
+    make_tournament(client, 8, games_per_player=2)
+    client.get('/tournament/1/results')
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert 'mariokart_requests_total{endpoint="plan_schedule",method="POST",status="302"} 1' in body
+    assert 'mariokart_request_duration_seconds_count{endpoint="tournament_results",method="GET"} 1' in body
+    assert 'mariokart_request_sql_statements_bucket{endpoint="tournament_results",le="+Inf"} 1' in body
+    assert 'mariokart_request_db_seconds_sum{endpoint="add_player"}' in body
+    # Planner and stats spans are separated from template rendering
+    assert 'mariokart_span_duration_seconds_count{span="planner.plan_groups"} 1' in body
+    assert 'mariokart_span_duration_seconds_count{span="stats.from_standings"} 1' in body
+    assert 'span="render:tournament_results.html"' in body
+
+
+def test_slow_request_log_lists_the_slowest_sql(app, client, caplog):
+    make_tournament(client, 4, games_per_player=1)
+    with app.app_context():
+        mid = Match.query.first().id
+    app.config['SLOW_REQUEST_MS'] = 1e-6
+    app.config['SLOW_REQUEST_TOP_SQL'] = 2
+    try:
+        with caplog.at_level(logging.WARNING, logger=app.logger.name):
+            client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    finally:
+        app.config['SLOW_REQUEST_MS'] = 0
+    [record] = [r for r in caplog.records if r.getMessage().startswith('Slow request POST')]
+    message = record.getMessage()
+    assert 'standings.update=' in message
+    assert len([line for line in message.splitlines()[1:] if ' ms  ' in line]) == 2
@@ -0,0 +1,83 @@
+import re
+
+import pytest
+from sqlalchemy import event, text
+
+from conftest import make_tournament
+from app import db
+from migrations import LATEST_VERSION, apply_migrations, schema_version, set_schema_version
+
+# Tables that grow with every tournament; reading one without an index is a full scan
+GROWING_TABLES = ('match', 'player', 'standing', 'match_participant', 'tournament_event')
+FULL_SCAN = re.compile(r'^SCAN (%s)\b' % '|'.join(GROWING_TABLES))
+
+
+def _index_names(table):
+    return {row[1] for row in db.session.execute(text(f'PRAGMA index_list("{table}")'))}
+
+
+def test_migrations_are_versioned_and_idempotent(app):
+    with app.app_context():
+        set_schema_version(0)
+        assert apply_migrations() == list(range(1, LATEST_VERSION + 1))
+        assert schema_version() == LATEST_VERSION
+        assert apply_migrations() == []
+
+
+def test_pending_step_adds_a_missing_index(app):
+    with app.app_context():
+        db.session.execute(text('DROP INDEX ix_match_tournament_winner'))
+        set_schema_version(7)
+        assert apply_migrations() == list(range(8, LATEST_VERSION + 1))
+        assert 'ix_match_tournament_winner' in _index_names('match')
+
+
+def _query_plans(app, client, paths):
+    """EXPLAIN QUERY PLAN for every SELECT the given pages issue: [(path, statement, plan rows)]."""
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((current, statement, parameters))
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        for current in paths:
+            assert client.get(current).status_code == 200
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    plans = []
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            for path, statement, parameters in captured:
+                rows = raw.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                plans.append((path, statement, [row[-1] for row in rows]))
+        finally:
+            raw.close()
+    return plans
+
+
+@pytest.mark.parametrize('path', [
+    '/',
+    '/?status=active',
+    '/tournament/1',
+    '/tournament/1/rounds',
+    '/tournament/1/rounds?state=pending&format=json',
+    '/tournament/1/results',
+    '/tournament/1/player/1',
+    '/tournament/1/stations',
+])
+def test_hot_routes_read_growing_tables_through_indexes(app, client, path):
+    make_tournament(client, 12, games_per_player=3)
+    with app.app_context():
+        first = db.session.execute(text('SELECT id FROM "match" ORDER BY id LIMIT 3')).scalars().all()
+    for mid in first:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    client.post('/tournament/1/schedule_stations', data={'stations': '2', 'slot_minutes': '10'})
+    plans = _query_plans(app, client, [path])
+    assert plans
+    scans = [(statement, step) for _, statement, steps in plans for step in steps if FULL_SCAN.match(step)]
+    assert not scans, scans
@@ -0,0 +1,47 @@
+from conftest import make_tournament
+from caching import render_cache
+from models import Match
+
+
+def test_detail_page_revalidates_with_304_until_something_changes(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    first = client.get('/tournament/1')
+    etag = first.headers['ETag']
+    assert 'Last-Modified' not in first.headers
+    assert client.get('/tournament/1', headers={'If-None-Match': etag}).status_code == 304
+    # Only the ETag revalidates: a date cannot tell two changes within one second apart
+    future = 'Fri, 01 Jan 2100 00:00:00 GMT'
+    assert client.get('/tournament/1', headers={'If-Modified-Since': future}).status_code == 200
+
+    with app.app_context():
+        mid = Match.query.first().id
+    client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    after = client.get('/tournament/1', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert b'Winner:' in after.data
+
+
+def test_results_page_is_served_from_cache_without_rendering(app, client, query_budget):
+    make_tournament(client, 4, games_per_player=1)
+    render_cache.clear()
+    body = client.get('/tournament/1/results').data
+    query_budget(1)
+    assert client.get('/tournament/1/results').data == body
+
+
+def test_flash_messages_bypass_the_cache(client):
+    make_tournament(client, 4)
+    client.get('/tournament/1')
+    assert b'Hello there' in client.get('/tournament/1?msg=Hello+there&cat=info').data
+
+
+def test_a_new_tournament_reusing_a_deleted_id_gets_its_own_page(app, client):
+    client.post('/create_tournament', data={'name': 'Alpha'})
+    first = client.get('/tournament/1')
+    assert b'Alpha' in first.data
+    client.post('/tournament/1/delete_all')
+    client.post('/create_tournament', data={'name': 'Bravo'})
+    again = client.get('/tournament/1', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 200
+    assert b'Bravo' in again.data and b'Alpha' not in again.data
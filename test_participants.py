@@ -0,0 +1,55 @@
+from conftest import make_tournament
+from app import db
+from models import Match, MatchParticipant
+from migrations import backfill_match_participants
+from services import player_in_any_match, head_to_head
+
+
+def _slots(app):
+    with app.app_context():
+        return sorted((p.match_id, p.slot, p.player_id, p.score) for p in MatchParticipant.query.all())
+
+
+def test_participants_follow_match_slots_and_scores(app, client):
+    make_tournament(client, 6, games_per_player=2)
+    with app.app_context():
+        match = Match.query.first()
+        mid = match.id
+    client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '2', 'pos2': '1', 'pos3': '4', 'pos4': '3'})
+    with app.app_context():
+        match = db.session.get(Match, mid)
+        rows = sorted((p.slot, p.player_id, p.score) for p in match.participants)
+        assert rows == [(1, match.player1_id, 3), (2, match.player2_id, 4),
+                        (3, match.player3_id, 1), (4, match.player4_id, 2)]
+        assert MatchParticipant.query.count() == 4 * Match.query.count()
+
+
+def test_backfill_recreates_missing_participants(app, client):
+    make_tournament(client, 6, games_per_player=2)
+    with app.app_context():
+        mid = Match.query.first().id
+    client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    expected = _slots(app)
+    with app.app_context():
+        MatchParticipant.query.delete()
+        db.session.commit()
+        assert backfill_match_participants() == len(expected)
+        assert backfill_match_participants() == 0
+    assert _slots(app) == expected
+
+
+def test_membership_and_head_to_head(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    with app.app_context():
+        match = Match.query.one()
+        a, b = match.player1_id, match.player2_id
+    client.post(f'/tournament/1/record_result/{match.id}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    with app.app_context():
+        assert player_in_any_match(a)
+        assert head_to_head(a)[b] == {'meetings': 1, 'ahead': 1, 'behind': 0}
+        assert head_to_head(b)[a] == {'meetings': 1, 'ahead': 0, 'behind': 1}
+    assert client.get(f'/tournament/1/player/{a}').status_code == 200
+    client.post('/tournament/1/reset_matches')
+    with app.app_context():
+        assert not player_in_any_match(a)
+        assert MatchParticipant.query.count() == 0
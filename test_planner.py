@@ -0,0 +1,39 @@
+import random
+from collections import Counter
+
+from services import plan_groups, human_distribution
+
+
+def _check_plan(needs, bots, seed=0):
+    groups, report = plan_groups(needs, bots, rng=random.Random(seed))
+    appearances = Counter()
+    for group in groups:
+        assert len(group) == 4
+        assert len(set(group)) == 4
+        humans = [pid for pid in group if pid not in bots]
+        assert len(humans) >= 2
+        appearances.update(humans)
+    assert report['unplaced'] == 0
+    assert dict(appearances) == {pid: n for pid, n in needs.items() if n}
+    return groups, report
+
+
+def test_plan_matches_human_distribution_shape():
+    needs = {pid: 3 for pid in range(1, 11)}
+    groups, report = _check_plan(needs, [-1, -2, -3, -4])
+    humans_per_match = sorted(sum(1 for pid in g if pid > 0) for g in groups)
+    assert humans_per_match == sorted(human_distribution(30))
+    assert report['bot_fills'] == sum(4 - n for n in humans_per_match)
+
+
+def test_bot_fills_are_spread_evenly():
+    needs = {pid: 5 for pid in range(1, 8)}
+    groups, report = _check_plan(needs, [-1, -2, -3, -4])
+    uses = Counter(pid for g in groups for pid in g if pid < 0)
+    assert max(uses.values()) - min(uses.values()) <= 1
+
+
+def test_repeat_pairings_stay_rare_when_field_is_large():
+    needs = {pid: 4 for pid in range(1, 201)}
+    groups, report = _check_plan(needs, [-1, -2, -3, -4])
+    assert report['repeat_pairings'] <= len(groups) * 6 // 100
@@ -0,0 +1,48 @@
+import pytest
+
+from app import QueryBudgetExceeded
+from conftest import make_tournament
+from models import Match
+
+
+def _record_half(app, client):
+    with app.app_context():
+        ids = [m.id for m in Match.query.order_by(Match.id).all()]
+    for mid in ids[::2]:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    return ids
+
+
+def test_tournament_detail_query_count_is_independent_of_match_count(app, client, query_budget):
+    make_tournament(client, 40, games_per_player=10)
+    ids = _record_half(app, client)
+    assert len(ids) >= 100
+    query_budget(11)
+    resp = client.get('/tournament/1')
+    assert resp.status_code == 200
+    assert b'id="match-' in resp.data
+    # Recorded rounds are fetched on demand, a page at a time
+    resp = client.get('/tournament/1/rounds?limit=100')
+    assert resp.status_code == 200
+    assert b'Winner:' in resp.data
+
+
+def test_tournament_results_query_count_is_bounded(app, client, query_budget):
+    make_tournament(client, 20, games_per_player=5)
+    _record_half(app, client)
+    query_budget(6)
+    assert client.get('/tournament/1/results').status_code == 200
+
+
+def test_query_budget_fails_requests_over_budget(app, client, query_budget):
+    make_tournament(client, 8, games_per_player=2)
+    query_budget(1)
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/tournament/1')
+
+
+def test_tournament_detail_renders_position_selects(client):
+    make_tournament(client, 4, games_per_player=1)
+    html = client.get('/tournament/1').data
+    for i in range(1, 5):
+        assert f'name="pos{i}"'.encode() in html
@@ -0,0 +1,94 @@
+import pytest
+
+from conftest import make_tournament
+from app import db
+from constants import RATING_INITIAL, RATING_K
+from models import Match, Standing, Tournament
+from services import compute_ratings, rating_deltas, rebuild_ratings, rebuild_standings
+
+
+def _ratings(app):
+    with app.app_context():
+        return {s.player_id: s.rating for s in Standing.query.all()}
+
+
+def _match_ids(app):
+    with app.app_context():
+        return [m.id for m in Match.query.order_by(Match.round, Match.id).all()]
+
+
+def test_rating_deltas_are_zero_sum_and_reward_the_winner():
+    deltas = rating_deltas([1500.0] * 4, [4, 3, 2, 1])
+    assert sum(deltas) == pytest.approx(0)
+    assert deltas == sorted(deltas, reverse=True)
+    assert deltas[0] == pytest.approx(RATING_K / 2)
+    # Beating stronger players is worth more than beating equals
+    assert rating_deltas([1400.0, 1600.0, 1600.0, 1600.0], [4, 3, 2, 1])[0] > deltas[0]
+
+
+def test_compute_ratings_skips_unrecorded_slots():
+    ratings = compute_ratings([(1, 2, 3, 4, None, None, None, None), (1, 2, 3, 4, 4, 3, 2, 1)])
+    assert ratings[1] > RATING_INITIAL > ratings[4]
+
+
+def test_incremental_ratings_match_a_full_rebuild(app, client):
+    make_tournament(client, 8, games_per_player=3)
+    for i, mid in enumerate(_match_ids(app)):
+        positions = ['1', '2', '3', '4'] if i % 2 else ['4', '3', '2', '1']
+        client.post(f'/tournament/1/record_result/{mid}',
+                    data={f'pos{n}': p for n, p in zip(range(1, 5), positions)})
+    incremental = _ratings(app)
+    assert len(set(incremental.values())) > 1
+    with app.app_context():
+        rebuild_ratings(1)
+        db.session.commit()
+    assert _ratings(app) == pytest.approx(incremental)
+    with app.app_context():
+        rebuild_standings(1)
+        db.session.commit()
+    assert _ratings(app) == pytest.approx(incremental)
+
+
+def test_corrected_result_replays_ratings(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    ids = _match_ids(app)
+    for mid in ids:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    client.post(f'/tournament/1/record_result/{ids[0]}', data={'pos1': '4', 'pos2': '3', 'pos3': '2', 'pos4': '1'})
+    corrected = _ratings(app)
+    with app.app_context():
+        rebuild_ratings(1)
+        db.session.commit()
+    assert _ratings(app) == pytest.approx(corrected)
+
+
+def test_results_page_ranks_by_rating_on_request(app, client):
+    make_tournament(client, 4)
+    with app.app_context():
+        for pid, rating in ((1, 1400.0), (2, 1700.0), (3, 1500.0), (4, 1600.0)):
+            db.session.add(Standing(player_id=pid, tournament_id=1, points=5 - pid, wins=0,
+                                    matches_played=1, rating=rating))
+        db.session.commit()
+
+    def table_order(url):
+        html = client.get(url).get_data(as_text=True)
+        table = html[html.index('id="rankings"'):]
+        return sorted(('P0', 'P1', 'P2', 'P3'), key=table.index), html
+
+    assert table_order('/tournament/1/results')[0] == ['P0', 'P1', 'P2', 'P3']
+    order, html = table_order('/tournament/1/results?rank_by=rating')
+    assert order == ['P1', 'P3', 'P2', 'P0']
+    assert 'data-rank-by="rating"' in html
+
+
+def test_rebuild_ratings_command_bumps_the_tournament_version(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    client.post(f'/tournament/1/record_result/{_match_ids(app)[0]}',
+                data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+    with app.app_context():
+        before = db.session.get(Tournament, 1).version
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['rebuild-ratings', '--tournament', '1']).exit_code == 0
+    assert runner.invoke(args=['rebuild-ratings']).exit_code == 0
+    with app.app_context():
+        assert db.session.get(Tournament, 1).version == before + 2
@@ -0,0 +1,58 @@
+import re
+
+from conftest import make_tournament
+from constants import ROUNDS_PAGE_SIZE
+from test_batch_results import _match_ids
+
+
+def _setup(app, client, recorded):
+    make_tournament(client, 12, games_per_player=10)
+    ids = _match_ids(app)
+    client.post('/tournament/1/record_results', json={'results': [
+        {'match_id': mid, 'positions': [1, 2, 3, 4]} for mid in ids[:recorded]]})
+    return ids
+
+
+def _cards(html):
+    """(match number, round, match id) for every card in a fragment or page."""
+    return [(int(n), int(r), int(mid)) for n, r, mid in
+            re.findall(r'Match (\d+) \(Round (\d+)\) <small class="opacity-75">#(\d+)', html)]
+
+
+def test_detail_renders_only_unplayed_rounds_with_schedule_numbers(app, client):
+    ids = _setup(app, client, recorded=25)
+    html = client.get('/tournament/1').get_data(as_text=True)
+    # plan_schedule gives every match its own round, in id order
+    assert _cards(html) == [(n, n, ids[n - 1]) for n in range(26, len(ids) + 1)]
+    assert 'Show completed rounds (<span data-stat="completed_rounds">25</span>)' in html
+
+
+def test_completed_rounds_page_in_round_order_via_cursor(app, client):
+    ids = _setup(app, client, recorded=25)
+    seen, url = [], '/tournament/1/rounds?limit=10'
+    while url:
+        resp = client.get(url)
+        seen.extend(_cards(resp.get_data(as_text=True)))
+        after = resp.headers.get('X-Next-After')
+        url = f'/tournament/1/rounds?limit=10&after={after}' if after else None
+    assert seen == [(n, n, ids[n - 1]) for n in range(1, 26)]
+
+
+def test_json_variant_matches_the_fragment(app, client):
+    _setup(app, client, recorded=25)
+    data = client.get('/tournament/1/rounds?format=json&limit=5&after=3').get_json()
+    assert data['state'] == 'completed' and data['next_after'] == 8
+    assert [r['round'] for r in data['rounds']] == [4, 5, 6, 7, 8]
+    html = client.get('/tournament/1/rounds?limit=5&after=3').get_data(as_text=True)
+    assert [(m['number'], r['round'], m['id']) for r in data['rounds'] for m in r['matches']] == _cards(html)
+    first = data['rounds'][0]['matches'][0]
+    assert first['winner_id'] == first['players'][0]['id'] and first['players'][0]['score'] == 4
+
+
+def test_pending_rounds_page_after_the_first_screen(app, client):
+    ids = _setup(app, client, recorded=0)
+    assert len(ids) > ROUNDS_PAGE_SIZE
+    html = client.get('/tournament/1').get_data(as_text=True)
+    assert len(_cards(html)) == ROUNDS_PAGE_SIZE and 'Show more upcoming rounds' in html
+    rest = client.get(f'/tournament/1/rounds?state=pending&after={ROUNDS_PAGE_SIZE}').get_data(as_text=True)
+    assert [n for n, _, _ in _cards(rest)] == list(range(ROUNDS_PAGE_SIZE + 1, len(ids) + 1))
@@ -0,0 +1,111 @@
+from sqlalchemy import event
+
+from app import db
+from models import Match, PlayerIdentity, SeasonStanding, Tournament
+
+
+def _tournament(client, tid, names, season_id=None):
+    """Create tournament tid with these players and one planned match each, optionally in a season."""
+    client.post('/create_tournament', data={'name': f'Cup {tid}'})
+    for name in names:
+        client.post(f'/tournament/{tid}/add_player', data={'name': name})
+    client.post(f'/tournament/{tid}/plan_schedule', data={'games_per_player': '1'})
+    if season_id:
+        client.post(f'/season/{season_id}/tournaments', data={'tournament_id': str(tid)})
+
+
+def _record_all(app, client, tid):
+    with app.app_context():
+        ids = [m.id for m in Match.query.filter_by(tournament_id=tid).order_by(Match.id)]
+    for mid in ids:
+        client.post(f'/tournament/{tid}/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+
+
+def _leaderboard(app):
+    with app.app_context():
+        return {name: (s.events, s.points, s.wins, s.matches_played) for s, name in
+                db.session.query(SeasonStanding, PlayerIdentity.name).join(PlayerIdentity)}
+
+
+def test_ending_tournaments_adds_them_up_per_person(app, client):
+    client.post('/seasons', data={'name': 'Spring'})
+    _tournament(client, 1, ['Ann', 'Bob', 'Cat', 'Dan', 'Eve'], season_id=1)
+    _tournament(client, 2, ['ann', 'Bob', 'Fay', 'Gus', 'Hal'], season_id=1)
+    for tid in (1, 2):
+        _record_all(app, client, tid)
+        client.get(f'/tournament/{tid}/end_tournament')
+    client.get('/tournament/1/end_tournament')  # ending again must not count twice
+    board = _leaderboard(app)
+    assert set(board) == {'Ann', 'Bob', 'Cat', 'Dan', 'Eve', 'Fay', 'Gus', 'Hal'}
+    assert board['Ann'][0] == board['Bob'][0] == 2 and board['Cat'][0] == 1
+    with app.app_context():
+        assert sum(s.podiums for s in SeasonStanding.query) == 6
+        assert PlayerIdentity.query.count() == 8
+
+
+def test_leaderboard_page_reads_only_the_rollups(app, client):
+    client.post('/seasons', data={'name': 'Spring'})
+    _tournament(client, 1, ['Ann', 'Bob', 'Cat', 'Dan'], season_id=1)
+    _record_all(app, client, 1)
+    client.get('/tournament/1/end_tournament')
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        page = client.get('/season/1').get_data(as_text=True)
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert 'Ann' in page and 'Cup 1' in page
+    assert not [s for s in statements if 'FROM "match"' in s or 'FROM standing' in s]
+
+
+def test_moving_a_finished_tournament_rebuilds_the_leaderboards(app, client):
+    client.post('/seasons', data={'name': 'Spring'})
+    client.post('/seasons', data={'name': 'Summer'})
+    _tournament(client, 1, ['Ann', 'Bob', 'Cat', 'Dan'])
+    _record_all(app, client, 1)
+    client.get('/tournament/1/end_tournament')
+    assert _leaderboard(app) == {}
+    client.post('/season/1/tournaments', data={'tournament_id': '1'})
+    assert len(_leaderboard(app)) == 4
+    client.post('/season/1/tournaments', data={'tournament_id': '1', 'remove': '1'})
+    client.post('/season/2/tournaments', data={'tournament_id': '1'})
+    with app.app_context():
+        assert {s.season_id for s in SeasonStanding.query} == {2}
+
+
+def test_deleting_or_resetting_a_finished_tournament_takes_it_off_the_leaderboard(app, client):
+    client.post('/seasons', data={'name': 'Spring'})
+    _tournament(client, 1, ['Ann', 'Bob', 'Cat', 'Dan'], season_id=1)
+    _tournament(client, 2, ['Ann', 'Eve', 'Fay', 'Gus'], season_id=1)
+    for tid in (1, 2):
+        _record_all(app, client, tid)
+        client.get(f'/tournament/{tid}/end_tournament')
+    client.post('/tournament/1/delete_all')
+    assert set(_leaderboard(app)) == {'Ann', 'Eve', 'Fay', 'Gus'}
+    client.post('/tournament/2/reset_matches')
+    assert _leaderboard(app) == {}
+    # Reopened, so playing and ending it again counts the new results once
+    client.post('/tournament/2/plan_schedule', data={'games_per_player': '1'})
+    _record_all(app, client, 2)
+    client.get('/tournament/2/end_tournament')
+    assert {events for events, _, _, _ in _leaderboard(app).values()} == {1}
+
+
+def test_rebuild_seasons_command_keeps_the_board_and_bumps_versions(app, client):
+    client.post('/seasons', data={'name': 'Spring'})
+    _tournament(client, 1, ['Ann', 'Bob', 'Cat', 'Dan'], season_id=1)
+    _record_all(app, client, 1)
+    client.get('/tournament/1/end_tournament')
+    board = _leaderboard(app)
+    with app.app_context():
+        before = db.session.get(Tournament, 1).version
+    assert app.test_cli_runner().invoke(args=['rebuild-seasons']).exit_code == 0
+    assert _leaderboard(app) == board
+    with app.app_context():
+        assert db.session.get(Tournament, 1).version == before + 1
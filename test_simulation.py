@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+from sqlalchemy import event
+
+from conftest import make_tournament
+from app import db
+from simulation import ORDER_POINTS, order_probabilities, simulate
+
+
+def test_probabilities_sum_to_four_and_clinched_places_are_certain():
+    # Player 0 is unreachable, player 5 cannot catch anyone, 1-4 share the one unplayed match
+    base = np.array([100, 10, 10, 10, 10, 0], dtype=float)
+    slots = np.array([[1, 2, 3, 4]])
+    top, first, points = simulate(base, slots, None, 4000, seed=1)
+    assert top.sum() == 4 * 4000
+    assert top[0] == first[0] == 4000 and top[5] == 0
+    assert abs(points[1:5].sum() / 4000 - 40 - 10) < 1e-9
+    assert np.allclose(top[1:5] / 4000, 0.75, atol=0.05)
+
+
+def test_rating_weighting_favours_the_stronger_player():
+    probs = order_probabilities(np.array([[2.0, 0, 0, 0]]))
+    assert np.isclose(probs.sum(), 1) and len(ORDER_POINTS) == 24
+    base = np.zeros(8)
+    slots = np.array([[0, 1, 2, 3], [4, 5, 6, -1]])
+    strength = np.array([[3.0, 0, 0, 0], [0, 0, 0, 0]])
+    top, _, _ = simulate(base, slots, strength, 5000, seed=2)
+    uniform, _, _ = simulate(base, slots, None, 5000, seed=2)
+    assert top[0] > uniform[0] and top[7] == uniform[7] == 0
+
+
+def test_worker_processes_match_the_in_process_totals():
+    base = np.arange(12, dtype=float)
+    slots = np.arange(12).reshape(3, 4)
+    top, first, _ = simulate(base, slots, None, 400, workers=2, seed=3)
+    assert top.sum() == 4 * 400 and first.sum() == 400
+
+
+def test_odds_are_cached_until_a_result_is_recorded(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    data = client.get('/tournament/1/odds?format=json&iterations=500').get_json()
+    assert data['pending'] > 0 and len(data['players']) == 8
+    assert abs(sum(p['top4'] for p in data['players']) - 4) < 1e-9
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        client.get('/tournament/1/odds?format=json&iterations=500')
+        assert not [s for s in statements if 'winner_id IS NULL' in s]
+        client.post('/tournament/1/record_result/1', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+        again = client.get('/tournament/1/odds?format=json&iterations=500').get_json()
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', record)
+    assert again['pending'] == data['pending'] - 1
+    assert 'Finals Odds' in client.get('/tournament/1/odds?weight=rating').get_data(as_text=True)
+
+
+def test_spawned_workers_do_not_set_up_the_database(tmp_path):
+    # Under `python app.py` spawn re-runs app.py in every worker; point __main__ there and check
+    # that the workers never create the database
+    here = os.path.dirname(os.path.abspath(__file__))
+    database = tmp_path / 'spawn.db'
+    script = textwrap.dedent(f"""
+        import sys
+        sys.modules['__main__'].__file__ = {os.path.join(here, 'app.py')!r}
+        import numpy as np
+        from simulation import simulate
+        top, _, _ = simulate(np.zeros(4), np.array([[0, 1, 2, 3]]), None, 100, workers=2, seed=1)
+        assert top.sum() == 400
+    """)
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}', UPLOAD_FOLDER=str(tmp_path))
+    subprocess.run([sys.executable, '-c', script], env=env, cwd=here, check=True, timeout=120)
+    assert not database.exists()
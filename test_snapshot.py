@@ -0,0 +1,73 @@
+import gc
+import tracemalloc
+
+from sqlalchemy import event
+
+import benchmarks
+from conftest import make_tournament
+from app import db
+from models import Match, Player
+from services import (appearance_counts, existing_pair_counts, final_among, load_snapshot,
+                      statistics_from_columns, score_columns_from_matches, touch_tournament,
+                      tournament_snapshot)
+
+
+def test_snapshot_agrees_with_the_orm_paths(app):
+    with app.app_context():
+        tid = benchmarks.seed_tournament(12, 40)
+        snapshot = load_snapshot(tid)
+        matches = Match.query.filter_by(tournament_id=tid).order_by(Match.round, Match.id).all()
+        players = Player.query.filter_by(tournament_id=tid).all()
+        assert snapshot.match_ids.tolist() == [m.id for m in matches]
+        assert [row[8] for row in snapshot.rows()] == [m.winner_id for m in matches]
+        assert statistics_from_columns(players, snapshot) == statistics_from_columns(
+            players, score_columns_from_matches(matches))
+        assert appearance_counts(tid, snapshot) == appearance_counts(tid)
+        assert existing_pair_counts(tid, snapshot) == existing_pair_counts(tid)
+
+
+def test_final_among_finds_the_top_four_match_in_a_snapshot(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    with app.app_context():
+        match = Match.query.one()
+        assert final_among(1, load_snapshot(1)) == match.id == final_among(1, [match])
+
+
+def test_snapshot_is_shared_within_a_request_until_touched(app):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        tid = benchmarks.seed_tournament(8, 10)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            first = tournament_snapshot(tid)
+            assert tournament_snapshot(tid) is first and len(statements) == 1
+            touch_tournament(tid)
+            assert tournament_snapshot(tid) is not first
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_snapshot_is_an_order_of_magnitude_smaller_than_orm_matches(app):
+    def retained(load):
+        tracemalloc.start()
+        try:
+            loaded = load()
+            gc.collect()  # count what stays referenced, not garbage awaiting collection
+            return tracemalloc.get_traced_memory()[0], loaded
+        finally:
+            tracemalloc.stop()
+
+    with app.app_context():
+        tid = benchmarks.seed_tournament(100, 3000)
+        load_snapshot(tid)  # compile both statements outside the measurement
+        Match.query.filter_by(tournament_id=tid).all()
+        db.session.expunge_all()
+        orm_bytes, _ = retained(lambda: Match.query.filter_by(tournament_id=tid).all())
+        db.session.expunge_all()
+        snapshot_bytes, snapshot = retained(lambda: load_snapshot(tid))
+        assert len(snapshot) == 3000
+        assert snapshot_bytes * 10 < orm_bytes
@@ -0,0 +1,61 @@
+from conftest import make_tournament
+from app import db
+from models import Match, Player, Standing
+from services import load_snapshot, load_standings, statistics_from_columns, statistics_from_standings
+
+
+def _standings(app):
+    with app.app_context():
+        return {s.player_id: (s.points, s.wins, s.matches_played) for s in Standing.query.all()}
+
+
+def _record(client, match_id, positions):
+    client.post(f'/tournament/1/record_result/{match_id}',
+                data={f'pos{slot}': str(place) for slot, place in enumerate(positions, start=1)})
+
+
+def _slots(app, match_id):
+    with app.app_context():
+        m = db.session.get(Match, match_id)
+        return m.player1_id, m.player2_id, m.player3_id, m.player4_id
+
+
+def test_re_recording_a_result_replaces_its_contribution(app, client):
+    make_tournament(client, 8, games_per_player=1)
+    _record(client, 1, [1, 2, 3, 4])
+    _record(client, 1, [4, 3, 2, 1])
+    first = _slots(app, 1)
+    standings = _standings(app)
+    assert [standings[pid] for pid in first] == [(1, 0, 1), (2, 0, 1), (3, 0, 1), (4, 1, 1)]
+    assert sum(points for points, _, _ in standings.values()) == 10
+
+
+def test_reset_zeroes_standings_and_delete_player_drops_theirs(app, client):
+    make_tournament(client, 5, games_per_player=1)
+    with app.app_context():
+        ids = [m.id for m in Match.query]
+    for mid in ids:
+        _record(client, mid, [1, 2, 3, 4])
+    assert 1 in _standings(app)
+    client.post('/tournament/1/reset_matches')
+    assert set(_standings(app).values()) == {(0, 0, 0)}
+    client.post('/tournament/1/player/1/delete')
+    with app.app_context():
+        assert db.session.get(Player, 1) is None
+        assert db.session.get(Standing, 1) is None
+
+
+def test_results_page_and_bracket_statistics_agree_on_played_matches(app, client):
+    make_tournament(client, 8, games_per_player=2)
+    with app.app_context():
+        ids = [m.id for m in Match.query.order_by(Match.id)]
+    _record(client, ids[0], [1, 2, 3, 4])  # the other matches stay scheduled but unplayed
+    with app.app_context():
+        humans = Player.query.filter_by(is_bot=False).all()
+        from_standings = statistics_from_standings(humans, load_standings(1))
+        from_columns = statistics_from_columns(humans, load_snapshot(1))
+    keys = ('matches_played', 'wins', 'total_score', 'avg_score', 'win_rate')
+    by_player = {row['player'].id: [row[k] for k in keys] for row in from_columns}
+    assert all(by_player[row['player'].id] == [row[k] for k in keys] for row in from_standings)
+    assert sum(row['matches_played'] for row in from_columns) == len([p for p in _slots(app, ids[0])
+                                                                      if p in by_player])
@@ -0,0 +1,59 @@
+import random
+from collections import defaultdict
+
+from conftest import make_tournament
+from models import Match
+from services import schedule_stations
+
+
+def _check_schedule(matches, stations, bots=frozenset(), min_rest=0):
+    assignments, report = schedule_stations(matches, stations, set(bots), min_rest)
+    assert set(assignments) == {mid for mid, _ in matches}
+    players_of = dict(matches)
+    by_slot = defaultdict(list)
+    for mid, (slot, station) in assignments.items():
+        by_slot[slot].append((station, mid))
+    last = {}
+    for slot in sorted(by_slot):
+        used = [station for station, _ in by_slot[slot]]
+        assert len(used) == len(set(used)) and max(used) <= stations
+        humans = [pid for _, mid in by_slot[slot] for pid in players_of[mid] if pid not in bots]
+        assert len(humans) == len(set(humans)), 'a player is at two stations at once'
+        for pid in humans:
+            if pid in last:
+                assert slot - last[pid] - 1 >= min_rest
+            last[pid] = slot
+    assert report['slots'] >= report['lower_bound']
+    return assignments, report
+
+
+def test_disjoint_matches_fill_every_station():
+    matches = [(i, [4 * i + n for n in range(4)]) for i in range(12)]
+    _, report = _check_schedule(matches, 3)
+    assert report['slots'] == report['lower_bound'] == 4
+    assert report['back_to_back'] == 0
+
+
+def test_rested_players_go_first_without_costing_slots():
+    # Matches 1 and 2 share nobody with 0; 3 repeats 0's players and should wait a slot
+    matches = [(0, [1, 2, 3, 4]), (3, [1, 2, 3, 4]), (1, [5, 6, 7, 8]), (2, [9, 10, 11, 12])]
+    assignments, report = _check_schedule(matches, 1)
+    assert [mid for mid, _ in sorted(assignments.items(), key=lambda item: item[1])] == [0, 1, 3, 2]
+    assert report['back_to_back'] == 0
+
+
+def test_min_rest_and_bots():
+    rng = random.Random(0)
+    matches = [(i, rng.sample(range(1, 25), 3) + [-1]) for i in range(60)]
+    _check_schedule(matches, 4, bots={-1}, min_rest=1)
+
+
+def test_route_stores_stations_and_renders_queues(app, client):
+    make_tournament(client, 16, games_per_player=2)
+    resp = client.post('/tournament/1/schedule_stations', data={'stations': '3', 'slot_minutes': '12'})
+    assert resp.status_code == 302
+    with app.app_context():
+        matches = Match.query.all()
+        assert all(m.station in (1, 2, 3) and m.time_slot is not None for m in matches)
+    page = client.get('/tournament/1/stations').get_data(as_text=True)
+    assert 'Station 3' in page and '+0:12' in page
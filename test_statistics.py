@@ -0,0 +1,18 @@
+from models import Player
+from services import score_columns_from_rows, statistics_from_columns
+
+
+def test_columns_count_only_recorded_slots_and_rank_by_points_then_wins():
+    players = [Player(id=pid, name=f'P{pid}') for pid in (1, 2, 3, 4, 5)]
+    columns = score_columns_from_rows([
+        (1, 2, 3, 4, 4, 3, 2, 1, 1),
+        (5, 2, 3, 4, 0, 4, 3, 2, 2),  # a recorded zero still counts as played
+        (1, 2, 3, 5, None, None, None, None, None),  # scheduled, not played
+    ])
+    rows = statistics_from_columns(players, columns)
+    assert [row['player'].id for row in rows] == [2, 3, 1, 4, 5]
+    by_id = {row['player'].id: row for row in rows}
+    assert (by_id[2]['matches_played'], by_id[2]['wins'], by_id[2]['total_score']) == (2, 1, 7)
+    assert (by_id[1]['matches_played'], by_id[1]['wins'], by_id[1]['avg_score']) == (1, 1, 4.0)
+    assert (by_id[5]['matches_played'], by_id[5]['total_score'], by_id[5]['win_rate']) == (1, 0, 0.0)
+    assert by_id[3]['win_rate'] == 0.0 and by_id[4]['avg_score'] == 1.5
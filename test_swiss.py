@@ -0,0 +1,53 @@
+from collections import Counter
+
+import pytest
+
+from conftest import make_tournament
+from models import Match, Player
+from services import pair_key, swiss_pairings
+from app import db
+
+
+def _pairs(groups):
+    return Counter(pair_key(a, b) for g in groups for i, a in enumerate(g) for b in g[i + 1:])
+
+
+def test_pods_follow_the_ranking_when_nobody_has_met():
+    groups, report = swiss_pairings(list(range(1, 13)))
+    assert groups == [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12]]
+    assert report == {'matches': 3, 'repeat_pairings': 0, 'bot_fills': 0, 'unplaced': 0}
+
+
+def test_repeat_opponents_are_avoided_within_the_window():
+    ranked = list(range(1, 17))
+    first, _ = swiss_pairings(ranked)
+    pair_counts = _pairs(first)
+    second, report = swiss_pairings(ranked, Counter(pair_counts))
+    assert report['repeat_pairings'] == 0
+    assert not set(_pairs(second)) & set(pair_counts)
+
+
+def test_bots_fill_only_the_bottom_pods():
+    groups, report = swiss_pairings(list(range(1, 12)), bot_ids=[-1, -2])
+    assert [len([p for p in g if p > 0]) for g in groups] == [4, 4, 3]
+    assert groups[-1][-1] < 0 and report['bot_fills'] == 1
+    with pytest.raises(ValueError):
+        swiss_pairings(list(range(1, 7)))
+
+
+def test_large_round_places_everyone_once():
+    ranked = list(range(1, 1001))
+    groups, report = swiss_pairings(ranked)
+    assert report['matches'] == 250 and report['unplaced'] == 0
+    assert sorted(p for g in groups for p in g) == ranked
+
+
+def test_swiss_round_route_schedules_one_round_for_everyone(app, client):
+    make_tournament(client, 10)
+    client.get('/tournament/1/generate_bracket?pairing=swiss')
+    with app.app_context():
+        matches = Match.query.all()
+        assert {m.round for m in matches} == {1}
+        humans = [p for m in matches for p in (m.player1_id, m.player2_id, m.player3_id, m.player4_id)
+                  if not db.session.get(Player, p).is_bot]
+        assert len(humans) == len(set(humans)) == 10
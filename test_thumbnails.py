@@ -0,0 +1,89 @@
+import io
+import os
+
+from PIL import Image
+
+from conftest import make_tournament
+from images import THUMBNAIL_SIZES, thumbnail_filename
+from models import Player
+
+
+def _png_bytes(size=(300, 200), mode='RGBA'):
+    buf = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 255) if mode == 'RGBA' else (200, 30, 30)).save(buf, 'PNG')
+    buf.seek(0)
+    return buf
+
+
+def test_upload_writes_square_thumbnails_used_by_templates(app, client):
+    make_tournament(client, 0)
+    client.post('/tournament/1/add_player', data={'name': 'Mario', 'image': (_png_bytes(), 'mario.png')},
+                content_type='multipart/form-data')
+    with app.app_context():
+        filename = Player.query.one().image_filename
+    folder = app.config['UPLOAD_FOLDER']
+    assert os.path.exists(os.path.join(folder, filename))
+    for size in THUMBNAIL_SIZES:
+        with Image.open(os.path.join(folder, thumbnail_filename(filename, size))) as thumb:
+            assert thumb.size == (size, size)
+    html = client.get('/tournament/1').get_data(as_text=True)
+    assert thumbnail_filename(filename, 32) in html
+    assert f'uploads/{filename}"' not in html
+
+
+def test_invalid_upload_is_rejected(app, client):
+    make_tournament(client, 0)
+    resp = client.post('/tournament/1/add_player', data={'name': 'Luigi', 'image': (io.BytesIO(b'not an image'), 'x.png')},
+                       content_type='multipart/form-data')
+    assert 'Invalid+image+file' in resp.headers['Location']
+
+
+def _add_with_photo(client, name, data):
+    return client.post('/tournament/1/add_player', data={'name': name, 'image': (io.BytesIO(data), 'p.png')},
+                       content_type='multipart/form-data')
+
+
+def test_identical_uploads_share_one_file_until_last_reference_goes(app, client):
+    make_tournament(client, 0)
+    data = _png_bytes().getvalue()
+    _add_with_photo(client, 'Mario', data)
+    _add_with_photo(client, 'Luigi', data)
+    with app.app_context():
+        names = {p.image_filename for p in Player.query.all()}
+        ids = [p.id for p in Player.query.order_by(Player.id)]
+    assert len(names) == 1
+    path = os.path.join(app.config['UPLOAD_FOLDER'], names.pop())
+    client.post(f'/tournament/1/player/{ids[0]}/delete')
+    assert os.path.exists(path)
+    client.post('/tournament/1/delete_all')
+    assert not os.path.exists(path)
+
+
+def test_uploads_are_served_immutable_with_etag(app, client):
+    make_tournament(client, 0)
+    _add_with_photo(client, 'Mario', _png_bytes().getvalue())
+    with app.app_context():
+        filename = Player.query.one().image_filename
+    url = '/uploads/' + thumbnail_filename(filename, 24)
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert 'immutable' in resp.headers['Cache-Control']
+    assert client.get(url, headers={'If-None-Match': resp.headers['ETag']}).status_code == 304
+
+
+def test_legacy_upload_names_are_migrated(app, client):
+    from app import db
+    from migrations import migrate_uploads_to_content_names
+    make_tournament(client, 0)
+    folder = app.config['UPLOAD_FOLDER']
+    with open(os.path.join(folder, 't1_p1.png'), 'wb') as fh:
+        fh.write(_png_bytes().getvalue())
+    with app.app_context():
+        db.session.add(Player(name='Mario', tournament_id=1, image_filename='t1_p1.png'))
+        db.session.commit()
+        assert migrate_uploads_to_content_names() == 1
+        assert migrate_uploads_to_content_names() == 0
+        new_name = Player.query.one().image_filename
+    assert new_name != 't1_p1.png'
+    assert os.path.exists(os.path.join(folder, new_name))
+    assert not os.path.exists(os.path.join(folder, 't1_p1.png'))
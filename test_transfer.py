@@ -0,0 +1,114 @@
+import io
+import json
+
+from conftest import make_tournament
+from app import db
+from models import Match, Player, StageEntry, Standing, Tournament, TournamentStage
+
+
+def _play_some(app, client, n=3):
+    with app.app_context():
+        ids = [m.id for m in Match.query.order_by(Match.id).limit(n)]
+    for mid in ids:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '2', 'pos2': '1', 'pos3': '4', 'pos4': '3'})
+
+
+def _summary(tournament_id):
+    players = Player.query.filter_by(tournament_id=tournament_id).order_by(Player.id).all()
+    position = {p.id: i for i, p in enumerate(players)}
+    matches = [(m.round, [position[p] for p in (m.player1_id, m.player2_id, m.player3_id, m.player4_id)],
+                [m.score1, m.score2, m.score3, m.score4], m.winner_id and position[m.winner_id])
+               for m in Match.query.filter_by(tournament_id=tournament_id).order_by(Match.round, Match.id)]
+    standings = sorted((position[s.player_id], s.points, s.wins, s.matches_played, round(s.rating, 6))
+                       for s in Standing.query.filter_by(tournament_id=tournament_id))
+    return [(p.name, p.is_bot) for p in players], matches, standings
+
+
+def test_ndjson_export_streams_and_imports_back(app, client):
+    make_tournament(client, 7, games_per_player=2)
+    _play_some(app, client)
+    resp = client.get('/tournament/1/export')
+    assert resp.is_streamed and resp.mimetype == 'application/x-ndjson'
+    lines = resp.get_data(as_text=True).splitlines()
+    header = json.loads(lines[0])
+    assert header['record'] == 'tournament' and header['export_version'] == 2 and header['format'] is None
+    imported = client.post('/import', data='\n'.join(lines), content_type='application/x-ndjson')
+    assert imported.status_code == 201
+    new_id = imported.get_json()['tournament_id']
+    with app.app_context():
+        assert _summary(new_id) == _summary(1)
+        assert db.session.get(Tournament, new_id).name == 'Cup'
+
+
+def test_csv_upload_from_the_index_page(app, client):
+    make_tournament(client, 5, games_per_player=1)
+    _play_some(app, client, 1)
+    body = client.get('/tournament/1/export?format=csv').get_data()
+    resp = client.post('/import', data={'file': (io.BytesIO(body), 'cup.csv')}, content_type='multipart/form-data')
+    assert resp.status_code == 302 and '/tournament/2' in resp.headers['Location']
+    with app.app_context():
+        assert _summary(2) == _summary(1)
+
+
+def test_import_without_standings_rebuilds_them(app, client):
+    make_tournament(client, 4, games_per_player=1)
+    _play_some(app, client, 1)
+    lines = [line for line in client.get('/tournament/1/export').get_data(as_text=True).splitlines()
+             if json.loads(line)['record'] != 'standing']
+    new_id = client.post('/import', data='\n'.join(lines)).get_json()['tournament_id']
+    with app.app_context():
+        assert _summary(new_id)[2] == _summary(1)[2]
+
+
+def test_a_bad_record_rolls_back_the_whole_import(app, client):
+    make_tournament(client, 5, games_per_player=1)
+    lines = client.get('/tournament/1/export').get_data(as_text=True).splitlines()
+    match = json.loads(next(line for line in lines if '"match"' in line))
+    match['player1_id'] = 999
+    lines.append(json.dumps(match))
+    resp = client.post('/import', data='\n'.join(lines))
+    assert resp.status_code == 400 and '999' in resp.get_json()['errors'][0]
+    with app.app_context():
+        assert Tournament.query.count() == 1 and Player.query.filter_by(tournament_id=2).count() == 0
+
+
+def test_bot_records_must_carry_the_bot_prefix(client):
+    lines = [json.dumps({'record': 'tournament', 'export_version': 1, 'name': 'Cup'}),
+             json.dumps({'record': 'player', 'id': 1, 'name': '<script>', 'is_bot': True})]
+    resp = client.post('/import', data='\n'.join(lines))
+    assert resp.status_code == 400 and 'bot name' in resp.get_json()['errors'][0]
+
+
+def test_exports_with_the_old_version_key_still_import(client):
+    lines = [json.dumps({'record': 'tournament', 'format': 1, 'name': 'Cup'}),
+             json.dumps({'record': 'player', 'id': 1, 'name': 'Ann', 'is_bot': False})]
+    assert client.post('/import', data='\n'.join(lines)).status_code == 201
+    lines[0] = json.dumps({'record': 'tournament', 'format': 9, 'name': 'Cup'})
+    resp = client.post('/import', data='\n'.join(lines))
+    assert resp.status_code == 400 and 'version 9' in resp.get_json()['errors'][0]
+
+
+def test_multi_stage_tournaments_keep_their_stages(app, client):
+    make_tournament(client, 10)
+    client.post('/tournament/1/start_format')
+    with app.app_context():
+        ids = [m.id for m in Match.query.order_by(Match.id)]
+    for mid in ids:
+        client.post(f'/tournament/1/record_result/{mid}', data={'pos1': '1', 'pos2': '2', 'pos3': '3', 'pos4': '4'})
+
+    def stages(tournament_id):
+        rows = TournamentStage.query.filter_by(tournament_id=tournament_id).order_by(TournamentStage.position).all()
+        position = {s.id: s.position for s in rows}
+        names = {p.id: p.name for p in Player.query.filter_by(tournament_id=tournament_id)}
+        entries = sorted((position[e.stage_id], names[e.player_id], e.group_number, e.seed, e.advanced)
+                         for e in StageEntry.query.filter(StageEntry.stage_id.in_(position)))
+        matches = sorted(position.get(m.stage_id) or 0 for m in Match.query.filter_by(tournament_id=tournament_id))
+        return ([(s.position, s.kind, s.name, s.entrants, s.groups, s.games, s.advance, s.status) for s in rows],
+                entries, matches, db.session.get(Tournament, tournament_id).format)
+
+    for new_id, export in ((2, '/tournament/1/export'), (3, '/tournament/1/export?format=csv')):
+        resp = client.post('/import', data=client.get(export).get_data())
+        assert resp.status_code == 201, resp.get_json()
+        with app.app_context():
+            assert stages(new_id) == stages(1) and stages(1)[0][0][7] == 'done'
+            assert _summary(new_id) == _summary(1)
@@ -0,0 +1,345 @@
+"""Streaming export and import of whole tournaments.
+
+An export is one record per line: the tournament, then its players, the stages of a
+multi-stage format with their entries, then matches and standings, as NDJSON objects or CSV
+rows under a shared header. Both formats carry the same fields
+(EXPORT_FIELDS), so either can be imported again. Rows are read with yield_per and written
+in chunks, and imports insert in chunks of IMPORT_CHUNK rows, so memory stays flat however
+big the tournament is. Player photos are files rather than rows and are not included.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Dict, IO, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, select
+
+from app import db
+from constants import BOT_PREFIX
+from formats import FORMATS
+from models import Match, MatchParticipant, Player, StageEntry, Standing, Tournament, TournamentStage
+from services import is_bot_name, rebuild_standings
+from validators import sanitize_name
+
+EXPORT_VERSION = 2  # 2 added the format, stage and stage_entry records and match stage_id
+EXPORT_CHUNK = 1_000
+IMPORT_CHUNK = 1_000
+
+EXPORT_FIELDS = [
+    'record', 'id', 'name', 'status', 'created_at', 'slot_minutes', 'export_version', 'format', 'is_bot',
+    'position', 'kind', 'entrants', 'groups', 'games', 'advance', 'stage_id', 'group_number', 'seed',
+    'advanced', 'round', 'player1_id', 'player2_id', 'player3_id', 'player4_id', 'score1', 'score2',
+    'score3', 'score4', 'winner_id', 'station', 'time_slot', 'points', 'wins', 'matches_played', 'rating',
+]
+SLOTS = range(1, 5)
+STAGE_COLUMNS = ['id', 'position', 'kind', 'name', 'entrants', 'groups', 'games', 'advance', 'status']
+STAGE_KINDS = ('pool', 'knockout', 'final')
+STAGE_STATUSES = ('pending', 'active', 'done')
+
+
+class TransferError(ValueError):
+    """An export that cannot be loaded; the message names the offending line or record."""
+
+
+def export_records(tournament_id: int) -> Iterator[Dict]:
+    """Yield the tournament, its players, stages, stage entries, matches and standings as flat
+    dicts, streaming each table."""
+    tournament = db.session.get(Tournament, tournament_id)
+    yield {'record': 'tournament', 'export_version': EXPORT_VERSION, 'id': tournament.id, 'name': tournament.name,
+           'status': tournament.status,
+           'created_at': tournament.created_at.isoformat() if tournament.created_at else None,
+           'slot_minutes': tournament.slot_minutes, 'format': tournament.format}
+    for pid, name, is_bot in _stream(select(Player.id, Player.name, Player.is_bot)
+                                     .where(Player.tournament_id == tournament_id).order_by(Player.id)):
+        yield {'record': 'player', 'id': pid, 'name': name, 'is_bot': bool(is_bot)}
+    for row in _stream(select(*(getattr(TournamentStage, c) for c in STAGE_COLUMNS))
+                       .where(TournamentStage.tournament_id == tournament_id).order_by(TournamentStage.position)):
+        yield dict(zip(STAGE_COLUMNS, row), record='stage')
+    for stage_id, pid, group_number, seed, advanced in _stream(
+            select(StageEntry.stage_id, StageEntry.player_id, StageEntry.group_number, StageEntry.seed,
+                   StageEntry.advanced)
+            .join(TournamentStage, TournamentStage.id == StageEntry.stage_id)
+            .where(TournamentStage.tournament_id == tournament_id)
+            .order_by(TournamentStage.position, StageEntry.seed)):
+        yield {'record': 'stage_entry', 'stage_id': stage_id, 'id': pid, 'group_number': group_number, 'seed': seed,
+               'advanced': bool(advanced)}
+    match_columns = ['id', 'round', 'stage_id'] + [f'player{i}_id' for i in SLOTS] + [
+        f'score{i}' for i in SLOTS] + ['winner_id', 'station', 'time_slot']
+    for row in _stream(select(*(getattr(Match, c) for c in match_columns))
+                       .where(Match.tournament_id == tournament_id).order_by(Match.round, Match.id)):
+        yield dict(zip(match_columns, row), record='match')
+    for pid, points, wins, played, rating in _stream(
+            select(Standing.player_id, Standing.points, Standing.wins, Standing.matches_played, Standing.rating)
+            .where(Standing.tournament_id == tournament_id).order_by(Standing.player_id)):
+        yield {'record': 'standing', 'id': pid, 'points': points, 'wins': wins, 'matches_played': played,
+               'rating': rating}
+
+
+def _stream(statement):
+    return db.session.execute(statement, execution_options={'yield_per': EXPORT_CHUNK})
+
+
+def _chunked_text(lines: Iterable[str]) -> Iterator[str]:
+    """Join lines into blocks of EXPORT_CHUNK so the response isn't one write per row."""
+    block: List[str] = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= EXPORT_CHUNK:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def export_ndjson(tournament_id: int) -> Iterator[str]:
+    return _chunked_text(json.dumps(record, separators=(',', ':')) + '\n'
+                         for record in export_records(tournament_id))
+
+
+def export_csv(tournament_id: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_FIELDS, extrasaction='ignore')
+
+    def rows():
+        writer.writeheader()
+        for record in export_records(tournament_id):
+            writer.writerow({k: ('' if v is None else int(v) if isinstance(v, bool) else v)
+                             for k, v in record.items()})
+            line = buffer.getvalue()  # the first one also carries the header
+            buffer.seek(0)
+            buffer.truncate()
+            yield line
+
+    return _chunked_text(rows())
+
+
+def read_records(stream: IO[bytes]) -> Iterator[Dict]:
+    """Parse an export from a binary stream, one line at a time. NDJSON is detected by a leading '{'."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    first = text.readline()
+    if first.lstrip().startswith('{'):
+        for number, line in enumerate(_prepend(first, text), start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise TransferError(f'Line {number}: not valid JSON.') from None
+            if not isinstance(record, dict):
+                raise TransferError(f'Line {number}: expected an object.')
+            yield record
+        return
+    reader = csv.DictReader(_prepend(first, text))
+    if not reader.fieldnames or 'record' not in reader.fieldnames:
+        raise TransferError('Line 1: expected NDJSON or a CSV header with a record column.')
+    for row in reader:
+        yield {k: v for k, v in row.items() if k and v not in ('', None)}
+
+
+def _prepend(first: str, rest: Iterable[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+def _int(record: Dict, key: str, number: int, required: bool = True) -> Optional[int]:
+    value = record.get(key)
+    if value in (None, ''):
+        if required:
+            raise TransferError(f'Record {number}: {key} is missing.')
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise TransferError(f'Record {number}: {key} must be an integer.') from None
+
+
+def _flag(value) -> bool:
+    return value in (True, 1) or str(value).lower() in ('1', 'true')
+
+
+def import_tournament(records: Iterable[Dict]) -> Dict[str, int]:
+    """Create a new tournament from export records (caller commits, or rolls back on TransferError).
+
+    Records must come in export order: tournament, players, stages and stage entries, then
+    matches and standings. Ids are remapped to fresh ones. Without standing records, standings are rebuilt from the
+    matches. Returns the new tournament id and the number of players and matches loaded.
+    """
+    records = iter(records)
+    header = next(records, None)
+    if not header or header.get('record') != 'tournament':
+        raise TransferError('Record 1: an export starts with the tournament record.')
+    # The first exports carried the version under 'format'
+    version_key = 'export_version' if 'export_version' in header else 'format'
+    if _int(header, version_key, 1, required=False) not in (None, *range(1, EXPORT_VERSION + 1)):
+        raise TransferError(f'Record 1: unsupported export version {header.get(version_key)}.')
+    fmt = header.get('format') if version_key == 'export_version' else None
+    if fmt is not None and fmt not in FORMATS:
+        raise TransferError(f'Record 1: unknown tournament format {fmt!r}.')
+    name = sanitize_name(str(header.get('name') or ''))
+    if not name:
+        raise TransferError('Record 1: the tournament name is missing or invalid.')
+    try:
+        created_at = datetime.fromisoformat(header['created_at']) if header.get('created_at') else datetime.utcnow()
+    except (TypeError, ValueError):
+        raise TransferError('Record 1: created_at must be an ISO date and time.') from None
+    tournament = Tournament(name=name, status='completed' if header.get('status') == 'completed' else 'active',
+                            created_at=created_at, slot_minutes=_int(header, 'slot_minutes', 1, required=False),
+                            format=fmt)
+    db.session.add(tournament)
+    db.session.flush()
+    tid = tournament.id
+
+    player_map: Dict[int, int] = {}
+    stage_map: Dict[int, int] = {}
+    pending_players: List[Dict] = []
+    pending_entries: List[Dict] = []
+    pending_matches: List[Dict] = []
+    pending_standings: List[Dict] = []
+    standing_players = set()
+    stage_entries = set()
+    counts = {'players': 0, 'matches': 0, 'standings': 0}
+    # Highest player and match id inserted so far. The tournament is new, so every row of it
+    # past these ids comes from the chunk just inserted, in insertion order. Reading them back
+    # is cheaper than RETURNING with ordered ids, which makes SQLite insert row by row.
+    last_ids = {'player': 0, 'match': 0}
+
+    def inserted_ids(model, kind):
+        ids = list(db.session.scalars(select(model.id).where(
+            model.tournament_id == tid, model.id > last_ids[kind]).order_by(model.id)))
+        last_ids[kind] = ids[-1]
+        return ids
+
+    def flush_players():
+        if not pending_players:
+            return
+        db.session.execute(insert(Player), [{k: v for k, v in row.items() if k != 'old_id'} for row in pending_players])
+        new_ids = inserted_ids(Player, 'player')
+        player_map.update(zip((row['old_id'] for row in pending_players), new_ids))
+        counts['players'] += len(pending_players)
+        pending_players.clear()
+
+    def flush_matches():
+        if not pending_matches:
+            return
+        # render_nulls keeps rows with and without results in one batch instead of splitting on NULLs
+        db.session.execute(insert(Match), pending_matches, execution_options={'render_nulls': True})
+        match_ids = inserted_ids(Match, 'match')
+        db.session.execute(insert(MatchParticipant).execution_options(render_nulls=True), [
+            {'match_id': mid, 'player_id': row[f'player{i}_id'], 'slot': i, 'score': row[f'score{i}']}
+            for mid, row in zip(match_ids, pending_matches) for i in SLOTS
+        ])
+        counts['matches'] += len(pending_matches)
+        pending_matches.clear()
+
+    def flush_entries():
+        if pending_entries:
+            db.session.execute(insert(StageEntry), pending_entries)
+            pending_entries.clear()
+
+    def flush_standings():
+        if pending_standings:
+            db.session.execute(insert(Standing), pending_standings)
+            counts['standings'] += len(pending_standings)
+            pending_standings.clear()
+
+    def player(record, number, key, required=True):
+        old = _int(record, key, number, required)
+        if old is None:
+            return None
+        if old not in player_map:
+            raise TransferError(f'Record {number}: {key} {old} is not a player of this tournament.')
+        return player_map[old]
+
+    def stage(record, number, key, required=True):
+        old = _int(record, key, number, required)
+        if old is None:
+            return None
+        if old not in stage_map:
+            raise TransferError(f'Record {number}: {key} {old} is not a stage of this tournament.')
+        return stage_map[old]
+
+    for number, record in enumerate(records, start=2):
+        kind = record.get('record')
+        if kind == 'player':
+            if pending_matches or pending_standings or counts['matches'] or counts['standings']:
+                raise TransferError(f'Record {number}: players must come before matches and standings.')
+            is_bot = _flag(record.get('is_bot'))
+            # Bot names carry BOT_PREFIX, which sanitize_name would reject
+            name = str(record.get('name') or '').strip()[:100] if is_bot else sanitize_name(str(record.get('name') or ''))
+            if not name:
+                raise TransferError(f'Record {number}: the player name is missing or invalid.')
+            if is_bot and not is_bot_name(name):
+                raise TransferError(f'Record {number}: a bot name must start with {BOT_PREFIX}.')
+            pending_players.append({'old_id': _int(record, 'id', number), 'name': name, 'tournament_id': tid,
+                                    'is_bot': is_bot})
+            if len(pending_players) >= IMPORT_CHUNK:
+                flush_players()
+        elif kind == 'stage':
+            flush_players()
+            if pending_matches or pending_standings or counts['matches'] or counts['standings']:
+                raise TransferError(f'Record {number}: stages must come before matches and standings.')
+            if record.get('kind') not in STAGE_KINDS or record.get('status') not in STAGE_STATUSES:
+                raise TransferError(f'Record {number}: unknown stage kind or status.')
+            stage_name = sanitize_name(str(record.get('name') or ''), max_len=50)
+            if not stage_name:
+                raise TransferError(f'Record {number}: the stage name is missing or invalid.')
+            # A format has a handful of stages; adding them one at a time hands back each new id
+            new_stage = TournamentStage(tournament_id=tid, kind=record['kind'], name=stage_name,
+                                        status=record['status'],
+                                        **{c: _int(record, c, number) for c in STAGE_COLUMNS
+                                           if c not in ('id', 'kind', 'name', 'status')})
+            db.session.add(new_stage)
+            db.session.flush()
+            stage_map[_int(record, 'id', number)] = new_stage.id
+        elif kind == 'stage_entry':
+            flush_players()
+            entry = (stage(record, number, 'stage_id'), player(record, number, 'id'))
+            if entry in stage_entries:
+                raise TransferError(f'Record {number}: a second entry for the same player and stage.')
+            stage_entries.add(entry)
+            pending_entries.append({'stage_id': entry[0], 'player_id': entry[1],
+                                    'group_number': _int(record, 'group_number', number),
+                                    'seed': _int(record, 'seed', number), 'advanced': _flag(record.get('advanced'))})
+            if len(pending_entries) >= IMPORT_CHUNK:
+                flush_entries()
+        elif kind == 'match':
+            flush_players()
+            row = {'round': _int(record, 'round', number), 'tournament_id': tid,
+                   'stage_id': stage(record, number, 'stage_id', required=False),
+                   'winner_id': player(record, number, 'winner_id', required=False),
+                   'station': _int(record, 'station', number, required=False),
+                   'time_slot': _int(record, 'time_slot', number, required=False)}
+            for i in SLOTS:
+                row[f'player{i}_id'] = player(record, number, f'player{i}_id')
+                row[f'score{i}'] = _int(record, f'score{i}', number, required=False)
+            if row['winner_id'] is not None and row['winner_id'] not in [row[f'player{i}_id'] for i in SLOTS]:
+                raise TransferError(f'Record {number}: the winner did not play in the match.')
+            pending_matches.append(row)
+            if len(pending_matches) >= IMPORT_CHUNK:
+                flush_matches()
+        elif kind == 'standing':
+            flush_players()
+            try:
+                rating = float(record['rating'])
+            except (KeyError, TypeError, ValueError):
+                raise TransferError(f'Record {number}: rating must be a number.') from None
+            standing_player = player(record, number, 'id')
+            if standing_player in standing_players:
+                raise TransferError(f'Record {number}: a second standing for the same player.')
+            standing_players.add(standing_player)
+            pending_standings.append({
+                'player_id': standing_player, 'tournament_id': tid,
+                'points': _int(record, 'points', number), 'wins': _int(record, 'wins', number),
+                'matches_played': _int(record, 'matches_played', number), 'rating': rating})
+            if len(pending_standings) >= IMPORT_CHUNK:
+                flush_standings()
+        else:
+            raise TransferError(f"Record {number}: unknown record type {kind!r}.")
+    flush_players()
+    flush_entries()
+    flush_matches()
+    flush_standings()
+    if counts['matches'] and not counts['standings']:
+        rebuild_standings(tid)
+    return {'tournament_id': tid, 'players': counts['players'], 'matches': counts['matches']}
@@ -1,6 +1,9 @@
+import csv
+import io
 import re
-from typing import Optional
+from typing import Dict, List, Mapping, Optional, Tuple
 from PIL import Image
+from constants import POSITION_POINTS
 
 ALLOWED_ALERT_CATS = {
     'primary','secondary','success','danger','warning','info','light','dark'
@@ -29,26 +32,98 @@ def clamp_int(value: int, min_val: int, max_val: int) -> int:
     return max(min_val, min(max_val, value))
 
 
+def rank_by_arg(value: str) -> str:
+    """'rating' or the default 'points' ordering for seeding and rankings."""
+    return 'rating' if value == 'rating' else 'points'
+
+
 def alert_category(value: str) -> str:
     value = (value or '').strip().lower()
     return value if value in ALLOWED_ALERT_CATS else 'info'
 
 
-def is_allowed_image(file_storage) -> bool:
-    """Check extension and verify image can be opened by Pillow with allowed format."""
+def open_allowed_image(file_storage) -> Optional[Image.Image]:
+    """Check extension and decode the upload with Pillow; return the image if its format is
+    allowed, else None. The stream is rewound either way so the original can still be saved."""
     filename = (file_storage.filename or '').lower()
     if not any(filename.endswith(ext) for ext in ALLOWED_IMAGE_EXTS):
-        return False
-    # Verify content signature
+        return None
+    pos = None
     try:
         pos = file_storage.stream.tell()
-        with Image.open(file_storage.stream) as img:
-            fmt = (img.format or '').upper()
-        file_storage.stream.seek(pos)
-        return fmt in ALLOWED_IMAGE_TYPES
+        img = Image.open(file_storage.stream)
+        if (img.format or '').upper() not in ALLOWED_IMAGE_TYPES:
+            return None
+        img.load()
+        return img
     except Exception:
+        return None
+    finally:
         try:
-            file_storage.stream.seek(pos)
+            file_storage.stream.seek(pos or 0)
         except Exception:
             pass
-        return False
+
+
+def is_allowed_image(file_storage) -> bool:
+    """Check extension and verify image can be opened by Pillow with allowed format."""
+    return open_allowed_image(file_storage) is not None
+
+
+def parse_result(fields: Mapping) -> Tuple[Optional[Tuple[List[int], int]], Optional[str]]:
+    """Validate one match result given as pos1..pos4 (preferred) or direct score1..score4.
+
+    Returns ((scores, winner_slot_index), None) or (None, error message).
+    """
+    positions = [fields.get(f'pos{i}') for i in range(1, 5)]
+    if all(positions):
+        try:
+            positions = [int(p) for p in positions]
+        except (TypeError, ValueError):
+            return None, 'Positions must be integers.'
+        if any(p < 1 or p > 4 for p in positions):
+            return None, 'Positions must be between 1 and 4.'
+        if len(set(positions)) != 4:
+            return None, 'Positions must be unique for each player.'
+        # Winner is position 1 (highest points by mapping)
+        return ([POSITION_POINTS.get(p, 0) for p in positions], positions.index(1)), None
+    # Backward-compatible: direct 1-10 scores
+    try:
+        scores = [int(fields[f'score{i}']) for i in range(1, 5)]
+    except (TypeError, ValueError, KeyError):
+        return None, 'Scores must be integers between 1 and 10.'
+    if any(s < 1 or s > 10 for s in scores):
+        return None, 'Scores must be between 1 and 10.'
+    if len(set(scores)) != 4:
+        return None, 'Scores must be unique for each player.'
+    return (scores, scores.index(max(scores))), None
+
+
+def result_rows_from_csv(text: str) -> List[Dict[str, str]]:
+    """Read batch results from CSV. A header row (match_id,pos1..pos4 or score1..score4) is
+    optional; without one each line is match_id,pos1,pos2,pos3,pos4."""
+    lines = [line for line in (text or '').splitlines() if line.strip()]
+    if not lines:
+        return []
+    if 'match_id' in lines[0]:
+        reader = csv.DictReader(io.StringIO('\n'.join(lines)))
+        return [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in reader]
+    keys = ['match_id', 'pos1', 'pos2', 'pos3', 'pos4']
+    return [dict(zip(keys, (v.strip() for v in row))) for row in csv.reader(lines)]
+
+
+def result_rows_from_json(data) -> Optional[List[Dict]]:
+    """Accept a list of {match_id, positions: [...]} / {match_id, pos1..pos4} objects,
+    optionally wrapped as {"results": [...]}. Returns None for any other shape."""
+    if isinstance(data, dict):
+        data = data.get('results')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+    rows = []
+    for row in data:
+        row = dict(row)
+        positions = row.pop('positions', None)
+        if isinstance(positions, list) and len(positions) == 4:
+            row.update({f'pos{i}': positions[i - 1] for i in range(1, 5)})
+        rows.append(row)
+    return rows